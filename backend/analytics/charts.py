@@ -0,0 +1,232 @@
+import io
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from django.db.models import Count, Sum
+
+from user_app.account.models import User, Passenger, UserPassengerRelation
+from user_app.flight.models import Flight, Order
+from .models import DailyOrderRollup
+
+# 中文字体逐个文本元素指定，不修改全局 rcParams，多个线程可同时生成图表
+FONT_FAMILY = ['SimHei', 'sans-serif']
+
+logger = logging.getLogger(__name__)
+
+# 同一图表的刷新任务在多个进程间互斥，超过这个时间未完成视为失败，允许重新刷新
+REFRESH_LOCK_TIMEOUT = 5 * 60
+
+
+def _new_axes(figsize):
+    """
+    创建独立的 Figure 与坐标轴，不经过 pyplot 的全局状态。
+    matplotlib 在第一次生成图表时才导入，Django 启动（admin 自动发现）时不加载。
+    """
+    from matplotlib.figure import Figure
+    from matplotlib.ticker import StrMethodFormatter
+
+    figure = Figure(figsize=figsize)
+    axes = figure.subplots()
+    axes.tick_params(labelfontfamily=FONT_FAMILY)
+    # 数值刻度使用 ASCII 负号，SimHei 中没有 Unicode 负号（代替全局的 axes.unicode_minus = False）
+    axes.yaxis.set_major_formatter(StrMethodFormatter('{x:g}'))
+    return figure, axes
+
+
+def _label(axes, title, xlabel=None, ylabel=None):
+    axes.set_title(title, fontfamily=FONT_FAMILY)
+    if xlabel:
+        axes.set_xlabel(xlabel, fontfamily=FONT_FAMILY)
+    if ylabel:
+        axes.set_ylabel(ylabel, fontfamily=FONT_FAMILY)
+
+
+def _to_png(figure):
+    """将图表保存为 PNG 数据"""
+    buffer = io.BytesIO()
+    figure.tight_layout()
+    figure.savefig(buffer, format='png')
+    return buffer.getvalue()
+
+
+# 0. 数据概览
+def summary_stats():
+    return {
+        'total_users': User.objects.count(),
+        'total_orders': Order.objects.count(),
+        'total_sales': DailyOrderRollup.objects.aggregate(Sum('revenue'))['revenue__sum'] or 0,
+        'total_flights': Flight.objects.count(),
+    }
+
+
+# 1. 订单趋势图
+def order_trend_chart():
+    orders_by_date = (
+        DailyOrderRollup.objects.values('day')
+        .annotate(order_count=Sum('order_count'))
+        .order_by('day')
+    )
+    dates = [o['day'] for o in orders_by_date]
+    counts = [o['order_count'] for o in orders_by_date]
+
+    figure, axes = _new_axes((8, 4))
+    axes.plot(dates, counts, marker='o', label="订单数", color="blue")
+    _label(axes, "订单趋势图", "日期", "订单数")
+    axes.tick_params(axis='x', labelrotation=45)
+    axes.legend(prop={'family': FONT_FAMILY})
+    return _to_png(figure)
+
+
+# 2. 每日收入趋势图
+def revenue_trend_chart():
+    """生成每日收入趋势图"""
+    revenue_by_date = (
+        DailyOrderRollup.objects.values('day')
+        .annotate(total_revenue=Sum('revenue'))
+        .order_by('day')
+    )
+    dates = [r['day'] for r in revenue_by_date]
+    revenues = [r['total_revenue'] for r in revenue_by_date]
+
+    figure, axes = _new_axes((8, 4))
+    axes.bar(dates, revenues, color="green")
+    _label(axes, "每日收入趋势", "日期", "收入 (￥)")
+    axes.tick_params(axis='x', labelrotation=45)
+    return _to_png(figure)
+
+
+# 3. 乘客类型分布图
+def passenger_type_chart():
+    passenger_counts = Passenger.objects.values('person_type').annotate(count=Count('id'))
+    labels = [dict(Passenger.PERSON_TYPE_CHOICES).get(p['person_type']) for p in passenger_counts]
+    sizes = [p['count'] for p in passenger_counts]
+
+    figure, axes = _new_axes((6, 6))
+    axes.pie(sizes, labels=labels, autopct='%1.1f%%', startangle=140, textprops={'fontfamily': FONT_FAMILY})
+    _label(axes, "乘客类型分布")
+    return _to_png(figure)
+
+
+# 4. 热门航班收入统计
+def top_flight_revenue_chart():
+    flight_revenue = (
+        DailyOrderRollup.objects.values('flight_id')
+        .annotate(total_revenue=Sum('revenue'))
+        .order_by('-total_revenue')[:5]
+    )
+    flight_ids = [f['flight_id'] for f in flight_revenue]
+    revenues = [f['total_revenue'] for f in flight_revenue]
+
+    figure, axes = _new_axes((8, 4))
+    axes.bar(flight_ids, revenues, color='orange')
+    _label(axes, "前五名航班总收入统计", "航班号", "总收入 (￥)")
+    return _to_png(figure)
+
+
+# 5. 用户购票频率图
+def top_ticket_users(limit=10):
+    """
+    订单数最多的用户，返回 [(用户名, 订单数)]。
+    从用户-乘机人关联表联接订单表，按用户分组计数后取前 limit 名，一次分组查询完成，
+    不再为每个用户执行一次子查询。没有订单的用户不会出现在结果中。
+    """
+    rows = (
+        UserPassengerRelation.objects.values('user_id', 'user__name')
+        .annotate(ticket_count=Count('passenger__orders'))
+        .filter(ticket_count__gt=0)
+        .order_by('-ticket_count', 'user_id')[:limit]
+    )
+    return [(row['user__name'], row['ticket_count']) for row in rows]
+
+
+def user_ticket_frequency_chart():
+    user_ticket_counts = top_ticket_users(10)
+    users = [name for name, _ in user_ticket_counts]
+    counts = [count for _, count in user_ticket_counts]
+
+    figure, axes = _new_axes((8, 4))
+    axes.bar(users, counts, color='purple')
+    _label(axes, "用户购票频率统计 (前十名用户)", "用户名", "购票次数")
+    axes.tick_params(axis='x', labelrotation=45)
+    return _to_png(figure)
+
+
+# 图表名称 -> (标题, 生成函数)，页面按此顺序展示
+CHARTS = {
+    'order_trend': ("订单趋势图", order_trend_chart),
+    'revenue_trend': ("每日收入趋势", revenue_trend_chart),
+    'passenger_type': ("乘客类型分布", passenger_type_chart),
+    'top_flight_revenue': ("热门航班收入统计", top_flight_revenue_chart),
+    'user_ticket_frequency': ("用户购票频率统计", user_ticket_frequency_chart),
+}
+
+# 所有需要后台生成并缓存的内容：数据概览与各图表
+RENDERERS = {'summary': summary_stats, **{name: renderer for name, (_, renderer) in CHARTS.items()}}
+
+# 每个图表使用独立的 Figure，可在多个线程中同时生成
+_executor = ThreadPoolExecutor(max_workers=settings.ANALYTICS_CHART_WORKERS, thread_name_prefix='analytics-charts')
+_scheduled = set()
+_scheduled_lock = threading.Lock()
+
+
+def _entry_key(name):
+    return f"analytics:chart:{name}"
+
+
+def _lock_key(name):
+    return f"analytics:chart:{name}:lock"
+
+
+def get_entry(name):
+    """
+    读取缓存的生成结果：{"value": 数据或 PNG, "refreshed_at": 生成时间}，尚未生成时为 None。
+    """
+    return cache.get(_entry_key(name))
+
+
+def is_stale(entry, now=None):
+    return entry is None or entry['refreshed_at'] + timedelta(
+        seconds=settings.ANALYTICS_CHART_TTL) <= (now or datetime.now())
+
+
+def refresh(name):
+    """
+    立即生成并缓存一项统计内容。缓存不过期，过期判断基于生成时间，刷新期间继续展示旧图表。
+    """
+    entry = {'value': RENDERERS[name](), 'refreshed_at': datetime.now()}
+    cache.set(_entry_key(name), entry, None)
+    return entry
+
+
+def _refresh_in_background(name):
+    try:
+        refresh(name)
+    except Exception:
+        # 后台线程中的异常不会传给请求方，记录日志后保留旧图表
+        logger.exception("生成统计图表 %s 失败", name)
+    finally:
+        cache.delete(_lock_key(name))
+        with _scheduled_lock:
+            _scheduled.discard(name)
+        # 后台线程使用独立的数据库连接，用完关闭
+        connections.close_all()
+
+
+def schedule_refresh(names=None):
+    """
+    将已过期或尚未生成的内容交给后台线程刷新，不阻塞当前请求。
+    通过缓存锁保证多个进程不会同时刷新同一项内容。
+    """
+    for name in names or RENDERERS:
+        if not is_stale(get_entry(name)):
+            continue
+        with _scheduled_lock:
+            if name in _scheduled or not cache.add(_lock_key(name), 1, REFRESH_LOCK_TIMEOUT):
+                continue
+            _scheduled.add(name)
+        _executor.submit(_refresh_in_background, name)
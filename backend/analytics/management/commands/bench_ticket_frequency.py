@@ -0,0 +1,153 @@
+import random
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+
+from common.benchmark import measure
+from user_app.account.models import Passenger, User, UserPassengerRelation
+from user_app.flight.models import Airport, City, Flight, Order, Plane, Ticket
+from analytics.charts import top_ticket_users
+
+BENCH_PREFIX = 'bench-freq-'
+BENCH_PLANE_ID = 'BFRQ'
+BENCH_CITY_CODE = 'BFRQ'
+BENCH_FLIGHT_ID = 1_900_000_000
+
+
+def legacy_top_ticket_users(limit=10):
+    """
+    改写前的查询：为每个用户执行一次关联子查询统计订单数，再整体排序。
+    """
+    orders_subquery = (
+        Order.objects.filter(passenger__users__user_id=OuterRef('pk'))
+        .values('passenger__users__user_id')
+        .annotate(total_orders=Count('order_id'))
+        .values('total_orders')
+    )
+    rows = (
+        User.objects.annotate(ticket_count=Subquery(orders_subquery, output_field=IntegerField()))
+        .values('name', 'ticket_count')
+        .order_by('-ticket_count')[:limit]
+    )
+    return [(row['name'], row['ticket_count'] or 0) for row in rows]
+
+
+class Command(BaseCommand):
+    help = ("用户购票频率统计压测：可选地灌入大量用户和订单，对比逐用户子查询与分组聚合的 EXPLAIN 计划和 p50/p99 延迟，"
+            "并校验两者的结果一致。")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', action='store_true', help="灌入压测数据")
+        parser.add_argument('--cleanup', action='store_true', help="删除压测数据后退出")
+        parser.add_argument('--users', type=int, default=100_000)
+        parser.add_argument('--orders', type=int, default=2_000_000)
+        parser.add_argument('--runs', type=int, default=5, help="每个查询的执行次数")
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--force', action='store_true', help="DEBUG 关闭时仍然运行")
+
+    def handle(self, *args, **options):
+        # 灌入和删除的数据量很大，只在本地或压测环境中运行
+        if not settings.DEBUG and not options['force']:
+            raise CommandError("DEBUG 未开启，如确需在此环境运行请加 --force")
+
+        if options['cleanup']:
+            self._cleanup()
+            return
+
+        if options['seed']:
+            if User.objects.filter(name__startswith=BENCH_PREFIX).exists():
+                raise CommandError("压测数据已存在，请先使用 --cleanup 删除")
+            self._seed(options)
+
+        if not User.objects.filter(name__startswith=BENCH_PREFIX).exists():
+            self.stderr.write("没有压测数据，请先使用 --seed 灌入")
+            return
+
+        legacy = legacy_top_ticket_users()
+        grouped = top_ticket_users()
+        # 订单数相同的用户先后顺序可能不同，只比较订单数
+        if [count for _, count in legacy] != [count for _, count in grouped]:
+            self.stderr.write(f"结果不一致：\n子查询 {legacy}\n分组聚合 {grouped}")
+            return
+
+        queries = {
+            '逐用户子查询': legacy_top_ticket_users,
+            '分组聚合': top_ticket_users,
+        }
+        for name, run in queries.items():
+            self.stdout.write(f"\n== {name}")
+            p50, p99 = measure(run, options['runs'])
+            self.stdout.write(f"p50 {p50:.2f} ms  p99 {p99:.2f} ms")
+
+        self.stdout.write("\n== 分组聚合 EXPLAIN")
+        self.stdout.write(
+            UserPassengerRelation.objects.values('user_id', 'user__name')
+            .annotate(ticket_count=Count('passenger__orders'))
+            .order_by('-ticket_count', 'user_id')[:10].explain()
+        )
+
+    def _seed(self, options):
+        rng = random.Random(42)
+        batch_size = options['batch_size']
+
+        self.stdout.write("灌入航班和机票 ...")
+        city = City.objects.create(city_code=BENCH_CITY_CODE, city_name="压测城市", province="压测", pinyin="yc")
+        airport = Airport.objects.create(airport_code=BENCH_CITY_CODE, airport_code_3='BFQ',
+                                         airport_name="压测机场", city=city)
+        Plane.objects.create(plane_id=BENCH_PLANE_ID, model='BENCH', first_class_seats=8, business_seats=30,
+                             economy_seats=150)
+        departure_time = datetime.now().replace(minute=0, second=0, microsecond=0) + timedelta(days=30)
+        Flight.objects.create(
+            flight_id=BENCH_FLIGHT_ID, departure_time=departure_time,
+            arrival_time=departure_time + timedelta(hours=2), departure_airport=airport, arrival_airport=airport,
+            remaining_first_class_seats=8, remaining_business_seats=30, remaining_economy_seats=150,
+            distance=1000, plane_id=BENCH_PLANE_ID,
+        )
+        Ticket.objects.bulk_create([
+            Ticket(price=rng.randrange(300, 5000), baggage_allowance=20, ticket_type='adult',
+                   seat_type=seat_type, flight_id=BENCH_FLIGHT_ID)
+            for seat_type in ('economy', 'business', 'first_class')
+        ])
+        ticket_ids = list(Ticket.objects.filter(flight_id=BENCH_FLIGHT_ID).values_list('ticket_id', flat=True))
+
+        self.stdout.write(f"灌入 {options['users']} 个用户及其乘机人 ...")
+        User.objects.bulk_create(
+            [User(name=f"{BENCH_PREFIX}{i}", email=f"{BENCH_PREFIX}{i}@example.com", password='0')
+             for i in range(options['users'])],
+            batch_size=batch_size,
+        )
+        Passenger.objects.bulk_create(
+            [Passenger(name=f"{BENCH_PREFIX}{i}", gender=True, phone_number='0') for i in range(options['users'])],
+            batch_size=batch_size,
+        )
+        user_ids = dict(User.objects.filter(name__startswith=BENCH_PREFIX).values_list('name', 'id'))
+        passenger_ids = dict(Passenger.objects.filter(name__startswith=BENCH_PREFIX).values_list('name', 'id'))
+        UserPassengerRelation.objects.bulk_create(
+            [UserPassengerRelation(user_id=user_ids[name], passenger_id=passenger_id)
+             for name, passenger_id in passenger_ids.items()],
+            batch_size=batch_size,
+        )
+
+        self.stdout.write(f"灌入 {options['orders']} 个订单 ...")
+        # 少数用户贡献大部分订单，接近真实的购票分布
+        passengers = list(passenger_ids.values())
+        weights = [1 / (rank + 1) for rank in range(len(passengers))]
+        statuses = ('confirmed', 'confirmed', 'confirmed', 'pending', 'canceled', 'refunded')
+        for start in range(0, options['orders'], batch_size):
+            size = min(batch_size, options['orders'] - start)
+            Order.objects.bulk_create([
+                Order(passenger_id=passenger_id, ticket_id=rng.choice(ticket_ids),
+                      status=rng.choice(statuses), total_price=rng.randrange(300, 5000))
+                for passenger_id in rng.choices(passengers, weights=weights, k=size)
+            ])
+        self.stdout.write("灌入完成")
+
+    def _cleanup(self):
+        Order.objects.filter(passenger__name__startswith=BENCH_PREFIX).delete()
+        Passenger.objects.filter(name__startswith=BENCH_PREFIX).delete()
+        User.objects.filter(name__startswith=BENCH_PREFIX).delete()
+        Plane.objects.filter(plane_id=BENCH_PLANE_ID).delete()
+        City.objects.filter(city_code=BENCH_CITY_CODE).delete()
+        self.stdout.write("压测数据已删除")
@@ -0,0 +1,17 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from analytics.rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = "按订单表重建每日订单汇总，可只重建某天之后的数据"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', type=date.fromisoformat, help="只重建该日期（YYYY-MM-DD）及之后的汇总")
+        parser.add_argument('--batch-size', type=int, default=1000, help="每次批量写入的汇总行数")
+
+    def handle(self, *args, **options):
+        created = rebuild_rollups(since=options['since'], batch_size=options['batch_size'])
+        self.stdout.write(f"已重建 {created} 行每日订单汇总")
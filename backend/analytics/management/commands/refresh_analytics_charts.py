@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from analytics.charts import RENDERERS, refresh
+
+
+class Command(BaseCommand):
+    help = "立即重新生成并缓存后台统计页面的数据概览与全部图表，可由定时任务调用"
+
+    def add_arguments(self, parser):
+        parser.add_argument('names', nargs='*', help=f"只刷新指定内容，可选：{', '.join(RENDERERS)}")
+
+    def handle(self, *args, **options):
+        for name in options['names'] or RENDERERS:
+            if name not in RENDERERS:
+                self.stderr.write(f"未知的统计内容：{name}")
+                continue
+            entry = refresh(name)
+            self.stdout.write(f"已刷新 {name}（{entry['refreshed_at']:%Y-%m-%d %H:%M:%S}）")
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:17
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('flight', '0004_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyOrderRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(verbose_name='日期')),
+                ('passenger_type', models.CharField(choices=[('adult', '成人'), ('student', '学生'), ('teacher', '教师'), ('senior', '老人')], max_length=10, verbose_name='乘客类型')),
+                ('order_count', models.IntegerField(default=0, verbose_name='订单数')),
+                ('revenue', models.FloatField(default=0, verbose_name='收入')),
+                ('arrival_airport', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='flight.airport', verbose_name='到达机场')),
+                ('departure_airport', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='flight.airport', verbose_name='出发机场')),
+                ('flight', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='order_rollups', to='flight.flight', verbose_name='航班')),
+            ],
+            options={
+                'verbose_name': '每日订单汇总',
+                'verbose_name_plural': '每日订单汇总',
+                'indexes': [models.Index(fields=['departure_airport', 'arrival_airport', 'day'], name='order_rollup_route_day_idx')],
+                'constraints': [models.UniqueConstraint(fields=('day', 'flight', 'passenger_type'), name='order_rollup_unique_key')],
+            },
+        ),
+    ]
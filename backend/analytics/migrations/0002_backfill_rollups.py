@@ -0,0 +1,48 @@
+from django.db import migrations
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+
+
+def backfill_rollups(apps, schema_editor):
+    """
+    按已支付订单写入每日汇总。与 analytics.rollups.replace_rollups 的分组一致，复制在此以免迁移依赖应用代码。
+    """
+    Order = apps.get_model('flight', 'Order')
+    DailyOrderRollup = apps.get_model('analytics', 'DailyOrderRollup')
+
+    rows = (
+        Order.objects.filter(status='confirmed')
+        .annotate(day=TruncDate('purchase_time'))
+        .values('day', 'ticket__flight_id', 'ticket__flight__departure_airport_id',
+                'ticket__flight__arrival_airport_id', 'passenger__person_type')
+        .annotate(order_count=Count('order_id'), revenue=Sum('total_price'))
+        .order_by()
+    )
+
+    DailyOrderRollup.objects.all().delete()
+    batch = []
+    for row in rows.iterator():
+        batch.append(DailyOrderRollup(
+            day=row['day'],
+            flight_id=row['ticket__flight_id'],
+            departure_airport_id=row['ticket__flight__departure_airport_id'],
+            arrival_airport_id=row['ticket__flight__arrival_airport_id'],
+            passenger_type=row['passenger__person_type'],
+            order_count=row['order_count'],
+            revenue=row['revenue'],
+        ))
+        if len(batch) >= 1000:
+            DailyOrderRollup.objects.bulk_create(batch)
+            batch = []
+    DailyOrderRollup.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+from django.db import models
+
+from user_app.account.models import Passenger
+from user_app.flight.models import Airport, Flight
+
+
+class DailyOrderRollup(models.Model):
+    """
+    已支付订单的每日汇总：按日期、航班和乘客类型统计订单数与收入。
+
+    订单支付时累加、退款时扣减，与订单修改处于同一事务；统计页面从这里取数，
+    不再扫描整张订单表。数据有偏差时可用 rebuild_order_rollups 命令按订单表重建。
+    """
+    day = models.DateField(verbose_name="日期")  # 订单购买日期
+    flight = models.ForeignKey(Flight, on_delete=models.CASCADE, related_name='order_rollups', verbose_name="航班")
+    # 冗余航线信息，便于按航线汇总
+    departure_airport = models.ForeignKey(Airport, on_delete=models.CASCADE, related_name='+', verbose_name="出发机场")
+    arrival_airport = models.ForeignKey(Airport, on_delete=models.CASCADE, related_name='+', verbose_name="到达机场")
+    passenger_type = models.CharField(max_length=10, choices=Passenger.PERSON_TYPE_CHOICES, verbose_name="乘客类型")
+    order_count = models.IntegerField(default=0, verbose_name="订单数")
+    revenue = models.FloatField(default=0, verbose_name="收入")
+
+    class Meta:
+        verbose_name = "每日订单汇总"
+        verbose_name_plural = "每日订单汇总"
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'flight', 'passenger_type'], name='order_rollup_unique_key'),
+        ]
+        indexes = [
+            models.Index(fields=['departure_airport', 'arrival_airport', 'day'], name='order_rollup_route_day_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.day} 航班 {self.flight_id} ({self.passenger_type})：{self.order_count} 单，￥{self.revenue}"
@@ -0,0 +1,87 @@
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+
+from user_app.account.models import Passenger
+from user_app.flight.models import Order
+from .models import DailyOrderRollup
+
+
+def record_order(order, flight, sign=1):
+    """
+    将一笔订单计入（sign=1，支付时）或移出（sign=-1，退款时）每日汇总，需在订单修改的事务中调用。
+    """
+    passenger_type = Passenger.objects.filter(pk=order.passenger_id).values_list('person_type', flat=True).get()
+    key = {
+        'day': order.purchase_time.date(),
+        'flight_id': flight.flight_id,
+        'passenger_type': passenger_type,
+    }
+    changes = {
+        'order_count': F('order_count') + sign,
+        'revenue': F('revenue') + sign * order.total_price,
+    }
+
+    if DailyOrderRollup.objects.filter(**key).update(**changes):
+        return
+    try:
+        # 当天该航班该类型的第一笔订单，创建汇总行；并发创建时退回到更新
+        with transaction.atomic():
+            DailyOrderRollup.objects.create(
+                **key,
+                departure_airport_id=flight.departure_airport_id,
+                arrival_airport_id=flight.arrival_airport_id,
+                order_count=sign,
+                revenue=sign * order.total_price,
+            )
+    except IntegrityError:
+        DailyOrderRollup.objects.filter(**key).update(**changes)
+
+
+def rebuild_rollups(since=None, batch_size=1000):
+    """
+    按订单表重新计算每日汇总（since 为空时重建全部），返回写入的汇总行数。
+    """
+    orders = Order.objects.filter(status='confirmed')
+    rollups = DailyOrderRollup.objects.all()
+    if since:
+        orders = orders.filter(purchase_time__date__gte=since)
+        rollups = rollups.filter(day__gte=since)
+    return replace_rollups(orders, rollups, batch_size)
+
+
+def replace_rollups(orders, rollups, batch_size=1000):
+    """
+    删除 rollups 中的汇总行，并按已支付订单 orders 重新写入，返回写入的行数。
+    """
+    Rollup = rollups.model
+    # 航线由航班决定，一并分组不会增加分组数
+    rows = (
+        orders.annotate(day=TruncDate('purchase_time'))
+        .values('day', 'ticket__flight_id', 'ticket__flight__departure_airport_id',
+                'ticket__flight__arrival_airport_id', 'passenger__person_type')
+        .annotate(order_count=Count('order_id'), revenue=Sum('total_price'))
+        .order_by()
+    )
+
+    created = 0
+    with transaction.atomic():
+        rollups.delete()
+        batch = []
+        for row in rows.iterator():
+            batch.append(Rollup(
+                day=row['day'],
+                flight_id=row['ticket__flight_id'],
+                departure_airport_id=row['ticket__flight__departure_airport_id'],
+                arrival_airport_id=row['ticket__flight__arrival_airport_id'],
+                passenger_type=row['passenger__person_type'],
+                order_count=row['order_count'],
+                revenue=row['revenue'],
+            ))
+            if len(batch) >= batch_size:
+                Rollup.objects.bulk_create(batch)
+                created += len(batch)
+                batch = []
+        Rollup.objects.bulk_create(batch)
+        created += len(batch)
+    return created
@@ -1,3 +1,236 @@
-from django.test import TestCase
+import os
+import re
+import subprocess
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from importlib import import_module
+from io import StringIO
+from unittest import mock
+
+from django.apps import apps
+from django.contrib.auth.models import User as AuthUser
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework.test import APIClient
+
+from user_app.account.models import Passenger, User, UserPassengerRelation
+from user_app.flight.models import Airport, City, Flight, Order, Plane, Ticket
+from . import charts
+from .models import DailyOrderRollup
+from .rollups import rebuild_rollups
+
+LOCMEM_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
 
 # Create your tests here.
+@override_settings(CACHES=LOCMEM_CACHES, ANALYTICS_CHART_TTL=600)
+class ChartCacheTest(TestCase):
+    """统计页面只读缓存，图表由后台生成后按地址提供"""
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(AuthUser.objects.create_superuser('admin', 'admin@example.com', 'password'))
+
+    def test_requires_admin_login(self):
+        self.client.logout()
+        with mock.patch.object(charts, 'schedule_refresh') as schedule_refresh:
+            for url in ('/admin/analytics/', '/admin/analytics/chart/order_trend.png'):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 302)
+                self.assertIn('/admin/login/', response['Location'])
+            schedule_refresh.assert_not_called()
+
+    def test_page_does_not_render_charts(self):
+        with mock.patch.object(charts, 'schedule_refresh') as schedule_refresh, \
+                mock.patch.dict(charts.RENDERERS, {name: mock.Mock() for name in charts.RENDERERS}):
+            response = self.client.get('/admin/analytics/')
+            self.assertEqual(response.status_code, 200)
+            schedule_refresh.assert_called_once_with()
+            for renderer in charts.RENDERERS.values():
+                renderer.assert_not_called()
+        self.assertContains(response, '图表生成中')
+
+    def test_chart_served_from_cache(self):
+        with mock.patch.object(charts, 'schedule_refresh'):
+            self.assertEqual(self.client.get('/admin/analytics/chart/order_trend.png').status_code, 503)
+
+        charts.refresh('order_trend')
+        self.assertFalse(charts.is_stale(charts.get_entry('order_trend')))
+        response = self.client.get('/admin/analytics/chart/order_trend.png')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'image/png')
+        self.assertTrue(response.content.startswith(b'\x89PNG'))
+        self.assertEqual(self.client.get('/admin/analytics/chart/unknown.png').status_code, 404)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class OrderDataTestCase(TestCase):
+    """一个用户、两位乘机人、同一航班上的三个待支付订单"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(AuthUser.objects.create_user('tester', 'tester@example.com', 'password'))
+        user = User.objects.create(name='tester', email='tester@example.com', password='password')
+        passengers = [
+            Passenger.objects.create(name='成人', gender=True, phone_number='13800000000'),
+            Passenger.objects.create(name='学生', gender=False, phone_number='13800000001', person_type='student'),
+        ]
+        for passenger in passengers:
+            UserPassengerRelation.objects.create(user=user, passenger=passenger)
+
+        city = City.objects.create(city_code='BJS', city_name='北京', province='北京')
+        airport = Airport.objects.create(airport_code='ZBAA', airport_code_3='PEK', airport_name='首都', city=city)
+        plane = Plane.objects.create(plane_id='B1234', model='A320', first_class_seats=0, business_seats=0,
+                                     economy_seats=10)
+        departure_time = datetime.now() + timedelta(days=30)
+        flight = Flight.objects.create(
+            flight_id=1, departure_time=departure_time, arrival_time=departure_time + timedelta(hours=2),
+            departure_airport=airport, arrival_airport=airport, remaining_first_class_seats=0,
+            remaining_business_seats=0, remaining_economy_seats=10, distance=1000, plane=plane,
+        )
+        adult_ticket = Ticket.objects.create(price=500, baggage_allowance=20, ticket_type='adult',
+                                             seat_type='economy', flight=flight)
+        student_ticket = Ticket.objects.create(price=250, baggage_allowance=20, ticket_type='student',
+                                             seat_type='economy', flight=flight)
+        self.orders = [
+            Order.objects.create(passenger=passengers[0], ticket=adult_ticket, total_price=500),
+            Order.objects.create(passenger=passengers[0], ticket=adult_ticket, total_price=500),
+            Order.objects.create(passenger=passengers[1], ticket=student_ticket, total_price=250),
+        ]
+
+
+class OrderRollupTest(OrderDataTestCase):
+    """支付、退款时增量维护的汇总与按订单表重建的结果一致"""
+
+    @staticmethod
+    def _snapshot():
+        return sorted(DailyOrderRollup.objects.values_list(
+            'day', 'flight_id', 'departure_airport_id', 'arrival_airport_id', 'passenger_type',
+            'order_count', 'revenue'))
+
+    def test_incremental_matches_rebuild(self):
+        for order in self.orders:
+            response = self.client.post(f'/user/flight/order/confirm/{order.order_id}/')
+            self.assertEqual(response.status_code, 200)
+        self.orders[1].refresh_from_db()
+        self.orders[1].cancel_order()
+
+        incremental = self._snapshot()
+        self.assertEqual(sum(row[5] for row in incremental), 2)
+        self.assertEqual(rebuild_rollups(), 2)
+        self.assertEqual(self._snapshot(), incremental)
+        self.assertEqual(charts.summary_stats()['total_sales'], 750)
+
+    def test_migration_backfills_existing_orders(self):
+        # 汇总表上线前已支付的订单
+        Order.objects.filter(order_id__in=[order.order_id for order in self.orders[:2]]).update(status='confirmed')
+        self.assertFalse(DailyOrderRollup.objects.exists())
+
+        migration = import_module('analytics.migrations.0002_backfill_rollups')
+        migration.backfill_rollups(apps, None)
+        self.assertEqual(sum(row[5] for row in self._snapshot()), 2)
+        self.assertEqual(charts.summary_stats()['total_sales'], 1000)
+
+
+class TopTicketUsersTest(OrderDataTestCase):
+    """购票频率统计按用户分组计数，共用乘机人的订单计入每个关联用户"""
+
+    def test_grouped_counts(self):
+        other = User.objects.create(name='other', email='other@example.com', password='password')
+        UserPassengerRelation.objects.create(user=other, passenger=self.orders[2].passenger)
+        User.objects.create(name='idle', email='idle@example.com', password='password')
+
+        with self.assertNumQueries(1):
+            self.assertEqual(charts.top_ticket_users(), [('tester', 3), ('other', 1)])
+        self.assertEqual(charts.top_ticket_users(1), [('tester', 3)])
+
+
+class ChartRenderTest(OrderDataTestCase):
+    """图表使用独立的 Figure 生成，可并行执行且不修改 matplotlib 全局状态"""
+
+    def test_render_without_global_state(self):
+        from matplotlib import rcParams
+        for order in self.orders:
+            self.client.post(f'/user/flight/order/confirm/{order.order_id}/')
+        font_family = list(rcParams['font.sans-serif'])
+
+        for _, renderer in charts.CHARTS.values():
+            self.assertTrue(renderer().startswith(b'\x89PNG'))
+        self.assertEqual(rcParams['font.sans-serif'], font_family)
+
+    def test_parallel_render(self):
+        def render(index):
+            figure, axes = charts._new_axes((4, 3))
+            axes.bar(['甲', '乙'], [index, index + 1])
+            charts._label(axes, f"图表 {index}", "名称", "数量")
+            return charts._to_png(figure)
+
+        expected = [render(index) for index in range(8)]
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            self.assertEqual(list(executor.map(render, range(8))), expected)
+
+
+class BenchTicketFrequencyTest(TestCase):
+    """压测命令只在 DEBUG 或 --force 时运行，数据带前缀，可重复灌入和删除"""
+
+    def test_refuses_without_debug(self):
+        with self.assertRaises(CommandError):
+            call_command('bench_ticket_frequency', '--seed', stdout=StringIO())
+        self.assertFalse(User.objects.exists())
+
+    def test_seed_run_and_cleanup(self):
+        out = StringIO()
+        call_command('bench_ticket_frequency', '--force', '--seed', '--users', '20', '--orders', '100',
+                     '--runs', '1', stdout=out)
+        self.assertIn('分组聚合 EXPLAIN', out.getvalue())
+        with self.assertRaises(CommandError):
+            call_command('bench_ticket_frequency', '--force', '--seed', stdout=StringIO())
+
+        call_command('bench_ticket_frequency', '--force', '--cleanup', stdout=StringIO())
+        self.assertFalse(User.objects.exists())
+        self.assertFalse(Order.objects.exists())
+        self.assertFalse(Flight.objects.exists())
+
+
+class StartupImportTest(SimpleTestCase):
+    """
+    Django 启动（manage.py check 会执行 admin 自动发现）的导入耗时预算。
+    统计相关的重型依赖只在访问统计页面时导入，不应出现在启动过程中。
+    """
+    # 所有模块自身导入耗时之和的上限（毫秒），留有余量以适应较慢的机器
+    IMPORT_BUDGET_MS = 2000
+    HEAVY_MODULES = ('matplotlib', 'numpy', 'pandas', 'pypinyin')
+
+    def run_importtime(self, *args):
+        """用 -X importtime 在子进程中运行，返回 [(自身耗时(us), 模块名)]"""
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', *args],
+            cwd=settings.BASE_DIR, env=os.environ.copy(), capture_output=True, text=True, timeout=120,
+        )
+        self.assertEqual(result.returncode, 0, result.stderr[-2000:])
+        # 每行格式：import time: 自身耗时(us) | 累计耗时(us) | 模块名
+        return [(int(self_us), module) for self_us, module in
+                re.findall(r'^import time:\s+(\d+) \|\s+\d+ \| *(\S+)$', result.stderr, re.MULTILINE)]
+
+    def test_startup_import_budget(self):
+        imports = self.run_importtime('manage.py', 'check')
+        loaded = {module.split('.')[0] for _, module in imports}
+        for module in self.HEAVY_MODULES:
+            self.assertNotIn(module, loaded, f"{module} 不应在启动时导入")
+
+        total_ms = sum(self_us for self_us, _ in imports) / 1000
+        self.assertLess(total_ms, self.IMPORT_BUDGET_MS, f"启动导入耗时 {total_ms:.0f} ms 超出预算")
+
+    def test_charts_do_not_import_pyplot(self):
+        # 在独立进程中生成图表，结果不受同一进程中其他测试导入的模块影响
+        imports = self.run_importtime('-c', (
+            "import django; django.setup(); from analytics import charts; "
+            "charts._to_png(charts._new_axes((4, 3))[0])"
+        ))
+        loaded = {module for _, module in imports}
+        self.assertIn('matplotlib.figure', loaded)
+        self.assertNotIn('matplotlib.pyplot', loaded, "生成图表不应导入 pyplot")
@@ -55,6 +55,7 @@ MIDDLEWARE = [
     'common.middleware.CloseCsrfMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'common.middleware.DomainUserMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -120,13 +121,27 @@ AUTH_PASSWORD_VALIDATORS = [
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'common.authentication.CachedTokenAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
 }
 
+# Token 认证缓存：Redis 中的缓存时间，以及进程内 LRU 的缓存时间与容量
+TOKEN_CACHE_TIMEOUT = 5 * 60
+TOKEN_LOCAL_CACHE_TIMEOUT = 30
+TOKEN_LOCAL_CACHE_SIZE = 1024
+
+# 后台统计页面图表的刷新间隔（秒），过期后由后台线程重新生成
+ANALYTICS_CHART_TTL = 10 * 60
+# 后台生成图表的线程数
+ANALYTICS_CHART_WORKERS = 4
+
+# 列表接口游标分页的默认每页条数与最大每页条数（请求带 cursor 或 page_size 参数时生效）
+KEYSET_PAGE_SIZE = 20
+KEYSET_MAX_PAGE_SIZE = 100
+
 # Redis缓存配置
 CACHES = {
     "default": {
@@ -138,6 +153,9 @@ CACHES = {
     }
 }
 
+# 待支付订单的座位预留时长（秒），超时未支付的订单由 expire_pending_orders 命令取消
+SEAT_HOLD_TIMEOUT = 15 * 60
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/5.1/topics/i18n/
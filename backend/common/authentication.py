@@ -0,0 +1,193 @@
+# common/authentication.py
+
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth.models import User as AuthUser
+from django.core.cache import cache
+from django.db import router
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
+
+from common.versioning import get_version, bump_version
+
+# 命中统计在进程内累计，每认证这么多次后汇总到 Redis 一次
+STATS_FLUSH_EVERY = 100
+STATS_KEYS = ('local_hits', 'redis_hits', 'misses')
+
+
+def _token_version_key(key):
+    return f"auth_token:version:{key}"
+
+
+def _token_key(key):
+    """
+    Token 在 Redis 中的缓存键，带版本号。失效时递增版本号，失效前从数据库读出的旧数据
+    即使随后才写入缓存，也写在旧版本的键上，不会再被读到。
+    """
+    return f"auth_token:{key}:{get_version(_token_version_key(key))}"
+
+
+def _stats_key(name):
+    return f"auth_token_stats:{name}"
+
+
+class _LocalTokenCache:
+    """
+    进程内的 Token -> 认证信息 LRU 缓存，条目在 TOKEN_LOCAL_CACHE_TIMEOUT 秒后过期。
+
+    其他进程中的失效无法通知到这里，因此过期时间要短，保证失效最多延迟这么久生效。
+    """
+
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + settings.TOKEN_LOCAL_CACHE_TIMEOUT, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > settings.TOKEN_LOCAL_CACHE_SIZE:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class _TokenCacheStats:
+    """
+    Token 缓存命中统计：本进程累计值，并定期累加到 Redis 供所有进程汇总查看。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.totals = dict.fromkeys(STATS_KEYS, 0)
+        self._pending = dict.fromkeys(STATS_KEYS, 0)
+
+    def record(self, name):
+        with self._lock:
+            self.totals[name] += 1
+            self._pending[name] += 1
+            if sum(self._pending.values()) < STATS_FLUSH_EVERY:
+                return
+            pending, self._pending = self._pending, dict.fromkeys(STATS_KEYS, 0)
+
+        for key, count in pending.items():
+            if count:
+                cache.add(_stats_key(key), 0, None)
+                cache.incr(_stats_key(key), count)
+
+
+local_token_cache = _LocalTokenCache()
+token_cache_stats = _TokenCacheStats()
+
+
+def hit_rate(counts):
+    """
+    根据命中计数计算命中率（本地与 Redis 命中都算命中）。
+    """
+    total = sum(counts[name] for name in STATS_KEYS)
+    return (counts['local_hits'] + counts['redis_hits']) / total if total else 0
+
+
+def get_token_cache_stats():
+    """
+    所有进程汇总到 Redis 的 Token 缓存命中统计。
+    """
+    counts = {name: cache.get(_stats_key(name), 0) for name in STATS_KEYS}
+    counts['hit_rate'] = hit_rate(counts)
+    return counts
+
+
+def invalidate_token(key):
+    """
+    使某个 Token 的认证缓存失效：清除本进程缓存，并递增 Redis 缓存的版本号。
+    """
+    local_token_cache.delete(key)
+    bump_version(_token_version_key(key))
+
+
+def invalidate_user_tokens(user_id):
+    """
+    清除某个用户所有 Token 的认证缓存，用于修改密码、停用账号等场景。
+    """
+    for key in Token.objects.filter(user_id=user_id).values_list('key', flat=True):
+        invalidate_token(key)
+
+
+def _token_entry(token):
+    """
+    缓存的认证信息：只保存 (用户 id, 用户名, 是否启用, Token 创建时间)，不缓存密码哈希等其他字段。
+    """
+    return token.user_id, token.user.username, token.user.is_active, token.created
+
+
+def _restore_token(key, entry):
+    """
+    由缓存条目为本次请求构造新的 Token 与用户对象，各请求、各线程互不共享实例。
+
+    用户只加载了 id、用户名和启用状态，其余字段为延迟加载字段，访问时才查询；
+    保存时也只写回已加载的字段，不会用空值覆盖其他字段。
+    """
+    user_id, username, is_active, created = entry
+    user = AuthUser.from_db(router.db_for_read(AuthUser), ['id', 'username', 'is_active'],
+                            [user_id, username, is_active])
+    token = Token.from_db(router.db_for_read(Token), ['key', 'user_id', 'created'], [key, user_id, created])
+    token.user = user
+    return token
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    带缓存的 Token 认证。
+
+    先查进程内 LRU，再查 Redis，都未命中时才查询 Token 表并回填缓存，
+    避免每个请求都执行一次 authtoken_token 与 auth_user 的联表查询。
+    与 TokenAuthentication 一样返回 (用户, Token)，request.auth 仍是 Token 实例。
+    """
+
+    def authenticate_credentials(self, key):
+        entry = local_token_cache.get(key)
+        if entry is not None:
+            token_cache_stats.record('local_hits')
+        else:
+            # 先取版本号再查数据库，查询期间发生的失效会使回填的键作废
+            cache_key = _token_key(key)
+            entry = cache.get(cache_key)
+            if entry is not None:
+                token_cache_stats.record('redis_hits')
+            else:
+                token_cache_stats.record('misses')
+                try:
+                    token = Token.objects.select_related('user').get(key=key)
+                except Token.DoesNotExist:
+                    raise AuthenticationFailed('Invalid token.')
+                entry = _token_entry(token)
+                cache.set(cache_key, entry, settings.TOKEN_CACHE_TIMEOUT)
+            local_token_cache.set(key, entry)
+
+        token = _restore_token(key, entry)
+        if not token.user.is_active:
+            raise AuthenticationFailed('User inactive or deleted.')
+
+        return token.user, token
@@ -0,0 +1,26 @@
+# common/benchmark.py
+
+import time
+
+
+def percentile(samples, fraction):
+    """
+    计算样本的分位数（fraction 取 0~1），样本为空时返回 0。
+    """
+    if not samples:
+        return 0
+    ordered = sorted(samples)
+    index = min(int(round(fraction * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[index]
+
+
+def measure(func, runs):
+    """
+    重复执行 func，返回每次耗时（毫秒）的 p50 与 p99。
+    """
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return percentile(samples, 0.5), percentile(samples, 0.99)
@@ -0,0 +1,14 @@
+# common/bulk.py
+
+from django.db import connections, router
+
+
+def bulk_upsert(model, objs, update_fields, batch_size=None):
+    """
+    批量插入，主键已存在时只更新 update_fields，一条 INSERT ... ON CONFLICT / ON DUPLICATE KEY UPDATE 语句处理一批行。
+    比逐行 save 或 bulk_update（为每行生成 CASE WHEN）快得多。MySQL 按主键冲突更新，不支持也不需要指定冲突字段。
+    """
+    features = connections[router.db_for_write(model)].features
+    unique_fields = [model._meta.pk.name] if features.supports_update_conflicts_with_target else None
+    model.objects.bulk_create(objs, batch_size=batch_size, update_conflicts=True, unique_fields=unique_fields,
+                              update_fields=update_fields)
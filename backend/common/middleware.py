@@ -1,8 +1,58 @@
 # tools/middleware.py
 
+from django.core.cache import cache
 from django.utils.deprecation import MiddlewareMixin
+from django.utils.functional import SimpleLazyObject
+
+from common.versioning import get_version, bump_version
+
+# 认证用户到业务用户（account.User）映射的缓存时间
+DOMAIN_USER_CACHE_TIMEOUT = 60 * 60
 
 
 class CloseCsrfMiddleware(MiddlewareMixin):
     def process_request(self, request):
         request.csrf_processing_done = True  # csrf处理完毕
+
+
+def _domain_user_version_key(username):
+    return f"domain_user:version:{username}"
+
+
+def get_domain_user(auth_user):
+    """
+    根据认证用户取对应的业务用户，优先读 Redis 缓存，找不到时返回 None。
+
+    缓存的是不含密码字段的只读副本，只用于读取和权限判断；修改用户信息时需要重新读取，
+    并用 update_fields 只保存改动的字段。缓存键带版本号，失效时递增版本号，
+    失效前读出的旧数据即使随后才写入缓存，也写在旧版本的键上，不会再被读到。
+    """
+    if auth_user is None or not auth_user.is_authenticated:
+        return None
+
+    from user_app.account.models import User
+
+    version = get_version(_domain_user_version_key(auth_user.username))
+    key = f"domain_user:{auth_user.username}:{version}"
+    user = cache.get(key)
+    if user is None:
+        user = User.objects.defer('password').filter(name=auth_user.username).first()
+        if user is not None:
+            cache.set(key, user, DOMAIN_USER_CACHE_TIMEOUT)
+    return user
+
+
+def invalidate_domain_user(username):
+    bump_version(_domain_user_version_key(username))
+
+
+class DomainUserMiddleware(MiddlewareMixin):
+    """
+    为每个请求挂上 request.domain_user：当前认证用户对应的 account.User。
+
+    首次访问时才解析，同一请求内只解析一次。DRF 在视图中完成 Token 认证后会回写
+    request.user，因此在视图里访问时拿到的是 Token 对应的用户。用户不存在时为假值。
+    """
+
+    def process_request(self, request):
+        request.domain_user = SimpleLazyObject(lambda: get_domain_user(getattr(request, 'user', None)))
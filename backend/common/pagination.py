@@ -0,0 +1,152 @@
+# common/pagination.py
+
+import base64
+import binascii
+import json
+from bisect import bisect_right
+from datetime import date, datetime
+from functools import reduce
+from operator import or_
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework import status
+from rest_framework.exceptions import ParseError
+from rest_framework.response import Response
+
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return {"datetime": value.isoformat()}
+    if isinstance(value, date):
+        return {"date": value.isoformat()}
+    return value
+
+
+def _decode_value(value):
+    if isinstance(value, dict):
+        if "datetime" in value:
+            return datetime.fromisoformat(value["datetime"])
+        if "date" in value:
+            return date.fromisoformat(value["date"])
+    return value
+
+
+def encode_cursor(values):
+    raw = json.dumps([_encode_value(value) for value in values], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        return [_decode_value(value) for value in json.loads(raw)]
+    except (binascii.Error, ValueError, TypeError):
+        raise ParseError("Invalid cursor.")
+
+
+class KeysetPagination:
+    """
+    基于排序键的游标分页（keyset pagination）。
+
+    游标保存上一页最后一条记录的排序键，下一页用 WHERE (排序键) > 游标 取数，
+    无论翻到多深都只读取一页的数据，不会像 OFFSET 那样扫描前面所有记录。
+    排序键必须唯一（最后一个字段通常是主键），ordering 写法与 order_by 相同。
+
+    为兼容旧客户端，只有请求带了 cursor 或 page_size 参数时才分页，
+    此时返回 {"results": [...], "next_cursor": ...}，否则原样返回完整列表。
+    """
+
+    def __init__(self, request, ordering):
+        self.ordering = ordering
+        self.fields = [field.lstrip('-') for field in ordering]
+        params = request.query_params
+        self.enabled = 'cursor' in params or 'page_size' in params
+        self.next_cursor = None
+
+        try:
+            page_size = int(params.get('page_size', settings.KEYSET_PAGE_SIZE))
+        except ValueError:
+            raise ParseError("Invalid page_size.")
+        self.page_size = max(1, min(page_size, settings.KEYSET_MAX_PAGE_SIZE))
+
+        cursor = params.get('cursor')
+        self.cursor = decode_cursor(cursor) if cursor else None
+        if self.cursor is not None and len(self.cursor) != len(self.fields):
+            raise ParseError("Invalid cursor.")
+
+    def _after_cursor(self):
+        """
+        构造 (f1, f2, ...) 位于游标之后的条件：
+        f1 > v1 OR (f1 = v1 AND f2 > v2) OR ...，降序字段用 <。
+        """
+        conditions = []
+        for i, field in enumerate(self.ordering):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            equal = {self.fields[j]: self.cursor[j] for j in range(i)}
+            conditions.append(Q(**equal, **{f"{name}__{lookup}": self.cursor[i]}))
+        return reduce(or_, conditions)
+
+    def paginate_queryset(self, queryset, key=None):
+        """
+        对查询集分页。key 用于从结果中取排序字段值，默认按属性或字典键读取。
+        """
+        queryset = queryset.order_by(*self.ordering)
+        if not self.enabled:
+            return list(queryset)
+
+        if self.cursor is not None:
+            opts = queryset.model._meta
+            self._check_cursor(lambda field, value: opts.get_field(field).to_python(value))
+            queryset = queryset.filter(self._after_cursor())
+        rows = list(queryset[:self.page_size + 1])
+        return self._finish(rows, key)
+
+    def paginate_list(self, items, key=None):
+        """
+        对已按 ordering（仅支持升序）排好序的内存列表分页，用二分查找定位游标。
+        """
+        if not self.enabled:
+            return list(items)
+
+        key = key or self._default_key
+        start = 0
+        if self.cursor is not None and items:
+            self._check_cursor(lambda field, value: self._check_type(value, key(items[0], field)))
+            start = bisect_right(items, tuple(self.cursor), key=lambda item: tuple(key(item, field)
+                                                                                  for field in self.fields))
+        return self._finish(items[start:start + self.page_size + 1], key)
+
+    def _check_cursor(self, convert):
+        """
+        按排序字段逐个校验并转换游标中的值，类型不符的游标（例如被篡改过）按无效游标处理，
+        不让它在比较时抛出 TypeError。
+        """
+        try:
+            self.cursor = [convert(field, value) for field, value in zip(self.fields, self.cursor)]
+        except (ValidationError, TypeError, ValueError):
+            raise ParseError("Invalid cursor.")
+
+    @staticmethod
+    def _check_type(value, sample):
+        if sample is not None and not isinstance(value, type(sample)):
+            raise TypeError(f"expected {type(sample).__name__}")
+        return value
+
+    def _finish(self, rows, key):
+        key = key or self._default_key
+        if len(rows) > self.page_size:
+            rows = rows[:self.page_size]
+            self.next_cursor = encode_cursor([key(rows[-1], field) for field in self.fields])
+        return rows
+
+    @staticmethod
+    def _default_key(item, field):
+        return item[field] if isinstance(item, dict) else getattr(item, field)
+
+    def get_response(self, data, status_code=status.HTTP_200_OK):
+        if not self.enabled:
+            return Response(data, status=status_code)
+        return Response({"results": data, "next_cursor": self.next_cursor}, status=status_code)
@@ -0,0 +1,26 @@
+# common/versioning.py
+
+import time
+
+from django.core.cache import cache
+
+
+def get_version(key):
+    """
+    获取缓存版本号，不存在时以当前时间戳初始化，避免与被淘汰前的旧版本号重复。
+    """
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, int(time.time() * 1000), None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(key):
+    """
+    递增缓存版本号，使依赖该版本号的缓存全部失效。
+    """
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, int(time.time() * 1000), None)
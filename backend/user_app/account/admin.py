@@ -6,9 +6,9 @@ from backend.admin_site import custom_admin_site
 # 用户模型的 Admin 配置
 @admin.register(User, site=custom_admin_site)
 class UserAdmin(admin.ModelAdmin):
-    list_display = ('name', 'email', 'phone_number', 'accumulated_miles', 'ticked_count')  # 显示字段
+    list_display = ('name', 'email', 'phone_number', 'accumulated_miles', 'ticked_count', 'level')  # 显示字段
     search_fields = ('name', 'email', 'phone_number')  # 搜索字段
-    list_filter = ('accumulated_miles', 'ticked_count')  # 筛选字段
+    list_filter = ('level', 'accumulated_miles', 'ticked_count')  # 筛选字段
     actions = ['freeze_user', 'unfreeze_user', 'delete_selected_users']  # 自定义操作
 
     # 去除默认删除权限
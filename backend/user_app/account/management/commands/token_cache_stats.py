@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from common.authentication import get_token_cache_stats
+
+
+class Command(BaseCommand):
+    help = "查看 Token 认证缓存的命中情况（所有进程汇总）"
+
+    def handle(self, *args, **options):
+        stats = get_token_cache_stats()
+        self.stdout.write(
+            f"本地命中 {stats['local_hits']}，Redis 命中 {stats['redis_hits']}，"
+            f"未命中 {stats['misses']}，命中率 {stats['hit_rate']:.1%}"
+        )
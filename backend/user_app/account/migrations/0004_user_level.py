@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0003_user_avatar'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='level',
+            field=models.IntegerField(blank=True, db_index=True, null=True, verbose_name='会员等级'),
+        ),
+    ]
@@ -14,6 +14,8 @@ class User(models.Model):
     # 账户信息
     accumulated_miles = models.FloatField(default=0, verbose_name='累计里程')  # 累计里程
     ticked_count = models.IntegerField(default=0, verbose_name='已购票数')  # 购票次数
+    # 根据累计里程与购票数解析出的会员等级（Level.level），未达到任何等级时为空；随订单支付、退款同步更新
+    level = models.IntegerField(null=True, blank=True, db_index=True, verbose_name='会员等级')
 
     def __str__(self):
         return self.name
@@ -9,6 +9,15 @@ class UserSerializer(serializers.ModelSerializer):
         model = User
         fields = ['id', 'name', 'email', 'phone_number', 'accumulated_miles', 'ticked_count', 'avatar_url']
 
+    def update(self, instance, validated_data):
+        """
+        只保存本次修改的字段，避免覆盖并发更新的里程、购票数和等级
+        """
+        for attr, value in validated_data.items():
+            setattr(instance, attr, value)
+        instance.save(update_fields=list(validated_data))
+        return instance
+
     def get_avatar_url(self, obj):
         """
         获取头像的完整 URL
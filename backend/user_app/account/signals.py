@@ -0,0 +1,33 @@
+from django.contrib.auth.models import User as AuthUser
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from common.authentication import invalidate_token, invalidate_user_tokens
+from common.middleware import invalidate_domain_user
+from .models import User
+
+
+@receiver([post_save, post_delete], sender=User)
+def user_changed(sender, instance, **kwargs):
+    # 用户信息（里程、购票数、等级等）变更并提交后清除缓存的业务用户
+    name = instance.name
+    transaction.on_commit(lambda: invalidate_domain_user(name))
+
+
+@receiver(post_save, sender=AuthUser)
+def auth_user_changed(sender, instance, update_fields=None, **kwargs):
+    # 修改密码、用户名或停用账号后清除该用户的 Token 认证缓存，登录时只更新 last_login 无需清除
+    # 在事务提交后清除，避免其他请求在提交前读到旧数据并重新写入缓存
+    if update_fields is not None and set(update_fields) == {'last_login'}:
+        return
+    user_id = instance.id
+    transaction.on_commit(lambda: invalidate_user_tokens(user_id))
+
+
+@receiver(post_delete, sender=Token)
+def token_deleted(sender, instance, **kwargs):
+    # Token 被删除或轮换并提交后失效
+    key = instance.key
+    transaction.on_commit(lambda: invalidate_token(key))
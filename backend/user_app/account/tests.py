@@ -1,3 +1,131 @@
-from django.test import TestCase
+from django.contrib.auth.models import User as AuthUser
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient, APIRequestFactory
+
+from common.authentication import CachedTokenAuthentication, _token_key, invalidate_token, local_token_cache
+from common.middleware import get_domain_user
+from .models import User
+
+LOCMEM_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
 
 # Create your tests here.
+@override_settings(CACHES=LOCMEM_CACHES)
+class DomainUserCacheTest(TestCase):
+    """业务用户在请求间缓存，用户信息变更或改名后缓存失效"""
+
+    def setUp(self):
+        cache.clear()
+        self.auth_user = AuthUser.objects.create_user('tester', 'tester@example.com', 'password')
+        User.objects.create(name='tester', email='tester@example.com', password='password')
+        self.client = APIClient()
+        self.client.force_authenticate(self.auth_user)
+
+    def test_lookup_is_cached(self):
+        self.client.get('/user/account/invoice/')
+        # 业务用户命中缓存，只剩查询发票
+        with self.assertNumQueries(1):
+            response = self.client.get('/user/account/invoice/')
+        self.assertEqual(response.status_code, 200)
+
+    def test_save_invalidates_cache(self):
+        self.client.get('/user/account/invoice/')
+        user = User.objects.get(name='tester')
+        user.accumulated_miles = 1000
+        with self.captureOnCommitCallbacks(execute=True):
+            user.save()
+        with self.assertNumQueries(2):
+            self.client.get('/user/account/invoice/')
+
+    def test_rename_invalidates_old_name(self):
+        self.client.get('/user/account/invoice/')
+        response = self.client.put('/user/account/profile/', {'name': 'renamed'}, format='json')
+        self.assertEqual(response.status_code, 200)
+
+        token = Token.objects.create(user=AuthUser.objects.get(pk=self.auth_user.pk))
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        response = client.get('/user/account/profile/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['name'], 'renamed')
+
+    def test_cached_user_excludes_password(self):
+        user = get_domain_user(self.auth_user)
+        self.assertIn('password', user.get_deferred_fields())
+
+    def test_profile_update_keeps_concurrent_progress(self):
+        self.client.get('/user/account/invoice/')
+        # 绕过信号修改里程，模拟缓存中留有过期副本
+        User.objects.filter(name='tester').update(accumulated_miles=500, ticked_count=2)
+        response = self.client.put('/user/account/profile/', {'phone_number': '13800000000'}, format='json')
+        self.assertEqual(response.status_code, 200)
+
+        user = User.objects.get(name='tester')
+        self.assertEqual(user.phone_number, '13800000000')
+        self.assertEqual((user.accumulated_miles, user.ticked_count), (500, 2))
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class CachedTokenAuthenticationTest(TestCase):
+    """Token 认证结果被缓存，修改密码、删除 Token 后立即失效"""
+
+    def setUp(self):
+        cache.clear()
+        local_token_cache.clear()
+        self.auth_user = AuthUser.objects.create_user('tester', 'tester@example.com', 'password')
+        User.objects.create(name='tester', email='tester@example.com', password='password')
+        self.token = Token.objects.create(user=self.auth_user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def test_token_lookup_is_cached(self):
+        self.assertEqual(self.client.get('/user/account/token/').status_code, 200)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get('/user/account/token/').status_code, 200)
+
+    def test_cached_auth_is_token_without_password(self):
+        authenticator = CachedTokenAuthentication()
+        for _ in range(2):
+            request = APIRequestFactory().get('/', HTTP_AUTHORIZATION=f'Token {self.token.key}')
+            user, auth = authenticator.authenticate(request)
+            self.assertIsInstance(auth, Token)
+            self.assertEqual((auth.key, auth.user, auth.created), (self.token.key, self.auth_user, self.token.created))
+        self.assertNotIn(self.auth_user.password, repr(cache.get(_token_key(self.token.key))))
+
+        # 只加载了部分字段的用户保存时不会覆盖其他字段
+        user.first_name = '测试'
+        user.save()
+        self.assertEqual(AuthUser.objects.get(pk=self.auth_user.pk).email, 'tester@example.com')
+
+    def test_logout_invalidates_token(self):
+        self.client.get('/user/account/token/')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.client.post('/user/account/logout/').status_code, 200)
+        self.assertIsNone(local_token_cache.get(self.token.key))
+        self.assertIsNone(cache.get(_token_key(self.token.key)))
+
+    def test_deleted_token_is_rejected(self):
+        self.client.get('/user/account/token/')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.token.delete()
+        self.assertEqual(self.client.get('/user/account/token/').status_code, 401)
+
+    def test_stale_entry_written_after_invalidation_is_ignored(self):
+        # 失效前读出版本号的请求在失效后才回填缓存，回填写在旧版本的键上
+        stale_key = _token_key(self.token.key)
+        invalidate_token(self.token.key)
+        cache.set(stale_key, (self.auth_user.id, 'tester', False, self.token.created))
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get('/user/account/token/').status_code, 200)
+
+    def test_change_password_invalidates_cache(self):
+        self.client.get('/user/account/token/')
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.put('/user/account/change-password/',
+                                       {'old_password': 'password', 'new_password': 'new-password'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        # 缓存已清除，需要重新查询 Token 表
+        with self.assertNumQueries(1):
+            self.client.get('/user/account/token/')
@@ -1,9 +1,7 @@
 import os
 
 from django.conf import settings
-from django.core.exceptions import ObjectDoesNotExist
 from rest_framework import status
-from rest_framework.exceptions import AuthenticationFailed
 from rest_framework.parsers import MultiPartParser, FormParser
 from rest_framework.response import Response
 from rest_framework.views import APIView
@@ -15,6 +13,11 @@ from .models import User, Passenger, UserPassengerRelation, Invoice
 from .serializers import UserSerializer, PassengerSerializer, InvoiceSerializer
 from rest_framework.decorators import api_view, permission_classes
 
+from common.authentication import invalidate_token, invalidate_user_tokens
+from common.middleware import invalidate_domain_user
+from common.pagination import KeysetPagination
+from user_app.level.services import resolve_level_number
+
 
 # 注册视图：用于处理用户的注册请求
 class RegisterView(APIView):
@@ -46,7 +49,8 @@ class RegisterView(APIView):
         # 创建Django内置的认证用户
         user = AuthUser.objects.create_user(username=username, email=email, password=password)
         # 创建自定义用户模型
-        custom_user = User.objects.create(name=user.username, email=user.email, password=password)
+        custom_user = User.objects.create(name=user.username, email=user.email, password=password,
+                                          level=resolve_level_number(0, 0))
 
         return Response({"message": "User created successfully"}, status=status.HTTP_201_CREATED)
 
@@ -105,15 +109,10 @@ class UserProfileView(APIView):
 
     @staticmethod
     def get(request):
-        # 验证 Token
-        try:
-            token = request.headers.get('Authorization').split(' ')[1]  # 获取Bearer Token
-            token_obj = Token.objects.get(key=token)
-            user = token_obj.user
-        except Token.DoesNotExist:
-            raise AuthenticationFailed('Invalid Token')
-        # 获取自定义User模型的数据
-        user_info = User.objects.get(name=user.username)
+        # Token 已由认证类校验，直接取对应的业务用户
+        user_info = request.domain_user
+        if not user_info:
+            return Response({"detail": "用户未找到"}, status=status.HTTP_404_NOT_FOUND)
         # 序列化用户数据
         serializer = UserSerializer(user_info)
         return Response(serializer.data)
@@ -124,7 +123,12 @@ class UserProfileView(APIView):
         user = request.user  # 获取当前认证用户
 
         # 获取自定义User模型的数据
-        user_info = User.objects.get(name=user.username)
+        user_info = request.domain_user
+        if not user_info:
+            return Response({"detail": "用户未找到"}, status=status.HTTP_404_NOT_FOUND)
+        old_name = user_info.name
+        # 缓存中的业务用户只用于读取，修改前重新读取，避免写回过期的里程、购票数和等级
+        user_info = User.objects.get(pk=user_info.pk)
 
         # 获取Django的内置认证用户模型
         django_user = AuthUser.objects.get(id=user.id)  # 获取Django认证的User对象
@@ -142,6 +146,8 @@ class UserProfileView(APIView):
             if 'email' in request.data:  # 更新email字段
                 django_user.email = request.data['email']
             django_user.save()  # 保存Django内置的User模型
+            # 用户名变更后旧用户名的缓存不再被信号清除，需要单独清除
+            invalidate_domain_user(old_name)
 
             # 返回更新后的用户数据
             return Response(UserSerializer(updated_user).data)
@@ -161,21 +167,17 @@ class PassengerView(APIView):
     @staticmethod
     def get(request):
         # 获取当前登录的用户
-        user = request.user
-
-        # 显式获取 user 实例，避免 SimpleLazyObject 问题
-        try:
-            user = User.objects.get(name=user.username)
-        except ObjectDoesNotExist:
+        user = request.domain_user
+        if not user:
             return Response({"detail": "用户未找到"}, status=status.HTTP_404_NOT_FOUND)
 
+        pagination = KeysetPagination(request, ('id',))
         try:
             # 获取当前用户所有的乘机人
-            user_passengers = UserPassengerRelation.objects.filter(user=user)
-            passengers = [relation.passenger for relation in user_passengers]
+            passengers = pagination.paginate_queryset(Passenger.objects.filter(users__user=user))
             # 序列化乘机人数据
             serializer = PassengerSerializer(passengers, many=True)
-            return Response(serializer.data, status=status.HTTP_200_OK)
+            return pagination.get_response(serializer.data)
         except Exception as e:
             # 捕获异常并返回错误
             return Response({"detail": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -189,10 +191,8 @@ class PassengerView(APIView):
         if not user or not hasattr(user, 'id'):
             return Response({"detail": "用户无效或未登录"}, status=status.HTTP_400_BAD_REQUEST)
 
-        # 显式获取 user 实例，避免 SimpleLazyObject 问题
-        try:
-            user = User.objects.get(name=user.username)
-        except ObjectDoesNotExist:
+        user = request.domain_user
+        if not user:
             return Response({"detail": "用户未找到"}, status=status.HTTP_404_NOT_FOUND)
 
         # 使用序列化器验证和创建乘机人信息
@@ -222,12 +222,8 @@ class PassengerView(APIView):
     @staticmethod
     def put(request, pk):
         # 获取当前登录的用户
-        user = request.user
-
-        # 显式获取 user 实例，避免 SimpleLazyObject 问题
-        try:
-            user = User.objects.get(name=user.username)
-        except ObjectDoesNotExist:
+        user = request.domain_user
+        if not user:
             return Response({"detail": "用户未找到"}, status=status.HTTP_404_NOT_FOUND)
 
         # 获取需要更新的乘机人（通过关联表查询）
@@ -251,12 +247,8 @@ class PassengerView(APIView):
     @staticmethod
     def delete(request, pk):
         # 获取当前登录的用户
-        user = request.user
-
-        # 显式获取 user 实例，避免 SimpleLazyObject 问题
-        try:
-            user = User.objects.get(name=user.username)
-        except ObjectDoesNotExist:
+        user = request.domain_user
+        if not user:
             return Response({"detail": "用户未找到"}, status=status.HTTP_404_NOT_FOUND)
 
         # 获取并删除指定ID的乘机人（通过关联表查询）
@@ -281,17 +273,15 @@ class InvoiceView(APIView):
     @staticmethod
     def get(request):
         # 获取当前登录的用户
-        user = request.user
-        # 显式获取 user 实例，避免 SimpleLazyObject 问题
-        try:
-            user = User.objects.get(id=user.id)
-        except ObjectDoesNotExist:
+        user = request.domain_user
+        if not user:
             return Response({"detail": "用户未找到"}, status=status.HTTP_404_NOT_FOUND)
+        pagination = KeysetPagination(request, ('id',))
         try:
             # 获取当前用户的所有发票信息
-            invoices = Invoice.objects.filter(user=user)
+            invoices = pagination.paginate_queryset(Invoice.objects.filter(user=user))
             serializer = InvoiceSerializer(invoices, many=True)
-            return Response(serializer.data)
+            return pagination.get_response(serializer.data)
         except Exception as e:
             # 捕获异常并返回错误
             return Response({"detail": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -299,11 +289,8 @@ class InvoiceView(APIView):
     @staticmethod
     def post(request):
         # 获取当前登录的用户
-        user = request.user
-        # 显式获取 user 实例，避免 SimpleLazyObject 问题
-        try:
-            user = User.objects.get(id=user.id)
-        except ObjectDoesNotExist:
+        user = request.domain_user
+        if not user:
             return Response({"detail": "用户未找到"}, status=status.HTTP_404_NOT_FOUND)
         # 使用序列化器验证和创建发票信息
         serializer = InvoiceSerializer(data=request.data)
@@ -317,11 +304,8 @@ class InvoiceView(APIView):
     @staticmethod
     def put(request, pk):
         # 获取当前登录的用户
-        user = request.user
-        # 显式获取 user 实例，避免 SimpleLazyObject 问题
-        try:
-            user = User.objects.get(id=user.id)
-        except ObjectDoesNotExist:
+        user = request.domain_user
+        if not user:
             return Response({"detail": "用户未找到"}, status=status.HTTP_404_NOT_FOUND)
         # 获取并更新指定ID的发票信息
         invoice = Invoice.objects.get(id=pk, user=user)
@@ -336,11 +320,8 @@ class InvoiceView(APIView):
     @staticmethod
     def delete(request, pk):
         # 获取当前登录的用户
-        user = request.user
-        # 显式获取 user 实例，避免 SimpleLazyObject 问题
-        try:
-            user = User.objects.get(id=user.id)
-        except ObjectDoesNotExist:
+        user = request.domain_user
+        if not user:
             return Response({"detail": "用户未找到"}, status=status.HTTP_404_NOT_FOUND)
         # 获取并删除指定ID的发票信息
         invoice = Invoice.objects.get(id=pk, user=user)
@@ -378,14 +359,18 @@ def change_password(request):
     user = authenticate(request, username=user.username, password=old_password)
 
     if user is not None:
-        # 设置新密码（更新自定义用户模型）
-        user.password = new_password
-        user.save()
+        # 设置新密码（更新自定义用户模型），重新读取业务用户并只保存密码字段
+        domain_user = request.domain_user
+        if domain_user:
+            domain_user = User.objects.get(pk=domain_user.pk)
+            domain_user.password = new_password
+            domain_user.save(update_fields=['password'])
         # 更新Django认证用户（AuthUser）的密码
         try:
             django_user = AuthUser.objects.get(id=user.id)  # 获取对应的Django认证用户
             django_user.set_password(new_password)  # 设置新密码
             django_user.save()  # 保存更新后的Django认证用户密码
+            invalidate_user_tokens(django_user.id)  # 清除该用户的 Token 认证缓存
         except AuthUser.DoesNotExist:
             return Response({"error": "Django user not found."}, status=status.HTTP_400_BAD_REQUEST)
         return Response({"message": "Password updated successfully."}, status=status.HTTP_200_OK)
@@ -403,6 +388,9 @@ def logout_view(request):
 
     try:
         logout(request)
+        # 清除当前 Token 的认证缓存
+        if request.auth:
+            invalidate_token(request.auth.key)
         return Response({"detail": "Successfully logged out."}, status=status.HTTP_200_OK)
     except Exception as e:
         return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
@@ -417,7 +405,11 @@ class UploadAvatarView(APIView):
             user = request.user
             if not user.is_authenticated:
                 return Response({'error': '用户未登录'}, status=status.HTTP_401_UNAUTHORIZED)
-            user = User.objects.get(name=user.username)
+            user = request.domain_user
+            if not user:
+                return Response({'error': '用户未找到'}, status=status.HTTP_404_NOT_FOUND)
+            # 缓存中的业务用户只用于读取，修改前重新读取
+            user = User.objects.get(pk=user.pk)
 
             # 检查是否上传了头像文件
             new_avatar = request.FILES.get('avatar')
@@ -432,7 +424,7 @@ class UploadAvatarView(APIView):
 
             # 保存新头像
             user.avatar = new_avatar
-            user.save()
+            user.save(update_fields=['avatar'])
 
             # 返回新的头像 URL
             return Response({
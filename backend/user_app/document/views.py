@@ -3,9 +3,8 @@ from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
 from .models import Document
-from user_app.account.models import User, Passenger, UserPassengerRelation
+from user_app.account.models import Passenger, UserPassengerRelation
 from .serializers import DocumentSerializer
-from django.core.exceptions import ObjectDoesNotExist
 
 
 class DocumentView(APIView):
@@ -17,8 +16,9 @@ class DocumentView(APIView):
     @staticmethod
     def get(request, passenger_id):
         # 获取当前用户
-        auth_user = request.user
-        user = User.objects.get(name=auth_user.username)
+        user = request.domain_user
+        if not user:
+            return Response({"detail": "用户未找到"}, status=status.HTTP_404_NOT_FOUND)
         passenger = Passenger.objects.get(id=passenger_id)
 
         try:
@@ -39,10 +39,8 @@ class DocumentView(APIView):
     @staticmethod
     def post(request):
         # 创建新的证件信息
-        user = request.user
-        try:
-            user = User.objects.get(name=user.username)
-        except ObjectDoesNotExist:
+        user = request.domain_user
+        if not user:
             return Response({"detail": "用户未找到"}, status=status.HTTP_404_NOT_FOUND)
 
         # 从请求中获取数据
@@ -73,10 +71,8 @@ class DocumentView(APIView):
             return Response({"detail": "证件未找到"}, status=status.HTTP_404_NOT_FOUND)
 
         # 验证当前用户是否有权修改此证件（通过证件关联的乘客检查）
-        user = request.user
-        try:
-            user = User.objects.get(name=user.username)
-        except ObjectDoesNotExist:
+        user = request.domain_user
+        if not user:
             return Response({"detail": "用户未找到"}, status=status.HTTP_404_NOT_FOUND)
 
         passenger = document.passenger
@@ -103,10 +99,8 @@ class DocumentView(APIView):
             return Response({"detail": "证件未找到"}, status=status.HTTP_404_NOT_FOUND)
 
         # 验证当前用户是否有权删除此证件（通过证件关联的乘客检查）
-        user = request.user
-        try:
-            user = User.objects.get(id=user.id)
-        except ObjectDoesNotExist:
+        user = request.domain_user
+        if not user:
             return Response({"detail": "用户未找到"}, status=status.HTTP_404_NOT_FOUND)
         passenger = document.passenger
         try:
@@ -135,10 +129,8 @@ class PassengerDocumentView(APIView):
             return Response({"detail": "乘客未找到"}, status=status.HTTP_404_NOT_FOUND)
 
         # 验证当前用户是否有权查看此乘客的证件信息
-        user = request.user
-        try:
-            user = User.objects.get(id=user.id)
-        except ObjectDoesNotExist:
+        user = request.domain_user
+        if not user:
             return Response({"detail": "用户未找到"}, status=status.HTTP_404_NOT_FOUND)
 
         if not UserPassengerRelation.objects.filter(user=user, passenger=passenger).exists():
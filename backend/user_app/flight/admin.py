@@ -1,8 +1,25 @@
+import io
 from datetime import datetime
-from django.contrib import admin
+from django import forms
+from django.contrib import admin, messages
+from django.shortcuts import redirect
+from django.template.response import TemplateResponse
+from django.urls import path
 
 from backend.admin_site import custom_admin_site
+from .cache import invalidate_flight_search
+from .inventory import return_seats
 from .models import Order, Plane, City, Airport, Flight, Ticket
+from .pricing import reprice_flights
+from .schedule_import import FORMATS, import_schedule
+
+
+class ScheduleImportForm(forms.Form):
+    kind = forms.ChoiceField(label="数据类型", choices=[
+        ('city', '城市'), ('airport', '机场'), ('plane', '飞机'), ('flight', '航班'), ('ticket', '机票'),
+    ])
+    format = forms.ChoiceField(label="文件格式", choices=[(fmt, fmt.upper()) for fmt in FORMATS])
+    file = forms.FileField(label="文件")
 
 
 @admin.register(Plane, site=custom_admin_site)
@@ -34,16 +51,66 @@ class FlightAdmin(admin.ModelAdmin):
     list_filter = ('departure_airport', 'arrival_airport', 'departure_time', 'arrival_time')
     search_fields = ('flight_id', 'departure_airport__airport_name', 'arrival_airport__airport_name')
     ordering = ('departure_time',)
-    actions = ['adjust_seat_availability']
+    actions = ['adjust_seat_availability', 'reprice']
+    change_list_template = 'admin/flight/flight/change_list.html'
+
+    def get_urls(self):
+        return [
+            path('import/', self.admin_site.admin_view(self.import_schedule_view), name='flight_flight_import'),
+        ] + super().get_urls()
+
+    def import_schedule_view(self, request):
+        """
+        上传 CSV 或 JSON Lines 时刻表文件批量导入，上传的文件按流读取，不整体载入内存。
+        """
+        form = ScheduleImportForm(request.POST or None, request.FILES or None)
+        if request.method == 'POST' and form.is_valid():
+            stream = io.TextIOWrapper(form.cleaned_data['file'].file, encoding='utf-8-sig', newline='')
+            report = import_schedule(form.cleaned_data['kind'], stream, form.cleaned_data['format'])
+            self.message_user(request, f"导入完成：{report}",
+                              messages.WARNING if report.error_count else messages.SUCCESS)
+            for line, message in report.errors[:20]:
+                self.message_user(request, f"第 {line} 行：{message}", messages.ERROR)
+            return redirect('custom_admin:flight_flight_changelist')
+
+        return TemplateResponse(request, 'admin/flight/flight/import_schedule.html', {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': "导入航班时刻表",
+            'form': form,
+        })
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        invalidate_flight_search(obj)
+        # 修改起降机场后航班离开原航线，原航线的缓存同样失效
+        if change and {'departure_airport', 'arrival_airport'} & set(form.changed_data):
+            invalidate_flight_search(Flight(departure_airport_id=form.initial['departure_airport'],
+                                            arrival_airport_id=form.initial['arrival_airport']))
+
+    def delete_model(self, request, obj):
+        invalidate_flight_search(obj)
+        super().delete_model(request, obj)
+
+    def delete_queryset(self, request, queryset):
+        for flight in queryset.select_related('departure_airport', 'arrival_airport'):
+            invalidate_flight_search(flight)
+        super().delete_queryset(request, queryset)
 
     def adjust_seat_availability(self, request, queryset):
-        for flight in queryset:
-            flight.remaining_economy_seats += 5  # 示例：批量增加经济舱座位
-            flight.save()
+        for flight in queryset.select_related('departure_airport', 'arrival_airport'):
+            return_seats(flight.flight_id, 'economy', 5)  # 示例：批量增加经济舱座位
+            invalidate_flight_search(flight)
         self.message_user(request, "已成功调整航班座位数量！")
 
     adjust_seat_availability.short_description = "批量调整座位数量"
 
+    def reprice(self, request, queryset):
+        flights, created, updated = reprice_flights(list(queryset.values_list('flight_id', flat=True)))
+        self.message_user(request, f"已为 {flights} 个航班重新定价：新建机票 {created} 张，更新票价 {updated} 张")
+
+    reprice.short_description = "按航程与上座率重新定价"
+
 
 @admin.register(Ticket, site=custom_admin_site)
 class TicketAdmin(admin.ModelAdmin):
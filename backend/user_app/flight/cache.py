@@ -0,0 +1,74 @@
+from django.core.cache import cache
+from django.db import transaction
+
+from common.versioning import get_version, bump_version
+
+# 航班搜索结果缓存时间（秒），版本号失效后旧数据最多保留这么久
+SEARCH_CACHE_TIMEOUT = 300
+# 票价日历缓存时间（秒），与搜索缓存共用航线版本号
+FARE_CALENDAR_CACHE_TIMEOUT = 600
+
+
+def _version_key(departure_city_code, arrival_city_code):
+    return f"flight_search:version:{departure_city_code}:{arrival_city_code}"
+
+
+def get_route_version(departure_city_code, arrival_city_code):
+    """
+    获取某条航线（城市对）的缓存版本号。
+    """
+    return get_version(_version_key(departure_city_code, arrival_city_code))
+
+
+def bump_route_version(departure_city_code, arrival_city_code):
+    """
+    使某条航线的搜索缓存失效。
+    """
+    bump_version(_version_key(departure_city_code, arrival_city_code))
+
+
+def search_cache_key(departure_city_code, arrival_city_code, departure_date):
+    version = get_route_version(departure_city_code, arrival_city_code)
+    return f"flight_search:{departure_city_code}:{arrival_city_code}:{departure_date or 'all'}:{version}"
+
+
+def get_cached_search(departure_city_code, arrival_city_code, departure_date):
+    """
+    读取缓存的航班搜索结果，返回 (缓存键, 结果)，未命中时结果为 None。
+    """
+    key = search_cache_key(departure_city_code, arrival_city_code, departure_date)
+    return key, cache.get(key)
+
+
+def set_cached_search(key, flight_data):
+    cache.set(key, flight_data, SEARCH_CACHE_TIMEOUT)
+
+
+def fare_calendar_cache_key(departure_city_code, arrival_city_code, month):
+    """
+    某条航线某个月（date，取该月第一天）的票价日历缓存键。
+    """
+    version = get_route_version(departure_city_code, arrival_city_code)
+    return f"fare_calendar:{departure_city_code}:{arrival_city_code}:{month:%Y-%m}:{version}"
+
+
+def invalidate_flight_search(flight):
+    """
+    航班座位或信息发生变化时调用，在事务提交后使该航班所在航线的搜索缓存失效。
+    """
+    departure_city_code = flight.departure_airport.city_id
+    arrival_city_code = flight.arrival_airport.city_id
+    transaction.on_commit(lambda: bump_route_version(departure_city_code, arrival_city_code))
+
+
+def invalidate_flights_search(flight_ids):
+    """
+    按航班号批量使搜索缓存失效，用于绕过模型 save 的批量写入。
+    """
+    from .models import Flight
+
+    routes = set(
+        Flight.objects.filter(flight_id__in=list(flight_ids))
+        .values_list('departure_airport__city_id', 'arrival_airport__city_id')
+    )
+    transaction.on_commit(lambda: [bump_route_version(*route) for route in routes])
@@ -0,0 +1,127 @@
+import threading
+import time
+
+from common.versioning import get_version, bump_version
+
+CITY_INDEX_VERSION_KEY = "city_index:version"
+
+# 两次检查缓存中版本号的最小间隔（秒）。其他进程中的城市变更最多延迟这么久生效，
+# 本进程中的变更通过 invalidate_city_index 立即生效
+VERSION_CHECK_INTERVAL = 5
+
+# 建立子串索引的最大关键字长度，超过此长度的查询退化为线性扫描
+MAX_INDEXED_LENGTH = 32
+
+
+class CityIndex:
+    """
+    进程内的城市自动补全索引。
+
+    对城市名、拼音首字母和完整拼音的所有前缀和子串建立倒排表，
+    倒排表中的城市按拼音首字母排序，查询时无需访问数据库。
+    索引在首次查询时构建，城市变更时通过缓存中的版本号通知所有进程重建；
+    版本号最多每 VERSION_CHECK_INTERVAL 秒检查一次，查询通常不访问缓存。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._checked_at = None
+        self._cities = []
+        self._full_pinyins = []
+        self._prefixes = {}
+        self._substrings = {}
+
+    def _build(self, version):
+        from .models import City
+
+        rows = sorted(
+            City.objects.values_list('city_code', 'city_name', 'pinyin', 'full_pinyin'),
+            # 在 Python 中排序，保证与游标分页的比较规则一致
+            key=lambda row: (row[2] or '', row[0]),
+        )
+        cities = [
+            {
+                "city_name": city_name,
+                "city_code": city_code,
+                "pinyin": pinyin,
+            }
+            for city_code, city_name, pinyin, _ in rows
+        ]
+        # 完整拼音在保存城市时预先计算，建索引时不再调用 pypinyin
+        full_pinyins = [(full_pinyin or '').lower() for _, _, _, full_pinyin in rows]
+
+        prefixes = {}
+        substrings = {}
+        for position, city in enumerate(cities):
+            keys = {
+                city["city_name"].lower(),
+                (city["pinyin"] or '').lower(),
+                full_pinyins[position],
+            }
+            city_prefixes = set()
+            city_substrings = set()
+            for key in keys:
+                key = key[:MAX_INDEXED_LENGTH]
+                for start in range(len(key)):
+                    for end in range(start + 1, len(key) + 1):
+                        city_substrings.add(key[start:end])
+                        if start == 0:
+                            city_prefixes.add(key[:end])
+            # 按城市顺序追加，倒排表天然保持拼音排序
+            for prefix in city_prefixes:
+                prefixes.setdefault(prefix, []).append(position)
+            for substring in city_substrings:
+                substrings.setdefault(substring, []).append(position)
+
+        self._cities, self._full_pinyins, self._prefixes, self._substrings = cities, full_pinyins, prefixes, substrings
+        self._version = version
+
+    def _ensure_current(self):
+        now = time.monotonic()
+        if self._checked_at is not None and now - self._checked_at < VERSION_CHECK_INTERVAL:
+            return
+        version = get_version(CITY_INDEX_VERSION_KEY)
+        if version != self._version:
+            with self._lock:
+                if version != self._version:
+                    self._build(version)
+        self._checked_at = now
+
+    def expire(self):
+        """下次查询时立即检查版本号"""
+        self._checked_at = None
+
+    def search(self, query='', prefix=False):
+        """
+        按城市名、拼音首字母或完整拼音查询城市，结果按拼音首字母排序。
+        prefix 为 True 时只做前缀匹配，否则做子串匹配。
+        """
+        self._ensure_current()
+        cities = self._cities
+        query = query.strip().lower()
+        if not query:
+            return list(cities)
+
+        if len(query) <= MAX_INDEXED_LENGTH:
+            index = self._prefixes if prefix else self._substrings
+            return [cities[position] for position in index.get(query, ())]
+
+        def matches(key):
+            return key.startswith(query) if prefix else query in key
+
+        return [
+            city for city, full_pinyin in zip(cities, self._full_pinyins)
+            if matches(city["city_name"].lower()) or matches((city["pinyin"] or '').lower()) or matches(full_pinyin)
+        ]
+
+
+city_index = CityIndex()
+
+
+def invalidate_city_index():
+    """
+    城市数据变化后调用。本进程在下次查询时重建索引，其他进程最多延迟 VERSION_CHECK_INTERVAL 秒。
+    """
+    bump_version(CITY_INDEX_VERSION_KEY)
+    city_index.expire()
@@ -0,0 +1,197 @@
+import heapq
+import threading
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict, namedtuple
+from datetime import datetime, timedelta
+
+from django.core.cache import cache
+from django.db import transaction
+
+from common.versioning import get_version, bump_version
+
+# 默认最短中转时间与最长中转等待时间
+DEFAULT_MIN_CONNECTION = timedelta(minutes=60)
+DEFAULT_MAX_LAYOVER = timedelta(hours=6)
+# 最多中转次数
+MAX_STOPS = 2
+# 每个进程最多保留的天数，超出后淘汰最早加载的一天
+MAX_CACHED_DAYS = 90
+
+Leg = namedtuple('Leg', [
+    'flight_id', 'departure_airport_id', 'arrival_airport_id', 'departure_city', 'arrival_city',
+    'departure_airport', 'arrival_airport', 'departure_time', 'arrival_time', 'min_price',
+])
+
+LEG_FIELDS = (
+    'flight_id', 'departure_airport_id', 'arrival_airport_id', 'departure_airport__city_id',
+    'arrival_airport__city_id', 'departure_airport__airport_name', 'arrival_airport__airport_name',
+    'departure_time', 'arrival_time', 'fare_summary__min_price',
+)
+
+
+def _version_key(day):
+    return f"connection_graph:version:{day.isoformat()}"
+
+
+class DayBucket:
+    """
+    某一天起飞的全部航班，按起飞机场分组并按起飞时间排序，另按起飞城市分组供第一程使用。
+    """
+
+    def __init__(self, version, legs):
+        self.version = version
+        by_airport = {}
+        by_city = {}
+        for leg in sorted(legs, key=lambda leg: (leg.departure_time, leg.flight_id)):
+            by_airport.setdefault(leg.departure_airport_id, []).append(leg)
+            by_city.setdefault(leg.departure_city, []).append(leg)
+        self.by_airport = {
+            airport_id: ([leg.departure_time for leg in airport_legs], airport_legs)
+            for airport_id, airport_legs in by_airport.items()
+        }
+        self.by_city = by_city
+
+    def departures(self, airport_id, earliest, latest):
+        """
+        从某机场在 [earliest, latest] 内起飞的航班，二分查找定位。
+        """
+        times, legs = self.by_airport.get(airport_id, ((), ()))
+        return legs[bisect_left(times, earliest):bisect_right(times, latest)]
+
+
+class ConnectionGraph:
+    """
+    进程内的按天展开的航班时刻图，用于中转航班搜索。
+
+    每天一个分桶，分桶在首次使用时用一次查询加载。航班或票价变更时只递增所在日期的版本号，
+    各进程在下次用到该天时重新加载这一天，其余日期不受影响。
+    搜索时从出发城市当天的航班出发，在到达机场按最短中转时间和最长等待时间二分截取可衔接的航班，
+    只在内存中遍历，不对航班表做自连接。
+    """
+
+    def __init__(self, max_days=MAX_CACHED_DAYS):
+        self._lock = threading.Lock()
+        self._max_days = max_days
+        self._buckets = OrderedDict()
+
+    @staticmethod
+    def _load(day, version):
+        from .models import Flight
+
+        start = datetime.combine(day, datetime.min.time())
+        rows = Flight.objects.filter(
+            departure_time__gte=start, departure_time__lt=start + timedelta(days=1),
+        ).values_list(*LEG_FIELDS)
+        return DayBucket(version, [Leg(*row) for row in rows.iterator()])
+
+    def _versions(self, days):
+        keys = {day: _version_key(day) for day in days}
+        found = cache.get_many(keys.values())
+        return {day: found[key] if key in found else get_version(key) for day, key in keys.items()}
+
+    def _bucket(self, day, versions):
+        """
+        取某一天的分桶，versions 为本次搜索已读取的版本号，避免同一次搜索重复访问缓存。
+        """
+        if day not in versions:
+            versions.update(self._versions([day]))
+        version = versions[day]
+        bucket = self._buckets.get(day)
+        if bucket is None or bucket.version != version:
+            with self._lock:
+                bucket = self._buckets.get(day)
+                if bucket is None or bucket.version != version:
+                    bucket = self._load(day, version)
+                    self._buckets[day] = bucket
+                    while len(self._buckets) > self._max_days:
+                        self._buckets.popitem(last=False)
+        return bucket
+
+    def _departures(self, airport_id, earliest, latest, versions):
+        day = earliest.date()
+        while day <= latest.date():
+            yield from self._bucket(day, versions).departures(airport_id, earliest, latest)
+            day += timedelta(days=1)
+
+    def search(self, departure_city, arrival_city, day, max_stops=MAX_STOPS,
+               min_connection=DEFAULT_MIN_CONNECTION, max_layover=DEFAULT_MAX_LAYOVER,
+               sort='duration', limit=20):
+        """
+        搜索某天从出发城市到到达城市、最多中转 max_stops 次的行程（包含直飞），同一机场内中转。
+        sort 为 duration 时按总耗时排序，为 price 时按各航段最低成人票价之和排序，返回前 limit 个行程，
+        每个行程是按顺序排列的航段（Leg）列表。
+        """
+        versions = self._versions([day, day + timedelta(days=1)])
+        itineraries = []
+
+        def visit(path, visited_cities):
+            last = path[-1]
+            if last.arrival_city == arrival_city:
+                itineraries.append(tuple(path))
+                return
+            if len(path) > max_stops:
+                return
+            # 最后一程只需考虑飞往目的城市的航班
+            final = len(path) == max_stops
+            earliest = last.arrival_time + min_connection
+            for leg in self._departures(last.arrival_airport_id, earliest, last.arrival_time + max_layover, versions):
+                if final and leg.arrival_city != arrival_city:
+                    continue
+                # 不重复经过同一城市
+                if leg.arrival_city not in visited_cities:
+                    path.append(leg)
+                    visited_cities.add(leg.arrival_city)
+                    visit(path, visited_cities)
+                    visited_cities.discard(leg.arrival_city)
+                    path.pop()
+
+        for first in self._bucket(day, versions).by_city.get(departure_city, ()):
+            if first.arrival_city != departure_city:
+                visit([first], {departure_city, first.arrival_city})
+
+        return heapq.nsmallest(limit, itineraries, key=SORT_KEYS[sort])
+
+
+def itinerary_duration(legs):
+    return legs[-1].arrival_time - legs[0].departure_time
+
+
+def itinerary_price(legs):
+    """
+    各航段最低成人票价之和，任一航段没有票价时为 None。
+    """
+    prices = [leg.min_price for leg in legs]
+    return None if None in prices else sum(prices)
+
+
+def _price_key(legs):
+    price = itinerary_price(legs)
+    return price is None, price or 0, itinerary_duration(legs), len(legs)
+
+
+SORT_KEYS = {
+    'duration': lambda legs: (itinerary_duration(legs), len(legs), legs[0].departure_time),
+    'price': _price_key,
+}
+
+connection_graph = ConnectionGraph()
+
+
+def invalidate_connection_days(days):
+    """
+    航班或票价变化后调用，在事务提交后使相应日期的时刻图失效，各进程下次用到这些日期时重新加载。
+    """
+    days = set(days)
+    transaction.on_commit(lambda: [bump_version(_version_key(day)) for day in days])
+
+
+def invalidate_connection_flights(flight_ids):
+    """
+    按航班号使其起飞日期的时刻图失效，用于绕过模型 save 的批量写入和机票变更。
+    """
+    from .models import Flight
+
+    invalidate_connection_days(
+        departure_time.date() for departure_time in
+        Flight.objects.filter(flight_id__in=list(flight_ids)).values_list('departure_time', flat=True)
+    )
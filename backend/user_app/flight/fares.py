@@ -0,0 +1,134 @@
+from datetime import datetime, timedelta
+
+from django.core.cache import cache
+from django.db.models import Count, Min, Q
+from django.db.models.functions import TruncDate
+
+from common.bulk import bulk_upsert
+from .cache import FARE_CALENDAR_CACHE_TIMEOUT, fare_calendar_cache_key
+from .inventory import SEAT_FIELDS
+from .models import FareSummary, Flight, Ticket
+
+# 座位类型与票价汇总字段的对应关系
+MIN_PRICE_FIELDS = {
+    'economy': 'min_economy_price',
+    'business': 'min_business_price',
+    'first_class': 'min_first_class_price',
+}
+# 刷新票价汇总时覆盖的字段
+FARE_SUMMARY_FIELDS = ['min_price', 'min_price_seat_type', *MIN_PRICE_FIELDS.values()]
+
+
+def build_fare_summaries(flight_ids):
+    """
+    用一次分组查询计算给定航班的票价汇总（不保存）。
+    """
+    summaries = {flight_id: FareSummary(flight_id=flight_id) for flight_id in flight_ids}
+    rows = (
+        Ticket.objects.filter(flight_id__in=flight_ids, ticket_type='adult')
+        .values('flight_id', 'seat_type')
+        .annotate(min_price=Min('price'))
+    )
+    for row in rows:
+        summary = summaries[row['flight_id']]
+        field = MIN_PRICE_FIELDS.get(row['seat_type'])
+        if field:
+            setattr(summary, field, row['min_price'])
+        if summary.min_price is None or row['min_price'] < summary.min_price:
+            summary.min_price = row['min_price']
+            summary.min_price_seat_type = row['seat_type']
+    return list(summaries.values())
+
+
+def refresh_fare_summaries(flight_ids, batch_size=1000):
+    """
+    重新计算并保存给定航班的票价汇总，机票批量变更后调用。
+    """
+    # 忽略已被删除的航班
+    flight_ids = list(Flight.objects.filter(flight_id__in=set(flight_ids)).values_list('flight_id', flat=True))
+    for start in range(0, len(flight_ids), batch_size):
+        batch = flight_ids[start:start + batch_size]
+        # 按主键插入或覆盖，并发刷新同一航班不会因先删后插而主键冲突
+        bulk_upsert(FareSummary, build_fare_summaries(batch), FARE_SUMMARY_FIELDS)
+
+
+# 票价日历一次最多查询的天数
+MAX_CALENDAR_DAYS = 62
+
+
+def _month_start(day):
+    return day.replace(day=1)
+
+
+def _next_month(month):
+    return (month + timedelta(days=32)).replace(day=1)
+
+
+def _calendar_rows(departure_city_code, arrival_city_code, start, end):
+    """
+    用一次分组查询统计 [start, end) 内每天的航班数、有余票的航班数和有余票舱位的最低成人票价。
+    """
+    # 机票所在舱位仍有剩余座位
+    available = Q()
+    for seat_type, field in SEAT_FIELDS.items():
+        available |= Q(seat_type=seat_type, **{f"flight__{field}__gt": 0})
+
+    return (
+        Ticket.objects.filter(
+            ticket_type='adult',
+            flight__departure_airport__city_id=departure_city_code,
+            flight__arrival_airport__city_id=arrival_city_code,
+            flight__departure_time__gte=datetime.combine(start, datetime.min.time()),
+            flight__departure_time__lt=datetime.combine(end, datetime.min.time()),
+        )
+        .annotate(day=TruncDate('flight__departure_time'))
+        .values('day')
+        .annotate(
+            flight_count=Count('flight', distinct=True),
+            available_flight_count=Count('flight', distinct=True, filter=available),
+            min_price=Min('price', filter=available),
+        )
+        .order_by()
+    )
+
+
+def fare_calendar(departure_city_code, arrival_city_code, start, end):
+    """
+    航线在 [start, end]（含两端）内每天的最低成人票价与余票情况，没有航班的日期各项为空或 0。
+    结果按航线和月份缓存，随航线版本号（座位或票价变化时递增）失效；未命中缓存的月份合并为一次查询。
+    """
+    months = []
+    month = _month_start(start)
+    while month <= end:
+        months.append(month)
+        month = _next_month(month)
+
+    keys = {month: fare_calendar_cache_key(departure_city_code, arrival_city_code, month) for month in months}
+    cached = cache.get_many(keys.values())
+    days = {}
+    missing = []
+    for month in months:
+        if keys[month] in cached:
+            days.update(cached[keys[month]])
+        else:
+            missing.append(month)
+
+    if missing:
+        computed = {month: {} for month in missing}
+        for row in _calendar_rows(departure_city_code, arrival_city_code, missing[0], _next_month(missing[-1])):
+            day = row.pop('day')
+            month = _month_start(day)
+            # 首尾之间已缓存的月份不需要重复保存
+            if month in computed:
+                computed[month][day] = row
+        cache.set_many({keys[month]: data for month, data in computed.items()}, FARE_CALENDAR_CACHE_TIMEOUT)
+        for data in computed.values():
+            days.update(data)
+
+    empty = {"flight_count": 0, "available_flight_count": 0, "min_price": None}
+    calendar = []
+    day = start
+    while day <= end:
+        calendar.append({"date": day, **days.get(day, empty)})
+        day += timedelta(days=1)
+    return calendar
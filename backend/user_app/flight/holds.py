@@ -0,0 +1,169 @@
+from collections import Counter
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count
+
+from .inventory import SEAT_FIELDS
+from .models import Flight, Order, Ticket
+
+
+def _hold_key(flight_id, seat_type):
+    return f"seat_hold:{flight_id}:{seat_type}"
+
+
+def _counter_timeout():
+    """
+    预留计数器的过期时间，每次预留时重置。计数器过期时其中的预留都已超时至少一个预留时长，
+    清理任务有足够时间先释放它们；计数器与数据库出现偏差时，航班一段时间无人下单后自动恢复。
+    """
+    return 2 * settings.SEAT_HOLD_TIMEOUT
+
+
+def held_seats(flight_id, seat_type):
+    """
+    航班某舱位当前被待支付订单预留的座位数。
+    """
+    return cache.get(_hold_key(flight_id, seat_type), 0)
+
+
+def held_seats_many(flight_id):
+    """
+    航班各舱位当前被预留的座位数，一次读取。
+    """
+    keys = {_hold_key(flight_id, seat_type): seat_type for seat_type in SEAT_FIELDS}
+    values = cache.get_many(keys)
+    return {seat_type: values.get(key, 0) for key, seat_type in keys.items()}
+
+
+def hold_seats(flight_id, seat_type, count=1):
+    """
+    为待支付订单预留座位。
+
+    预留数记在 Redis 计数器中，只要预留总数不超过数据库中的剩余座位数即预留成功。
+    下单时不修改航班记录，支付成功后才真正扣减座位，超时未支付的预留由清理任务批量释放。
+    计数器在最后一次预留后 2 × SEAT_HOLD_TIMEOUT 过期。
+    """
+    remaining = Flight.objects.filter(flight_id=flight_id).values_list(SEAT_FIELDS[seat_type], flat=True).first()
+    if remaining is None:
+        return False
+
+    key = _hold_key(flight_id, seat_type)
+    timeout = _counter_timeout()
+    cache.add(key, 0, timeout)
+    try:
+        held = cache.incr(key, count)
+    except ValueError:
+        # 计数器恰好在 add 之后过期
+        cache.add(key, 0, timeout)
+        held = cache.incr(key, count)
+    cache.touch(key, timeout)
+    if held > remaining:
+        release_holds(flight_id, seat_type, count)
+        return False
+    return True
+
+
+def release_holds(flight_id, seat_type, count=1):
+    """
+    释放座位预留。
+    """
+    key = _hold_key(flight_id, seat_type)
+    try:
+        held = cache.decr(key, count)
+        if held < 0:
+            # 释放了不在计数器中的预留（计数器过期后重建），补回多减的部分，不让计数器为负
+            cache.incr(key, -held)
+    except ValueError:
+        # 计数器不存在说明已过期或被重置，无需释放
+        pass
+
+
+def hold_expires_at(order):
+    """
+    订单座位预留的过期时间。
+    """
+    return order.purchase_time + timedelta(seconds=settings.SEAT_HOLD_TIMEOUT)
+
+
+def is_hold_expired(order, now=None):
+    return hold_expires_at(order) <= (now or datetime.now())
+
+
+def expire_pending_orders(now=None, batch_size=500):
+    """
+    批量取消超时未支付的订单并释放其座位预留，返回取消的订单数。
+    """
+    cutoff = (now or datetime.now()) - timedelta(seconds=settings.SEAT_HOLD_TIMEOUT)
+    expired_count = 0
+
+    while True:
+        with transaction.atomic():
+            # 只锁订单行，避免与正在支付的订单并发修改
+            expired = list(
+                Order.objects.select_for_update()
+                .filter(status='pending', purchase_time__lt=cutoff)
+                .order_by('order_id')
+                .values_list('order_id', 'ticket_id')[:batch_size]
+            )
+            if not expired:
+                break
+
+            order_ids = [order_id for order_id, _ in expired]
+            Order.objects.filter(order_id__in=order_ids).update(status='canceled')
+
+            tickets = {
+                ticket_id: (flight_id, seat_type)
+                for ticket_id, flight_id, seat_type in Ticket.objects.filter(
+                    ticket_id__in={ticket_id for _, ticket_id in expired}
+                ).values_list('ticket_id', 'flight_id', 'seat_type')
+            }
+            released = Counter(tickets[ticket_id] for _, ticket_id in expired)
+            transaction.on_commit(lambda released=released: _release_many(released))
+
+        expired_count += len(expired)
+
+    return expired_count
+
+
+def _release_many(released):
+    for (flight_id, seat_type), count in released.items():
+        release_holds(flight_id, seat_type, count)
+
+
+def reconcile_holds(now=None, batch_size=1000):
+    """
+    根据数据库中未过期的待支付订单重新计算所有未起飞航班的预留计数器，用于修复计数器偏差。
+    """
+    now = now or datetime.now()
+    cutoff = now - timedelta(seconds=settings.SEAT_HOLD_TIMEOUT)
+    live_holds = Counter({
+        (row['ticket__flight_id'], row['ticket__seat_type']): row['count']
+        for row in Order.objects.filter(status='pending', purchase_time__gte=cutoff)
+        .values('ticket__flight_id', 'ticket__seat_type')
+        .annotate(count=Count('order_id'))
+    })
+
+    flight_ids = Flight.objects.filter(departure_time__gt=now).values_list('flight_id', flat=True)
+    set_hold_counters((
+        ((flight_id, seat_type), live_holds[(flight_id, seat_type)])
+        for flight_id in flight_ids.iterator() for seat_type in SEAT_FIELDS
+    ), batch_size=batch_size)
+
+
+def set_hold_counters(counts, batch_size=1000):
+    """
+    按 ((航班号, 座位类型), 预留数) 直接写入预留计数器。
+    """
+    timeout = _counter_timeout()
+    batch = {}
+    for (flight_id, seat_type), count in counts:
+        batch[_hold_key(flight_id, seat_type)] = count
+        if len(batch) >= batch_size:
+            cache.set_many(batch, timeout)
+            batch = {}
+    if batch:
+        cache.set_many(batch, timeout)
+
@@ -0,0 +1,33 @@
+from django.db.models import F
+
+from .models import Flight
+
+# 座位类型与航班剩余座位字段的对应关系
+SEAT_FIELDS = {
+    'economy': 'remaining_economy_seats',
+    'business': 'remaining_business_seats',
+    'first_class': 'remaining_first_class_seats',
+}
+
+
+def take_seats(flight_id, seat_type, count=1):
+    """
+    扣减航班某舱位的剩余座位。
+
+    使用带条件的原子更新（UPDATE ... SET seats = seats - n WHERE seats >= n），
+    只锁定一次更新所需的时间，不再需要 SELECT ... FOR UPDATE 锁住整行后再写回。
+    座位不足时不做修改并返回 False。
+    """
+    field = SEAT_FIELDS[seat_type]
+    updated = Flight.objects.filter(flight_id=flight_id, **{f"{field}__gte": count}).update(
+        **{field: F(field) - count}
+    )
+    return updated == 1
+
+
+def return_seats(flight_id, seat_type, count=1):
+    """
+    退还航班某舱位的座位。
+    """
+    field = SEAT_FIELDS[seat_type]
+    Flight.objects.filter(flight_id=flight_id).update(**{field: F(field) + count})
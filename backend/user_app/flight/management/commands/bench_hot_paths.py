@@ -0,0 +1,142 @@
+import random
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand
+from django.db.migrations.recorder import MigrationRecorder
+
+from common.benchmark import measure
+from user_app.account.models import Passenger
+from user_app.flight.models import Airport, City, FareSummary, Flight, Order, Plane, Ticket
+
+BENCH_PLANE_ID = 'BHOT'
+BENCH_CITY_PREFIX = 'BH'
+BENCH_PASSENGER_NAME = 'bench-hot-path'
+FIRST_FLIGHT_ID = 1_000_000_000
+SEAT_TYPES = ('economy', 'business', 'first_class')
+
+
+class Command(BaseCommand):
+    help = ("热点查询压测：可选地向本地数据库灌入大量航班和订单，输出各接口查询的 EXPLAIN 计划和 p50/p99 延迟。"
+            "在 migrate flight 0003 与 migrate flight 之后分别运行，可对比加索引前后的效果。")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', action='store_true', help="灌入压测数据")
+        parser.add_argument('--cleanup', action='store_true', help="删除压测数据后退出")
+        parser.add_argument('--flights', type=int, default=100_000)
+        parser.add_argument('--orders', type=int, default=1_000_000)
+        parser.add_argument('--passengers', type=int, default=10_000)
+        parser.add_argument('--cities', type=int, default=50)
+        parser.add_argument('--runs', type=int, default=200, help="每个查询的执行次数")
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        if options['cleanup']:
+            self._cleanup()
+            return
+
+        if options['seed']:
+            self._seed(options)
+
+        latest = MigrationRecorder.Migration.objects.filter(app='flight').order_by('-id').first()
+        self.stdout.write(f"当前 flight 迁移：{latest.name if latest else '无'}")
+
+        rng = random.Random(0)
+        city_codes = list(City.objects.filter(city_code__startswith=BENCH_CITY_PREFIX)
+                          .values_list('city_code', flat=True))
+        passenger_ids = list(Passenger.objects.filter(name=BENCH_PASSENGER_NAME).values_list('id', flat=True))
+        flight_ids = list(Flight.objects.filter(plane_id=BENCH_PLANE_ID).values_list('flight_id', flat=True)[:10000])
+        ticket_ids = list(Ticket.objects.filter(flight_id__in=flight_ids).values_list('ticket_id', flat=True))
+        if not city_codes or not passenger_ids or not ticket_ids:
+            self.stderr.write("没有压测数据，请先使用 --seed 灌入")
+            return
+
+        def search():
+            departure, arrival = rng.sample(city_codes, 2)
+            start = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=rng.randrange(365))
+            return Flight.objects.filter(
+                departure_airport__city_id=departure, arrival_airport__city_id=arrival,
+                departure_time__gte=start, departure_time__lt=start + timedelta(days=1),
+            ).order_by('departure_time', 'flight_id').values_list(
+                'flight_id', 'departure_airport__airport_name', 'arrival_airport__airport_name', 'plane__model',
+                'fare_summary__min_price')
+
+        def user_orders():
+            passengers = rng.sample(passenger_ids, 3)
+            return Order.objects.filter(passenger_id__in=passengers, status='confirmed').order_by('-purchase_time')
+
+        def purchase_check():
+            return Order.objects.filter(ticket_id=rng.choice(ticket_ids), passenger_id=rng.choice(passenger_ids),
+                                        status='confirmed')
+
+        def min_price():
+            return Ticket.objects.filter(flight_id=rng.choice(flight_ids), ticket_type='adult').order_by('price')[:1]
+
+        queries = {
+            'SearchFlightView': search,
+            'UserOrdersView': user_orders,
+            'PurchaseTicketView': purchase_check,
+            'MinimumTicketPriceView': min_price,
+        }
+
+        for name, build in queries.items():
+            self.stdout.write(f"\n== {name}")
+            self.stdout.write(build().explain())
+            p50, p99 = measure(lambda: list(build()), options['runs'])
+            self.stdout.write(f"p50 {p50:.2f} ms  p99 {p99:.2f} ms")
+
+    def _seed(self, options):
+        rng = random.Random(42)
+        batch_size = options['batch_size']
+        self.stdout.write("灌入城市、机场和飞机 ...")
+        cities = [City(city_code=f"{BENCH_CITY_PREFIX}{i:04d}", city_name=f"压测城市{i}", province="压测",
+                       pinyin=f"yc{i}") for i in range(options['cities'])]
+        City.objects.bulk_create(cities)
+        airports = [Airport(airport_code=f"B{i:03d}", airport_code_3=f"{i:03d}", airport_name=f"压测机场{i}",
+                            city=city) for i, city in enumerate(cities)]
+        Airport.objects.bulk_create(airports)
+        Plane.objects.create(plane_id=BENCH_PLANE_ID, model='BENCH', first_class_seats=8, business_seats=30,
+                             economy_seats=150)
+
+        self.stdout.write(f"灌入 {options['flights']} 个航班及其机票 ...")
+        base = datetime.now().replace(minute=0, second=0, microsecond=0)
+        for start in range(0, options['flights'], batch_size):
+            flights, tickets = [], []
+            for flight_id in range(FIRST_FLIGHT_ID + start,
+                                   FIRST_FLIGHT_ID + min(start + batch_size, options['flights'])):
+                departure, arrival = rng.sample(airports, 2)
+                departure_time = base + timedelta(minutes=rng.randrange(365 * 24 * 60))
+                flights.append(Flight(
+                    flight_id=flight_id, departure_time=departure_time,
+                    arrival_time=departure_time + timedelta(hours=2), departure_airport=departure,
+                    arrival_airport=arrival, remaining_first_class_seats=8, remaining_business_seats=30,
+                    remaining_economy_seats=150, distance=rng.randrange(300, 3000), plane_id=BENCH_PLANE_ID,
+                ))
+                for seat_type in SEAT_TYPES:
+                    tickets.append(Ticket(price=rng.randrange(300, 5000), baggage_allowance=20, ticket_type='adult',
+                                          seat_type=seat_type, flight_id=flight_id))
+            Flight.objects.bulk_create(flights)
+            Ticket.objects.bulk_create(tickets)
+            FareSummary.objects.bulk_create([FareSummary(flight_id=flight.flight_id) for flight in flights])
+
+        self.stdout.write(f"灌入 {options['passengers']} 位乘机人和 {options['orders']} 个订单 ...")
+        Passenger.objects.bulk_create(
+            [Passenger(name=BENCH_PASSENGER_NAME, gender=True, phone_number='0') for _ in range(options['passengers'])],
+            batch_size=batch_size,
+        )
+        passenger_ids = list(Passenger.objects.filter(name=BENCH_PASSENGER_NAME).values_list('id', flat=True))
+        ticket_ids = list(Ticket.objects.filter(flight__plane_id=BENCH_PLANE_ID).values_list('ticket_id', flat=True))
+        statuses = ('confirmed', 'confirmed', 'confirmed', 'pending', 'canceled', 'refunded')
+        for start in range(0, options['orders'], batch_size):
+            Order.objects.bulk_create([
+                Order(passenger_id=rng.choice(passenger_ids), ticket_id=rng.choice(ticket_ids),
+                      status=rng.choice(statuses), total_price=rng.randrange(300, 5000))
+                for _ in range(min(batch_size, options['orders'] - start))
+            ])
+        self.stdout.write("灌入完成")
+
+    def _cleanup(self):
+        Order.objects.filter(passenger__name=BENCH_PASSENGER_NAME).delete()
+        Passenger.objects.filter(name=BENCH_PASSENGER_NAME).delete()
+        Plane.objects.filter(plane_id=BENCH_PLANE_ID).delete()
+        City.objects.filter(city_code__startswith=BENCH_CITY_PREFIX).delete()
+        self.stdout.write("压测数据已删除")
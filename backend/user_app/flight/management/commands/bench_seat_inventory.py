@@ -0,0 +1,93 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from user_app.flight.inventory import take_seats, SEAT_FIELDS
+from user_app.flight.models import Airport, City, Flight, Plane
+
+BENCH_FLIGHT_ID = 999999999
+
+
+def book_with_row_lock(flight_id, seat_type):
+    """旧实现：SELECT ... FOR UPDATE 锁住航班行，修改后整行写回"""
+    field = SEAT_FIELDS[seat_type]
+    with transaction.atomic():
+        flight = Flight.objects.select_for_update().get(flight_id=flight_id)
+        if getattr(flight, field) <= 0:
+            return False
+        setattr(flight, field, getattr(flight, field) - 1)
+        flight.save()
+        return True
+
+
+def book_with_atomic_update(flight_id, seat_type):
+    """新实现：带条件的原子更新"""
+    with transaction.atomic():
+        return take_seats(flight_id, seat_type)
+
+
+STRATEGIES = {
+    'row_lock': book_with_row_lock,
+    'atomic_update': book_with_atomic_update,
+}
+
+
+class Command(BaseCommand):
+    help = "并发购票压测：对比行锁与原子更新两种扣减座位方式在不同并发数下的每秒订票数"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--buyers', default='1,2,4,8,16,32', help="并发购票线程数，逗号分隔")
+        parser.add_argument('--bookings', type=int, default=2000, help="每轮的购票次数")
+
+    def handle(self, *args, **options):
+        buyer_counts = [int(n) for n in options['buyers'].split(',')]
+        bookings = options['bookings']
+
+        flight = self._create_bench_flight(bookings)
+        try:
+            self.stdout.write(f"{'buyers':>8} {'strategy':>15} {'bookings/s':>12}")
+            for buyers in buyer_counts:
+                for name, strategy in STRATEGIES.items():
+                    Flight.objects.filter(flight_id=flight.flight_id).update(remaining_economy_seats=bookings)
+                    rate = self._run(strategy, flight.flight_id, buyers, bookings)
+                    self.stdout.write(f"{buyers:>8} {name:>15} {rate:>12.1f}")
+        finally:
+            self._cleanup()
+
+    @staticmethod
+    def _run(strategy, flight_id, buyers, bookings):
+        def worker(count):
+            try:
+                for _ in range(count):
+                    strategy(flight_id, 'economy')
+            finally:
+                connection.close()
+
+        per_buyer = [bookings // buyers + (1 if i < bookings % buyers else 0) for i in range(buyers)]
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=buyers) as executor:
+            list(executor.map(worker, per_buyer))
+        return bookings / (time.perf_counter() - start)
+
+    @staticmethod
+    def _create_bench_flight(seats):
+        city = City.objects.create(city_code='BENCH', city_name='压测城市', province='压测')
+        airport = Airport.objects.create(airport_code='BNCH', airport_code_3='BNC', airport_name='压测机场', city=city)
+        plane = Plane.objects.create(plane_id='BENCH', model='BENCH', first_class_seats=0, business_seats=0,
+                                     economy_seats=seats)
+        departure_time = datetime.now() + timedelta(days=30)
+        return Flight.objects.create(
+            flight_id=BENCH_FLIGHT_ID, departure_time=departure_time,
+            arrival_time=departure_time + timedelta(hours=2), departure_airport=airport, arrival_airport=airport,
+            remaining_first_class_seats=0, remaining_business_seats=0, remaining_economy_seats=seats,
+            distance=0, plane=plane,
+        )
+
+    @staticmethod
+    def _cleanup():
+        Flight.objects.filter(flight_id=BENCH_FLIGHT_ID).delete()
+        Plane.objects.filter(plane_id='BENCH').delete()
+        City.objects.filter(city_code='BENCH').delete()
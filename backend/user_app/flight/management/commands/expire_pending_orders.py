@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from user_app.flight.holds import expire_pending_orders, reconcile_holds
+
+
+class Command(BaseCommand):
+    help = "取消超时未支付的订单并释放座位预留，可选择常驻运行"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=int, default=0, help="常驻运行时每轮间隔的秒数，默认只运行一次")
+        parser.add_argument('--batch-size', type=int, default=500, help="每个事务处理的订单数")
+        parser.add_argument('--reconcile', action='store_true', help="按数据库重新计算所有预留计数器")
+
+    def handle(self, *args, **options):
+        while True:
+            expired = expire_pending_orders(batch_size=options['batch_size'])
+            self.stdout.write(f"已取消 {expired} 个超时未支付的订单")
+
+            if options['reconcile']:
+                reconcile_holds()
+                self.stdout.write("已重新计算座位预留计数器")
+
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from user_app.flight.schedule_import import FORMATS, IMPORTERS, import_schedule
+
+
+class Command(BaseCommand):
+    help = ("从 CSV 或 JSON Lines 文件批量导入城市、机场、飞机、航班或机票，边读边写，已存在的记录按主键更新。"
+            "请按 city、airport、plane、flight、ticket 的顺序导入。")
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=list(IMPORTERS), help="导入的数据类型")
+        parser.add_argument('path', help="文件路径")
+        parser.add_argument('--format', choices=FORMATS, help="文件格式，默认按扩展名判断（.jsonl/.json 为 JSON Lines）")
+        parser.add_argument('--batch-size', type=int, default=1000, help="每个事务写入的行数")
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or ('jsonl' if path.endswith(('.jsonl', '.json')) else 'csv')
+
+        start = time.perf_counter()
+        try:
+            with open(path, encoding='utf-8-sig', newline='') as stream:
+                report = import_schedule(options['kind'], stream, fmt, options['batch_size'])
+        except OSError as e:
+            raise CommandError(f"无法读取文件：{e}")
+
+        for line, message in report.errors:
+            self.stderr.write(f"第 {line} 行：{message}")
+        self.stdout.write(f"{report}，耗时 {time.perf_counter() - start:.1f} 秒")
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from user_app.flight.city_index import invalidate_city_index
+from user_app.flight.pinyin import recompute_city_pinyin
+
+
+class Command(BaseCommand):
+    help = "重新计算全部城市的拼音首字母与完整拼音，用于修复批量写入时未生成拼音的城市"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help="每批更新的城市数")
+
+    def handle(self, *args, **options):
+        total, updated = recompute_city_pinyin(options['batch_size'])
+        if updated:
+            invalidate_city_index()
+        self.stdout.write(f"共 {total} 个城市，更新 {updated} 个")
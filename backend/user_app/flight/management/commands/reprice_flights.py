@@ -0,0 +1,19 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from user_app.flight.pricing import reprice_flights
+
+
+class Command(BaseCommand):
+    help = "按航程、舱位、票种和上座率为航班生成机票并重新计算票价，可每晚定时运行"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--flight-ids', type=int, nargs='+', help="只处理这些航班，默认处理全部航班")
+        parser.add_argument('--batch-size', type=int, default=2000, help="每个事务处理的航班数")
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        flights, created, updated = reprice_flights(options['flight_ids'], options['batch_size'])
+        self.stdout.write(f"已处理 {flights} 个航班：新建机票 {created} 张，更新票价 {updated} 张，"
+                          f"耗时 {time.perf_counter() - start:.1f} 秒")
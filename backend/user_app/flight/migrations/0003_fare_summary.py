@@ -0,0 +1,48 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:01
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Min
+
+
+def backfill_fare_summaries(apps, schema_editor):
+    Flight = apps.get_model('flight', 'Flight')
+    Ticket = apps.get_model('flight', 'Ticket')
+    FareSummary = apps.get_model('flight', 'FareSummary')
+
+    summaries = {flight_id: FareSummary(flight_id=flight_id)
+                 for flight_id in Flight.objects.values_list('flight_id', flat=True)}
+    rows = Ticket.objects.filter(ticket_type='adult').values('flight_id', 'seat_type').annotate(min_price=Min('price'))
+    for row in rows:
+        summary = summaries[row['flight_id']]
+        setattr(summary, f"min_{row['seat_type']}_price", row['min_price'])
+        if summary.min_price is None or row['min_price'] < summary.min_price:
+            summary.min_price = row['min_price']
+            summary.min_price_seat_type = row['seat_type']
+    FareSummary.objects.bulk_create(summaries.values(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('flight', '0002_alter_airport_options_alter_city_options_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FareSummary',
+            fields=[
+                ('flight', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='fare_summary', serialize=False, to='flight.flight', verbose_name='航班')),
+                ('min_economy_price', models.FloatField(blank=True, null=True, verbose_name='经济舱最低成人票价')),
+                ('min_business_price', models.FloatField(blank=True, null=True, verbose_name='商务舱最低成人票价')),
+                ('min_first_class_price', models.FloatField(blank=True, null=True, verbose_name='头等舱最低成人票价')),
+                ('min_price', models.FloatField(blank=True, null=True, verbose_name='最低成人票价')),
+                ('min_price_seat_type', models.CharField(blank=True, max_length=50, null=True, verbose_name='最低票价座位类型')),
+            ],
+            options={
+                'verbose_name': '票价汇总',
+                'verbose_name_plural': '票价汇总',
+            },
+        ),
+        migrations.RunPython(backfill_fare_summaries, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:31
+
+from django.db import migrations, models
+
+
+def backfill_city_pinyin(apps, schema_editor):
+    """
+    按整个城市名称计算拼音首字母与完整拼音。转换复制自 user_app.flight.pinyin，迁移不依赖应用代码。
+    """
+    from pypinyin import Style, lazy_pinyin, pinyin
+
+    City = apps.get_model('flight', 'City')
+    changed = []
+    for city in City.objects.all():
+        name = str(city.city_name)
+        initials = ''.join(item[0][0] for item in pinyin(name, style=Style.FIRST_LETTER) if item[0])
+        full = ''.join(lazy_pinyin(name)).lower()
+        if (city.pinyin, city.full_pinyin) != (initials, full):
+            city.pinyin, city.full_pinyin = initials, full
+            changed.append(city)
+    City.objects.bulk_update(changed, ['pinyin', 'full_pinyin'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('flight', '0004_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='city',
+            name='full_pinyin',
+            field=models.CharField(blank=True, max_length=255, null=True, verbose_name='完整拼音'),
+        ),
+        migrations.RunPython(backfill_city_pinyin, migrations.RunPython.noop),
+    ]
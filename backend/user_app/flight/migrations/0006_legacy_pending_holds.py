@@ -0,0 +1,44 @@
+from datetime import datetime
+
+from django.db import migrations
+from django.db.models import Count, F
+
+# 座位类型对应的剩余座位字段，迁移中不引用应用代码
+SEAT_FIELDS = {
+    'economy': 'remaining_economy_seats',
+    'business': 'remaining_business_seats',
+    'first_class': 'remaining_first_class_seats',
+}
+
+
+def return_legacy_pending_seats(apps, schema_editor):
+    """
+    引入座位预留之前，待支付订单在下单时就扣减了剩余座位。将未起飞航班上这些订单占用的座位退回航班，
+    之后它们与新订单一样按预留处理：支付时扣减座位，超时取消时释放预留。
+
+    迁移不写缓存。部署后运行一次 manage.py expire_pending_orders --reconcile：先取消已超时的订单，
+    再按数据库中的待支付订单重建预留计数器。
+    """
+    Flight = apps.get_model('flight', 'Flight')
+    Order = apps.get_model('flight', 'Order')
+
+    rows = (
+        Order.objects.filter(status='pending', ticket__flight__departure_time__gt=datetime.now())
+        .values('ticket__flight_id', 'ticket__seat_type')
+        .annotate(count=Count('order_id'))
+        .order_by()
+    )
+    for row in rows:
+        field = SEAT_FIELDS[row['ticket__seat_type']]
+        Flight.objects.filter(flight_id=row['ticket__flight_id']).update(**{field: F(field) + row['count']})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('flight', '0005_city_full_pinyin'),
+    ]
+
+    operations = [
+        migrations.RunPython(return_legacy_pending_seats, migrations.RunPython.noop),
+    ]
@@ -1,10 +1,10 @@
 from datetime import datetime
 
-from django.db import models
+from django.db import models, transaction
 from django.utils.timezone import is_aware, make_aware
-from pypinyin import pinyin, Style
 
-from user_app.account.models import Passenger, User, UserPassengerRelation
+from user_app.account.models import Passenger, UserPassengerRelation
+from .cache import invalidate_flight_search
 
 
 # Create your models here.
@@ -52,6 +52,11 @@ class Flight(models.Model):
     class Meta:
         verbose_name = "航班"
         verbose_name_plural = "航班管理"
+        indexes = [
+            # 按起降机场和起飞时间查询航班（航班搜索）
+            models.Index(fields=['departure_airport', 'arrival_airport', 'departure_time'],
+                         name='flight_route_time_idx'),
+        ]
 
     def __str__(self):
         return f"航班 {self.flight_id} - {self.departure_airport} to {self.arrival_airport} - {self.departure_time} to {self.arrival_time}"
@@ -62,15 +67,17 @@ class City(models.Model):
     city_name = models.CharField(max_length=100, verbose_name="城市名称")  # 城市名称
     province = models.CharField(max_length=100, verbose_name="省份")  # 省份
     pinyin = models.CharField(max_length=100, blank=True, null=True, verbose_name="拼音")  # 存储拼音，用于排序
+    full_pinyin = models.CharField(max_length=255, blank=True, null=True, verbose_name="完整拼音")  # 用于城市检索
 
     class Meta:
         verbose_name = "城市"
         verbose_name_plural = "城市管理"
 
     def save(self, *args, **kwargs):
-        # 使用 pinyin 函数将城市名称转换为拼音的首字母
-        # pinyin 返回一个二维列表 [['B'], ['J'], ['H']]，我们需要提取首字母并拼接成字符串
-        self.pinyin = ''.join([item[0][0] for item in pinyin(str(self.city_name), style=Style.FIRST_LETTER)])
+        from .pinyin import apply_city_pinyin
+
+        # 根据城市名称生成拼音首字母与完整拼音，批量写入时请对整批城市调用 apply_city_pinyin
+        apply_city_pinyin([self])
         super().save(*args, **kwargs)
 
     def __str__(self):
@@ -101,6 +108,30 @@ class Ticket(models.Model):
     class Meta:
         verbose_name = "机票"
         verbose_name_plural = "机票管理"
+        indexes = [
+            # 按航班和票种查询最低票价
+            models.Index(fields=['flight', 'ticket_type', 'price'], name='ticket_flight_type_price_idx'),
+        ]
+
+
+class FareSummary(models.Model):
+    """
+    航班票价汇总，冗余存储每个航班各舱位的最低成人票价，由机票变更时维护。
+    """
+    flight = models.OneToOneField(Flight, on_delete=models.CASCADE, primary_key=True, related_name='fare_summary',
+                                  verbose_name="航班")
+    min_economy_price = models.FloatField(null=True, blank=True, verbose_name="经济舱最低成人票价")
+    min_business_price = models.FloatField(null=True, blank=True, verbose_name="商务舱最低成人票价")
+    min_first_class_price = models.FloatField(null=True, blank=True, verbose_name="头等舱最低成人票价")
+    min_price = models.FloatField(null=True, blank=True, verbose_name="最低成人票价")
+    min_price_seat_type = models.CharField(max_length=50, null=True, blank=True, verbose_name="最低票价座位类型")
+
+    class Meta:
+        verbose_name = "票价汇总"
+        verbose_name_plural = "票价汇总"
+
+    def __str__(self):
+        return f"航班 {self.flight_id} 最低票价 {self.min_price}"
 
 
 class Order(models.Model):
@@ -153,25 +184,30 @@ class Order(models.Model):
             self.status = 'canceled'
             self.save()
 
-        # 退还座位
+        from analytics.rollups import record_order
+        from user_app.level.services import update_user_progress
+        from .holds import release_holds
+        from .inventory import return_seats
+
         flight = self.ticket.flight
-        if self.ticket.seat_type == 'economy':
-            flight.remaining_economy_seats += 1
-        elif self.ticket.seat_type == 'business':
-            flight.remaining_business_seats += 1
-        elif self.ticket.seat_type == 'first_class':
-            flight.remaining_first_class_seats += 1
+        if self.status == 'canceled':
+            # 未支付订单只占用了座位预留，释放预留即可
+            transaction.on_commit(lambda: release_holds(flight.flight_id, self.ticket.seat_type))
+            return
+
+        # 已支付订单退还座位（原子更新，无需锁定航班记录）
+        return_seats(flight.flight_id, self.ticket.seat_type)
 
         if self.status == 'refunded':
-            # 修改用户里程数与购票次数
-            user = User.objects.get(
-                id=UserPassengerRelation.objects.get(passenger=self.passenger).user_id
+            # 修改用户里程数与购票次数，并同步更新会员等级
+            update_user_progress(
+                UserPassengerRelation.objects.get(passenger=self.passenger).user_id,
+                -self.ticket.flight.distance, -1,
             )
-            user.accumulated_miles -= self.ticket.flight.distance
-            user.ticked_count -= 1
-            user.save()
+            # 从统计汇总中移出该订单
+            record_order(self, flight, -1)
 
-        flight.save()
+        invalidate_flight_search(flight)
 
     def save(self, *args, **kwargs):
         # 验证乘客类型与机票类型是否匹配
@@ -192,5 +228,11 @@ class Order(models.Model):
     class Meta:
         verbose_name = "订单"
         verbose_name_plural = "订单管理"
+        indexes = [
+            # 按乘机人和状态查询订单并按购买时间排序（订单列表、重复购票检查）
+            models.Index(fields=['passenger', 'status', 'purchase_time'], name='order_passenger_status_idx'),
+            # 按状态和购买时间查找超时未支付的订单
+            models.Index(fields=['status', 'purchase_time'], name='order_status_time_idx'),
+        ]
 
 
@@ -0,0 +1,61 @@
+from functools import lru_cache
+
+# 缓存的城市名称数量，城市表规模远小于此值
+CACHE_SIZE = 8192
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def city_name_pinyin(city_name):
+    """
+    城市名称的 (拼音首字母, 小写完整拼音)，按名称缓存。
+
+    按整个名称转换而不是逐字转换，pypinyin 才能用词组词典区分多音字（重庆 cq、长沙 cs、厦门 xm）。
+    pypinyin 加载词典较慢，在第一次转换时才导入，不在进程启动和普通请求中加载。
+    """
+    from pypinyin import Style, lazy_pinyin, pinyin
+
+    # pinyin 返回一个二维列表 [['b'], ['j']]，提取每一项的首字母并拼接
+    initials = ''.join(item[0][0] for item in pinyin(city_name, style=Style.FIRST_LETTER) if item[0])
+    full = ''.join(lazy_pinyin(city_name))
+    return initials, full.lower()
+
+
+def apply_city_pinyin(cities):
+    """
+    为一批 City 对象计算并设置 pinyin 与 full_pinyin（不保存），返回拼音有变化的城市。
+    """
+    changed = []
+    for city in cities:
+        initials, full = city_name_pinyin(str(city.city_name))
+        if (city.pinyin, city.full_pinyin) != (initials, full):
+            city.pinyin, city.full_pinyin = initials, full
+            changed.append(city)
+    return changed
+
+
+def recompute_city_pinyin(batch_size=1000):
+    """
+    重新计算全部城市的拼音，只写回有变化的城市，返回 (城市数, 更新数)。
+    """
+    from .city_index import invalidate_city_index
+    from .models import City
+
+    total = updated = 0
+    batch = []
+
+    def flush():
+        changed = apply_city_pinyin(batch)
+        City.objects.bulk_update(changed, ['pinyin', 'full_pinyin'])
+        batch.clear()
+        return len(changed)
+
+    for city in City.objects.only('city_code', 'city_name', 'pinyin', 'full_pinyin').iterator(chunk_size=batch_size):
+        batch.append(city)
+        total += 1
+        if len(batch) >= batch_size:
+            updated += flush()
+    updated += flush()
+    # 批量更新不触发城市信号，手动使自动补全索引失效
+    if updated:
+        invalidate_city_index()
+    return total, updated
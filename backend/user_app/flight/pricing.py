@@ -0,0 +1,120 @@
+from django.db import transaction
+
+from common.bulk import bulk_upsert
+
+from .cache import invalidate_flights_search
+from .connections import invalidate_connection_flights
+from .fares import refresh_fare_summaries
+from .inventory import SEAT_FIELDS
+from .models import Flight, Ticket
+
+# 基础票价：起步价 + 每公里单价
+BASE_FARE = 200
+PRICE_PER_KM = 0.6
+
+# 舱位系数，顺序与 SEAT_TYPES 一致
+SEAT_TYPES = ('economy', 'business', 'first_class')
+CABIN_MULTIPLIERS = (1.0, 2.5, 4.0)
+# 舱位对应的飞机座位数字段
+CAPACITY_FIELDS = ('plane__economy_seats', 'plane__business_seats', 'plane__first_class_seats')
+
+# 票种系数
+TICKET_TYPES = ('adult', 'student', 'teacher', 'senior')
+TICKET_TYPE_MULTIPLIERS = (1.0, 0.8, 0.9, 0.7)
+
+# 上座率加价：票价乘以 1 + LOAD_SURCHARGE × 上座率²，满座时为基础价的 1 + LOAD_SURCHARGE 倍
+LOAD_SURCHARGE = 0.8
+
+# 新生成机票的行李限额（公斤）
+BAGGAGE_ALLOWANCE = {'economy': 20, 'business': 30, 'first_class': 40}
+
+
+def compute_prices(distances, capacities, remaining):
+    """
+    向量化计算票价矩阵。
+
+    distances 为 (航班数,) 的航程，capacities 与 remaining 为 (航班数, 舱位数) 的座位数与剩余座位数，
+    返回 (航班数, 舱位数, 票种数) 的票价（取整到元），舱位与票种顺序同 SEAT_TYPES 与 TICKET_TYPES。
+    """
+    import numpy as np
+
+    distances = np.asarray(distances, dtype=float)
+    capacities = np.asarray(capacities, dtype=float)
+    remaining = np.asarray(remaining, dtype=float)
+
+    # 没有该舱位的航班上座率记为 0
+    load = np.divide(capacities - remaining, capacities, out=np.zeros_like(capacities), where=capacities > 0)
+    load = np.clip(load, 0, 1)
+
+    base = BASE_FARE + PRICE_PER_KM * distances
+    cabin_prices = base[:, None] * np.asarray(CABIN_MULTIPLIERS)[None, :] * (1 + LOAD_SURCHARGE * load ** 2)
+    return np.round(cabin_prices[:, :, None] * np.asarray(TICKET_TYPE_MULTIPLIERS)[None, None, :])
+
+
+def _reprice_batch(flight_ids):
+    rows = list(Flight.objects.filter(flight_id__in=flight_ids).values_list(
+        'flight_id', 'distance', *CAPACITY_FIELDS, *(SEAT_FIELDS[seat_type] for seat_type in SEAT_TYPES)))
+    if not rows:
+        return 0, 0, 0
+
+    cabins = len(SEAT_TYPES)
+    positions = {row[0]: position for position, row in enumerate(rows)}
+    capacities = [row[2:2 + cabins] for row in rows]
+    prices = compute_prices([row[1] for row in rows], capacities, [row[2 + cabins:] for row in rows])
+
+    seat_index = {seat_type: index for index, seat_type in enumerate(SEAT_TYPES)}
+    type_index = {ticket_type: index for index, ticket_type in enumerate(TICKET_TYPES)}
+
+    updated = []
+    existing = set()
+    for ticket in Ticket.objects.filter(flight_id__in=positions):
+        key = (ticket.flight_id, ticket.seat_type, ticket.ticket_type)
+        existing.add(key)
+        if ticket.seat_type not in seat_index or ticket.ticket_type not in type_index:
+            continue
+        price = float(prices[positions[ticket.flight_id], seat_index[ticket.seat_type], type_index[ticket.ticket_type]])
+        if ticket.price != price:
+            ticket.price = price
+            updated.append(ticket)
+
+    # 补齐缺少的机票，飞机上没有的舱位不生成
+    created = [
+        Ticket(flight_id=flight_id, seat_type=seat_type, ticket_type=ticket_type,
+               price=float(prices[position, seat_index[seat_type], type_index[ticket_type]]),
+               baggage_allowance=BAGGAGE_ALLOWANCE[seat_type])
+        for flight_id, position in positions.items()
+        for seat_type in SEAT_TYPES if capacities[position][seat_index[seat_type]] > 0
+        for ticket_type in TICKET_TYPES if (flight_id, seat_type, ticket_type) not in existing
+    ]
+
+    with transaction.atomic():
+        Ticket.objects.bulk_create(created)
+        # 按主键写回整行、只更新票价，比 bulk_update 为每行生成 CASE WHEN 快一个数量级
+        bulk_upsert(Ticket, updated, ['price'], batch_size=1000)
+        # 批量写入不触发机票信号，手动更新票价汇总并使搜索缓存失效
+        if created or updated:
+            changed = list({ticket.flight_id for ticket in created + updated})
+            transaction.on_commit(lambda: refresh_fare_summaries(changed))
+            invalidate_flights_search(changed)
+            invalidate_connection_flights(changed)
+    return len(rows), len(created), len(updated)
+
+
+def reprice_flights(flight_ids=None, batch_size=2000):
+    """
+    按航程、舱位、票种和上座率为航班生成完整的机票矩阵并更新票价，flight_ids 为空时处理全部航班。
+    每批航班在一个事务中写入，返回 (航班数, 新建机票数, 更新机票数)。
+    """
+    if flight_ids is None:
+        flight_ids = list(Flight.objects.order_by('flight_id').values_list('flight_id', flat=True))
+
+    totals = [0, 0, 0]
+    batch = []
+    for flight_id in flight_ids:
+        batch.append(flight_id)
+        if len(batch) >= batch_size:
+            totals = [total + count for total, count in zip(totals, _reprice_batch(batch))]
+            batch = []
+    if batch:
+        totals = [total + count for total, count in zip(totals, _reprice_batch(batch))]
+    return tuple(totals)
@@ -0,0 +1,340 @@
+import csv
+import json
+from datetime import datetime
+
+from django.db import transaction
+
+from common.bulk import bulk_upsert
+
+from .cache import bump_route_version, invalidate_flights_search
+from .city_index import invalidate_city_index
+from .connections import invalidate_connection_days, invalidate_connection_flights
+from .fares import refresh_fare_summaries
+from .inventory import SEAT_FIELDS
+from .models import Airport, City, Flight, Order, Plane, Ticket
+from .pinyin import apply_city_pinyin
+
+# 报告中最多保留的错误行数
+MAX_REPORTED_ERRORS = 100
+
+FORMATS = ('csv', 'jsonl')
+
+TICKET_TYPES = {value for value, _ in Ticket._meta.get_field('ticket_type').choices}
+
+
+class ImportReport:
+    """
+    一次导入的结果：写入的行数与出错的行（行号, 错误信息），出错的行被跳过。
+    """
+
+    def __init__(self):
+        self.written = 0
+        self.error_count = 0
+        self.errors = []
+
+    def error(self, line, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((line, str(message)))
+
+    def __str__(self):
+        return f"写入 {self.written} 行，跳过 {self.error_count} 行"
+
+
+def read_rows(stream, fmt):
+    """
+    逐行读取 CSV（首行为表头）或 JSON Lines 文本流，产出 (行号, 字段字典)，无法解析的行产出 (行号, 异常)。
+    """
+    if fmt == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+        return
+
+    for line, text in enumerate(stream, 1):
+        if not text.strip():
+            continue
+        try:
+            row = json.loads(text)
+        except ValueError as e:
+            yield line, e
+            continue
+        yield line, row if isinstance(row, dict) else ValueError("每行必须是一个 JSON 对象")
+
+
+def _required(row, field):
+    value = row.get(field)
+    if value is None or str(value).strip() == '':
+        raise ValueError(f"缺少字段 {field}")
+    return str(value).strip()
+
+
+def _non_negative_int(row, field):
+    value = int(_required(row, field))
+    if value < 0:
+        raise ValueError(f"{field} 不能为负数")
+    return value
+
+
+def _non_negative_float(row, field):
+    value = float(_required(row, field))
+    if value < 0:
+        raise ValueError(f"{field} 不能为负数")
+    return value
+
+
+class _Importer:
+    """
+    各类数据导入的基类：parse 将一行转换为模型对象，write 在一个事务中写入一批对象，
+    finish 在全部写入后使相关缓存失效。同一批中主键重复的行以最后一行为准。
+    """
+
+    def key(self, obj):
+        return obj.pk
+
+    def parse(self, row):
+        raise NotImplementedError
+
+    def write(self, objs, report):
+        """
+        写入一批 (行号, 对象)，返回写入的行数。
+        """
+        raise NotImplementedError
+
+    def finish(self):
+        pass
+
+
+class CityImporter(_Importer):
+    fields = ('city_name', 'province', 'pinyin', 'full_pinyin')
+
+    def parse(self, row):
+        return City(city_code=_required(row, 'city_code'), city_name=_required(row, 'city_name'),
+                    province=_required(row, 'province'))
+
+    def write(self, objs, report):
+        cities = [obj for _, obj in objs]
+        apply_city_pinyin(cities)
+        bulk_upsert(City, cities, self.fields)
+        return len(objs)
+
+    def finish(self):
+        invalidate_city_index()
+
+
+class AirportImporter(_Importer):
+    fields = ('airport_code_3', 'airport_name', 'city')
+
+    def __init__(self):
+        self._cities = set(City.objects.values_list('city_code', flat=True))
+
+    def parse(self, row):
+        city_code = _required(row, 'city_code')
+        if city_code not in self._cities:
+            raise ValueError(f"城市 {city_code} 不存在")
+        return Airport(airport_code=_required(row, 'airport_code'), airport_code_3=_required(row, 'airport_code_3'),
+                       airport_name=_required(row, 'airport_name'), city_id=city_code)
+
+    def write(self, objs, report):
+        bulk_upsert(Airport, [obj for _, obj in objs], self.fields)
+        return len(objs)
+
+
+class PlaneImporter(_Importer):
+    fields = ('model', 'first_class_seats', 'business_seats', 'economy_seats')
+
+    def parse(self, row):
+        return Plane(plane_id=_required(row, 'plane_id'), model=_required(row, 'model'),
+                     first_class_seats=_non_negative_int(row, 'first_class_seats'),
+                     business_seats=_non_negative_int(row, 'business_seats'),
+                     economy_seats=_non_negative_int(row, 'economy_seats'))
+
+    def write(self, objs, report):
+        bulk_upsert(Plane, [obj for _, obj in objs], self.fields)
+        return len(objs)
+
+
+class FlightImporter(_Importer):
+    """
+    航班按航班号导入，机场可用四字码或三字码。新航班的剩余座位取飞机的座位数；
+    已存在的航班只更新时刻、机场、距离和飞机，不覆盖已售出后的剩余座位。
+    更换飞机的航班按新飞机重置剩余座位，已有待支付或已支付订单的航班不能更换飞机，该行记为错误。
+    """
+    fields = ('departure_time', 'arrival_time', 'departure_airport', 'arrival_airport', 'distance', 'plane')
+    seat_fields = tuple(SEAT_FIELDS.values())
+
+    def __init__(self):
+        self._airports = {}
+        for airport_code, airport_code_3, city_code in Airport.objects.values_list(
+                'airport_code', 'airport_code_3', 'city_id'):
+            self._airports[airport_code] = self._airports[airport_code_3] = (airport_code, city_code)
+        self._planes = {
+            plane_id: (first_class_seats, business_seats, economy_seats)
+            for plane_id, first_class_seats, business_seats, economy_seats in Plane.objects.values_list(
+                'plane_id', 'first_class_seats', 'business_seats', 'economy_seats')
+        }
+        self._routes = set()
+        self._days = set()
+
+    def _airport(self, row, field):
+        code = _required(row, field)
+        if code not in self._airports:
+            raise ValueError(f"机场 {code} 不存在")
+        return self._airports[code]
+
+    def parse(self, row):
+        departure_time = datetime.fromisoformat(_required(row, 'departure_time'))
+        arrival_time = datetime.fromisoformat(_required(row, 'arrival_time'))
+        if arrival_time <= departure_time:
+            raise ValueError("到达时间必须晚于起飞时间")
+        departure_airport, _ = self._airport(row, 'departure_airport')
+        arrival_airport, _ = self._airport(row, 'arrival_airport')
+        plane_id = _required(row, 'plane_id')
+        if plane_id not in self._planes:
+            raise ValueError(f"飞机 {plane_id} 不存在")
+        first_class_seats, business_seats, economy_seats = self._planes[plane_id]
+        return Flight(
+            flight_id=int(_required(row, 'flight_id')), departure_time=departure_time, arrival_time=arrival_time,
+            departure_airport_id=departure_airport, arrival_airport_id=arrival_airport,
+            remaining_first_class_seats=first_class_seats, remaining_business_seats=business_seats,
+            remaining_economy_seats=economy_seats, distance=_non_negative_float(row, 'distance'), plane_id=plane_id,
+        )
+
+    def write(self, objs, report):
+        existing = {
+            flight_id: (plane_id, departure_time, departure_city, arrival_city)
+            for flight_id, plane_id, departure_time, departure_city, arrival_city in Flight.objects.filter(
+                flight_id__in=[flight.flight_id for _, flight in objs]).values_list(
+                'flight_id', 'plane_id', 'departure_time', 'departure_airport__city_id', 'arrival_airport__city_id')
+        }
+        replaned = {flight.flight_id for _, flight in objs
+                    if flight.flight_id in existing and flight.plane_id != existing[flight.flight_id][0]}
+        # 已售出座位的航班更换飞机后，剩余座位无法与已售座位对应
+        sold = set(
+            Order.objects.filter(ticket__flight_id__in=replaned, status__in=('pending', 'confirmed'))
+            .values_list('ticket__flight_id', flat=True).distinct()
+        ) if replaned else set()
+
+        kept, reseated = [], []
+        for line, flight in objs:
+            if flight.flight_id in sold:
+                report.error(line, f"航班 {flight.flight_id} 已售出座位，不能更换飞机")
+                continue
+            # 改期或改航线的航班，其原日期和原航线的缓存也需要失效
+            if flight.flight_id in existing:
+                _, departure_time, departure_city, arrival_city = existing[flight.flight_id]
+                self._days.add(departure_time.date())
+                self._routes.add((departure_city, arrival_city))
+            self._days.add(flight.departure_time.date())
+            self._routes.add((self._airports[flight.departure_airport_id][1],
+                              self._airports[flight.arrival_airport_id][1]))
+            # 新航班与更换了飞机的航班按飞机座位数写入剩余座位
+            (reseated if flight.flight_id not in existing or flight.flight_id in replaned else kept).append(flight)
+
+        # 航班信息不影响票价汇总，票价汇总在导入机票时更新
+        with transaction.atomic():
+            bulk_upsert(Flight, kept, self.fields)
+            bulk_upsert(Flight, reseated, self.fields + self.seat_fields)
+        return len(kept) + len(reseated)
+
+    def finish(self):
+        for route in self._routes:
+            bump_route_version(*route)
+        invalidate_connection_days(self._days)
+
+
+class TicketImporter(_Importer):
+    """
+    机票按 (航班号, 座位类型, 票种) 导入，已存在时更新票价和行李限额。
+    """
+    fields = ('price', 'baggage_allowance')
+
+    def __init__(self):
+        self._flight_ids = set()
+
+    def key(self, obj):
+        return obj.flight_id, obj.seat_type, obj.ticket_type
+
+    def parse(self, row):
+        seat_type = _required(row, 'seat_type')
+        if seat_type not in SEAT_FIELDS:
+            raise ValueError(f"未知的座位类型 {seat_type}")
+        ticket_type = _required(row, 'ticket_type')
+        if ticket_type not in TICKET_TYPES:
+            raise ValueError(f"未知的票种 {ticket_type}")
+        return Ticket(flight_id=int(_required(row, 'flight_id')), seat_type=seat_type, ticket_type=ticket_type,
+                      price=_non_negative_float(row, 'price'),
+                      baggage_allowance=_non_negative_float(row, 'baggage_allowance'))
+
+    def write(self, objs, report):
+        flight_ids = {obj.flight_id for _, obj in objs}
+        existing_flights = set(Flight.objects.filter(flight_id__in=flight_ids).values_list('flight_id', flat=True))
+        existing_tickets = {
+            (flight_id, seat_type, ticket_type): ticket_id
+            for ticket_id, flight_id, seat_type, ticket_type in Ticket.objects.filter(
+                flight_id__in=existing_flights).values_list('ticket_id', 'flight_id', 'seat_type', 'ticket_type')
+        }
+
+        created, updated = [], []
+        for line, ticket in objs:
+            if ticket.flight_id not in existing_flights:
+                report.error(line, f"航班 {ticket.flight_id} 不存在")
+                continue
+            ticket.ticket_id = existing_tickets.get(self.key(ticket))
+            (updated if ticket.ticket_id else created).append(ticket)
+
+        with transaction.atomic():
+            Ticket.objects.bulk_create(created)
+            bulk_upsert(Ticket, updated, self.fields)
+        self._flight_ids |= existing_flights
+        return len(created) + len(updated)
+
+    def finish(self):
+        # 票价汇总在全部机票写入后按航班分批重新计算一次，同一航班的机票分布在多批中时不重复计算
+        flight_ids = sorted(self._flight_ids)
+        for start in range(0, len(flight_ids), 1000):
+            chunk = flight_ids[start:start + 1000]
+            refresh_fare_summaries(chunk)
+            invalidate_flights_search(chunk)
+            invalidate_connection_flights(chunk)
+
+
+IMPORTERS = {
+    'city': CityImporter,
+    'airport': AirportImporter,
+    'plane': PlaneImporter,
+    'flight': FlightImporter,
+    'ticket': TicketImporter,
+}
+
+
+def import_schedule(kind, stream, fmt='csv', batch_size=1000):
+    """
+    从文本流导入城市、机场、飞机、航班或机票（kind），边读边写，每 batch_size 行一个事务，内存占用与文件大小无关。
+    校验失败的行被跳过并记入报告，返回 ImportReport。
+    """
+    importer = IMPORTERS[kind]()
+    report = ImportReport()
+    batch = {}
+
+    def flush():
+        if batch:
+            report.written += importer.write(list(batch.values()), report)
+            batch.clear()
+
+    for line, row in read_rows(stream, fmt):
+        if isinstance(row, Exception):
+            report.error(line, row)
+            continue
+        try:
+            obj = importer.parse(row)
+        except (TypeError, ValueError) as e:
+            report.error(line, e)
+            continue
+        batch[importer.key(obj)] = (line, obj)
+        if len(batch) >= batch_size:
+            flush()
+    flush()
+
+    importer.finish()
+    return report
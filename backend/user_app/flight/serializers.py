@@ -32,27 +32,54 @@ class TicketSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
-class SimpleOrderSerializer(serializers.ModelSerializer):
-    passenger_name = serializers.CharField(source='passenger.name')  # 乘机人名字
-    flight_info = serializers.SerializerMethodField()  # 航班简单信息
-
-    class Meta:
-        model = Order
-        fields = ['order_id', 'passenger_name', 'status', 'total_price', 'purchase_time', 'flight_info']
-
-    @staticmethod
-    def get_flight_info(obj):
-        flight = obj.ticket.flight
-        return {
-            'flight_id': flight.flight_id,
-            'departure_airport': flight.departure_airport.airport_name,
-            'arrival_airport': flight.arrival_airport.airport_name,
-            'departure_time': flight.departure_time,
-            'arrival_time': flight.arrival_time,
+# 订单列表需要的列，配合 values() 用一次联表查询取出
+SIMPLE_ORDER_FIELDS = (
+    'order_id', 'passenger__name', 'status', 'total_price', 'purchase_time',
+    'ticket__flight_id', 'ticket__flight__departure_airport__airport_name',
+    'ticket__flight__arrival_airport__airport_name', 'ticket__flight__departure_time',
+    'ticket__flight__arrival_time',
+)
+
+
+def serialize_simple_orders(rows):
+    """
+    订单列表的轻量序列化，输入为 SIMPLE_ORDER_FIELDS 的 values() 结果。
+    不经过 ModelSerializer，大列表时开销远小于逐个实例化字段，输出格式与原 SimpleOrderSerializer 一致：
+    purchase_time 原为模型字段，按 DRF 的 DateTimeField 格式化（保留微秒）；
+    flight_info 原为 SerializerMethodField，其中的时间仍交给 JSON 编码器处理。
+    """
+    purchase_time = serializers.DateTimeField()
+    return [
+        {
+            'order_id': row['order_id'],
+            'passenger_name': row['passenger__name'],
+            'status': row['status'],
+            'total_price': row['total_price'],
+            'purchase_time': purchase_time.to_representation(row['purchase_time']),
+            'flight_info': {
+                'flight_id': row['ticket__flight_id'],
+                'departure_airport': row['ticket__flight__departure_airport__airport_name'],
+                'arrival_airport': row['ticket__flight__arrival_airport__airport_name'],
+                'departure_time': row['ticket__flight__departure_time'],
+                'arrival_time': row['ticket__flight__arrival_time'],
+            },
         }
+        for row in rows
+    ]
 
 
 class OrderSerializer(serializers.ModelSerializer):
+    # 序列化时访问的关联对象与列，查询时配合 select_related/only 使用，避免逐级查询
+    RELATED = ('passenger', 'ticket__flight__departure_airport', 'ticket__flight__arrival_airport')
+    ONLY = (
+        'order_id', 'purchase_time', 'status', 'total_price',
+        'passenger__name', 'passenger__gender', 'passenger__phone_number', 'passenger__email',
+        'ticket__ticket_id', 'ticket__price', 'ticket__seat_type', 'ticket__ticket_type',
+        'ticket__baggage_allowance', 'ticket__flight__flight_id', 'ticket__flight__departure_time',
+        'ticket__flight__arrival_time', 'ticket__flight__departure_airport__airport_name',
+        'ticket__flight__arrival_airport__airport_name',
+    )
+
     ticket = serializers.SerializerMethodField()
     passenger = serializers.SerializerMethodField()
 
@@ -0,0 +1,51 @@
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from .cache import invalidate_flights_search
+from .city_index import invalidate_city_index
+from .connections import invalidate_connection_days, invalidate_connection_flights
+from .fares import refresh_fare_summaries
+from .models import City, Flight, Ticket
+from .pinyin import apply_city_pinyin
+
+
+@receiver(pre_save, sender=City)
+def city_saving(sender, instance, raw, **kwargs):
+    # 加载 fixture 时不调用 City.save，在这里补上拼音
+    if raw:
+        apply_city_pinyin([instance])
+
+
+@receiver([post_save, post_delete], sender=City)
+def city_changed(sender, **kwargs):
+    # 城市新增、修改或删除后重建自动补全索引
+    transaction.on_commit(invalidate_city_index)
+
+
+@receiver([post_save, post_delete], sender=Ticket)
+def ticket_changed(sender, instance, **kwargs):
+    # 机票变更后更新航班票价汇总，搜索结果中内嵌了最低票价，同时使搜索缓存失效
+    flight_id = instance.flight_id
+    transaction.on_commit(lambda: refresh_fare_summaries([flight_id]))
+    invalidate_flights_search([flight_id])
+    invalidate_connection_flights([flight_id])
+
+
+@receiver(pre_save, sender=Flight)
+def flight_saving(sender, instance, **kwargs):
+    # 记录修改前的起飞日期，航班改期后新旧两天的时刻图都需要失效
+    instance._previous_departure_time = (
+        Flight.objects.filter(pk=instance.pk).values_list('departure_time', flat=True).first()
+    )
+
+
+@receiver(post_save, sender=Flight)
+def flight_saved(sender, instance, **kwargs):
+    departure_times = {instance.departure_time, instance._previous_departure_time} - {None}
+    invalidate_connection_days(departure_time.date() for departure_time in departure_times)
+
+
+@receiver(post_delete, sender=Flight)
+def flight_deleted(sender, instance, **kwargs):
+    invalidate_connection_days([instance.departure_time.date()])
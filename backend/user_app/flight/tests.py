@@ -1,3 +1,933 @@
-from django.test import TestCase
+import io
+import time
+from datetime import datetime, timedelta
+from importlib import import_module
+from unittest import mock
+
+from django.apps import apps
+from django.contrib.auth.models import User as AuthUser
+from django.core import serializers
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from common.pagination import encode_cursor
+from common.versioning import bump_version
+from user_app.account.models import Passenger, User, UserPassengerRelation
+from .city_index import CITY_INDEX_VERSION_KEY, VERSION_CHECK_INTERVAL, city_index, invalidate_city_index
+from .fares import refresh_fare_summaries
+from .holds import expire_pending_orders, held_seats, reconcile_holds, release_holds
+from .inventory import return_seats, take_seats
+from .models import Airport, City, FareSummary, Flight, Order, Plane, Ticket
+from .pinyin import recompute_city_pinyin
+from .pricing import reprice_flights
+from .schedule_import import import_schedule
+
+LOCMEM_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
 
 # Create your tests here.
+@override_settings(CACHES=LOCMEM_CACHES)
+class SearchFlightQueryCountTest(TestCase):
+    """航班搜索的查询次数不应随结果数量增长"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(AuthUser.objects.create_user('tester', 'tester@example.com', 'password'))
+
+        beijing = City.objects.create(city_code='BJS', city_name='北京', province='北京')
+        shanghai = City.objects.create(city_code='SHA', city_name='上海', province='上海')
+        self.departure_airport = Airport.objects.create(
+            airport_code='ZBAA', airport_code_3='PEK', airport_name='北京首都国际机场', city=beijing)
+        self.arrival_airport = Airport.objects.create(
+            airport_code='ZSPD', airport_code_3='PVG', airport_name='上海浦东国际机场', city=shanghai)
+        self.plane = Plane.objects.create(
+            plane_id='B1234', model='A320', first_class_seats=8, business_seats=20, economy_seats=120)
+
+    def create_flights(self, count, first_id=1):
+        departure_time = datetime(2030, 1, 1, 6, 0)
+        Flight.objects.bulk_create([
+            Flight(
+                flight_id=first_id + i,
+                departure_time=departure_time + timedelta(minutes=10 * i),
+                arrival_time=departure_time + timedelta(minutes=10 * i, hours=2),
+                departure_airport=self.departure_airport,
+                arrival_airport=self.arrival_airport,
+                remaining_first_class_seats=8,
+                remaining_business_seats=20,
+                remaining_economy_seats=120,
+                distance=1100,
+                plane=self.plane,
+            )
+            for i in range(count)
+        ])
+
+    def search(self):
+        return self.client.get('/user/flight/search/', {
+            'departure_city_code': 'BJS',
+            'arrival_city_code': 'SHA',
+            'departure_date': '2030-01-01',
+        })
+
+    def test_query_count_is_constant(self):
+        self.create_flights(1)
+        with self.assertNumQueries(1):
+            response = self.search()
+        self.assertEqual(len(response.data), 1)
+
+        cache.clear()
+        self.create_flights(50, first_id=100)
+        with self.assertNumQueries(1):
+            response = self.search()
+        self.assertEqual(len(response.data), 51)
+        self.assertEqual(response.data[0]['departure_airport'], '北京首都国际机场')
+        self.assertEqual(response.data[0]['plane_model'], 'A320')
+
+    def test_cached_search_skips_database(self):
+        self.create_flights(3)
+        self.search()
+        with self.assertNumQueries(0):
+            response = self.search()
+        self.assertEqual(len(response.data), 3)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class SearchCacheTest(TestCase):
+    """航班搜索结果按航线缓存，后台修改航班后原航线和新航线的缓存都失效"""
+
+    def setUp(self):
+        cache.clear()
+        self.admin = AuthUser.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+        beijing = City.objects.create(city_code='BJS', city_name='北京', province='北京')
+        shanghai = City.objects.create(city_code='SHA', city_name='上海', province='上海')
+        guangzhou = City.objects.create(city_code='CAN', city_name='广州', province='广东')
+        departure_airport = Airport.objects.create(
+            airport_code='ZBAA', airport_code_3='PEK', airport_name='北京首都国际机场', city=beijing)
+        Airport.objects.create(airport_code='ZSPD', airport_code_3='PVG', airport_name='上海浦东国际机场', city=shanghai)
+        Airport.objects.create(airport_code='ZGGG', airport_code_3='CAN', airport_name='广州白云国际机场', city=guangzhou)
+        plane = Plane.objects.create(
+            plane_id='B1234', model='A320', first_class_seats=8, business_seats=20, economy_seats=120)
+        self.flight = Flight.objects.create(
+            flight_id=1, departure_time=datetime(2030, 1, 1, 8, 0), arrival_time=datetime(2030, 1, 1, 10, 0),
+            departure_airport=departure_airport, arrival_airport_id='ZSPD',
+            remaining_first_class_seats=8, remaining_business_seats=20, remaining_economy_seats=120,
+            distance=1100, plane=plane,
+        )
+
+    def search(self, arrival_city_code):
+        return self.client.get('/user/flight/search/', {
+            'departure_city_code': 'BJS',
+            'arrival_city_code': arrival_city_code,
+            'departure_date': '2030-01-01',
+        })
+
+    def test_results_are_cached(self):
+        self.assertEqual(len(self.search('SHA').data), 1)
+        with self.assertNumQueries(0):
+            self.assertEqual(len(self.search('SHA').data), 1)
+
+    def test_empty_result_is_cached(self):
+        self.assertEqual(self.search('CAN').status_code, 404)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.search('CAN').status_code, 404)
+
+    def test_admin_route_change_invalidates_both_routes(self):
+        self.assertEqual(self.search('SHA').status_code, 200)
+        self.assertEqual(self.search('CAN').status_code, 404)
+
+        self.client.force_login(self.admin)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/admin/flight/flight/1/change/', {
+                'flight_id': 1,
+                'departure_time_0': '2030-01-01', 'departure_time_1': '08:00:00',
+                'arrival_time_0': '2030-01-01', 'arrival_time_1': '11:00:00',
+                'departure_airport': 'ZBAA', 'arrival_airport': 'ZGGG',
+                'remaining_first_class_seats': 8, 'remaining_business_seats': 20, 'remaining_economy_seats': 120,
+                'distance': 1900, 'plane': 'B1234',
+            })
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.search('SHA').status_code, 404)
+        self.assertEqual(len(self.search('CAN').data), 1)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class FareSummaryTest(TestCase):
+    """搜索结果内嵌票价汇总并先读缓存，机票变化后缓存失效；最低票价接口读取票价汇总"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(AuthUser.objects.create_user('tester', 'tester@example.com', 'password'))
+
+        beijing = City.objects.create(city_code='BJS', city_name='北京', province='北京')
+        shanghai = City.objects.create(city_code='SHA', city_name='上海', province='上海')
+        self.departure_airport = Airport.objects.create(
+            airport_code='ZBAA', airport_code_3='PEK', airport_name='北京首都国际机场', city=beijing)
+        self.arrival_airport = Airport.objects.create(
+            airport_code='ZSPD', airport_code_3='PVG', airport_name='上海浦东国际机场', city=shanghai)
+        self.plane = Plane.objects.create(
+            plane_id='B1234', model='A320', first_class_seats=8, business_seats=20, economy_seats=120)
+
+    def create_flight(self, flight_id, prices):
+        """创建航班及其成人票，prices 为 {座位类型: 票价}"""
+        departure_time = datetime(2030, 1, 1, 6, 0) + timedelta(hours=flight_id)
+        with self.captureOnCommitCallbacks(execute=True):
+            flight = Flight.objects.create(
+                flight_id=flight_id, departure_time=departure_time, arrival_time=departure_time + timedelta(hours=2),
+                departure_airport=self.departure_airport, arrival_airport=self.arrival_airport,
+                remaining_first_class_seats=8, remaining_business_seats=20, remaining_economy_seats=120,
+                distance=1100, plane=self.plane,
+            )
+            for seat_type, price in prices.items():
+                Ticket.objects.create(price=price, baggage_allowance=20, ticket_type='adult',
+                                      seat_type=seat_type, flight=flight)
+        return flight
+
+    def search(self):
+        return self.client.get('/user/flight/search/', {
+            'departure_city_code': 'BJS',
+            'arrival_city_code': 'SHA',
+            'departure_date': '2030-01-01',
+        })
+
+    def test_search_embeds_summary_and_invalidates_on_ticket_change(self):
+        self.create_flight(1, {'economy': 800, 'business': 2000})
+        with self.assertNumQueries(1):
+            response = self.search()
+        self.assertEqual((response.data[0]['min_price'], response.data[0]['min_price_seat_type']), (800, 'economy'))
+        with self.assertNumQueries(0):
+            self.search()
+
+        ticket = Ticket.objects.get(flight_id=1, seat_type='economy')
+        ticket.price = 600
+        with self.captureOnCommitCallbacks(execute=True):
+            ticket.save()
+        with self.assertNumQueries(1):
+            response = self.search()
+        self.assertEqual(response.data[0]['min_price'], 600)
+
+    def test_new_flight_invalidates_empty_result(self):
+        # 航班查询 + 区分城市是否有机场
+        with self.assertNumQueries(2):
+            self.assertEqual(self.search().status_code, 404)
+
+        # 新航班的机票写入后航线缓存失效
+        self.create_flight(1, {'economy': 800})
+        response = self.search()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 1)
+
+    def test_min_price(self):
+        self.create_flight(1, {'economy': 800, 'business': 2000})
+        with self.assertNumQueries(1):
+            response = self.client.get('/user/flight/ticket/min_price/1/')
+        self.assertEqual(response.data, {'flight_id': 1, 'min_price': 800, 'seat_type': 'economy'})
+
+    def test_min_price_batch(self):
+        self.create_flight(1, {'economy': 800, 'business': 2000})
+        self.create_flight(2, {'business': 1500, 'first_class': 3000})
+        self.create_flight(3, {})
+        with self.assertNumQueries(1):
+            response = self.client.get('/user/flight/ticket/min_price/', {'flight_ids': '1,2,3,4'})
+        self.assertEqual(response.status_code, 200)
+        prices = {row['flight_id']: row for row in response.data}
+        # 没有成人票或不存在的航班不返回
+        self.assertEqual(set(prices), {1, 2})
+        self.assertEqual((prices[1]['min_price'], prices[1]['min_business_price']), (800, 2000))
+        self.assertEqual((prices[2]['min_price'], prices[2]['seat_type'], prices[2]['min_economy_price']),
+                         (1500, 'business', None))
+
+        self.assertEqual(self.client.get('/user/flight/ticket/min_price/', {'flight_ids': 'a,b'}).status_code, 400)
+        too_many = ','.join(str(flight_id) for flight_id in range(201))
+        self.assertEqual(self.client.get('/user/flight/ticket/min_price/', {'flight_ids': too_many}).status_code, 400)
+
+    def test_min_price_without_summary_is_not_saved(self):
+        self.create_flight(1, {'economy': 800, 'business': 2000})
+        FareSummary.objects.all().delete()
+        response = self.client.get('/user/flight/ticket/min_price/1/')
+        self.assertEqual(response.data, {'flight_id': 1, 'min_price': 800, 'seat_type': 'economy'})
+        self.assertFalse(FareSummary.objects.exists())
+
+    def test_refresh_overwrites_summary(self):
+        self.create_flight(1, {'economy': 800})
+        Ticket.objects.filter(flight_id=1).update(price=700)
+        refresh_fare_summaries([1, 2])
+        summary = FareSummary.objects.get(flight_id=1)
+        self.assertEqual((summary.min_price, summary.min_economy_price), (700, 700))
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class CityAutocompleteTest(TestCase):
+    """城市自动补全走进程内索引，不访问数据库，城市变更后重建"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(AuthUser.objects.create_user('tester', 'tester@example.com', 'password'))
+        with self.captureOnCommitCallbacks(execute=True):
+            for city_code, city_name, province in (('SHA', '上海', '上海'), ('SZX', '深圳', '广东'),
+                                                   ('HGH', '杭州', '浙江')):
+                City.objects.create(city_code=city_code, city_name=city_name, province=province)
+
+    def city_codes(self, **params):
+        return [city['city_code'] for city in self.client.get('/user/flight/city/', params).data]
+
+    def test_search_without_queries(self):
+        self.assertEqual(self.city_codes(), ['HGH', 'SHA', 'SZX'])
+        with self.assertNumQueries(0):
+            self.assertEqual(self.city_codes(query='sh'), ['SHA', 'SZX'])
+            self.assertEqual(self.city_codes(query='zh'), ['HGH', 'SZX'])
+            self.assertEqual(self.city_codes(query='zh', match='prefix'), [])
+            self.assertEqual(self.city_codes(query='深'), ['SZX'])
+
+    def test_rebuild_after_city_change(self):
+        self.assertEqual(self.city_codes(query='sh'), ['SHA', 'SZX'])
+        with self.captureOnCommitCallbacks(execute=True):
+            City.objects.create(city_code='SHE', city_name='沈阳', province='辽宁')
+        self.assertEqual(self.city_codes(query='sh'), ['SHA', 'SHE', 'SZX'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            City.objects.get(pk='SZX').delete()
+        self.assertEqual(self.city_codes(query='sh'), ['SHA', 'SHE'])
+
+    def test_other_process_change_seen_after_interval(self):
+        self.assertEqual(self.city_codes(query='sh'), ['SHA', 'SZX'])
+        # 模拟其他进程修改城市：只递增缓存中的版本号，本进程的检查时间不变
+        City.objects.create(city_code='SHE', city_name='沈阳', province='辽宁')
+        bump_version(CITY_INDEX_VERSION_KEY)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.city_codes(query='sh'), ['SHA', 'SZX'])
+
+        later = time.monotonic() + VERSION_CHECK_INTERVAL
+        with mock.patch('user_app.flight.city_index.time.monotonic', return_value=later):
+            self.assertEqual(self.city_codes(query='sh'), ['SHA', 'SHE', 'SZX'])
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class SeatInventoryTest(TestCase):
+    """座位用带条件的原子更新扣减和退还，不锁航班记录"""
+
+    def setUp(self):
+        cache.clear()
+        city = City.objects.create(city_code='BJS', city_name='北京', province='北京')
+        airport = Airport.objects.create(airport_code='ZBAA', airport_code_3='PEK', airport_name='首都', city=city)
+        plane = Plane.objects.create(plane_id='B1234', model='A320', first_class_seats=0, business_seats=0,
+                                     economy_seats=2)
+        departure_time = datetime.now() + timedelta(days=7)
+        self.flight = Flight.objects.create(
+            flight_id=1, departure_time=departure_time, arrival_time=departure_time + timedelta(hours=2),
+            departure_airport=airport, arrival_airport=airport, remaining_first_class_seats=0,
+            remaining_business_seats=0, remaining_economy_seats=2, distance=1000, plane=plane,
+        )
+
+    def remaining_economy_seats(self):
+        self.flight.refresh_from_db()
+        return self.flight.remaining_economy_seats
+
+    def test_take_and_return_seats(self):
+        # 每次扣减或退还只有一条 UPDATE
+        with self.assertNumQueries(1):
+            self.assertTrue(take_seats(1, 'economy', 2))
+        with self.assertNumQueries(1):
+            self.assertFalse(take_seats(1, 'economy'))
+        self.assertEqual(self.remaining_economy_seats(), 0)
+        self.assertFalse(take_seats(1, 'business'))
+
+        with self.assertNumQueries(1):
+            return_seats(1, 'economy')
+        self.assertEqual(self.remaining_economy_seats(), 1)
+
+    def test_refund_returns_seat(self):
+        user = User.objects.create(name='tester', email='tester@example.com', password='password')
+        passenger = Passenger.objects.create(name='乘客', gender=True, phone_number='13800000000')
+        UserPassengerRelation.objects.create(user=user, passenger=passenger)
+        ticket = Ticket.objects.create(price=500, baggage_allowance=20, ticket_type='adult',
+                                       seat_type='economy', flight=self.flight)
+        self.assertTrue(take_seats(1, 'economy'))
+        order = Order.objects.create(passenger=passenger, ticket=ticket, total_price=500, status='confirmed')
+
+        order.cancel_order()
+        self.assertEqual(Order.objects.get(pk=order.pk).status, 'refunded')
+        self.assertEqual(self.remaining_economy_seats(), 2)
+
+
+@override_settings(CACHES=LOCMEM_CACHES, SEAT_HOLD_TIMEOUT=600)
+class SeatHoldTest(TestCase):
+    """下单只预留座位，支付后扣减，超时未支付的订单被批量取消"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(AuthUser.objects.create_user('tester', 'tester@example.com', 'password'))
+        user = User.objects.create(name='tester', email='tester@example.com', password='password')
+        self.passenger = Passenger.objects.create(name='乘客', gender=True, phone_number='13800000000')
+        UserPassengerRelation.objects.create(user=user, passenger=self.passenger)
+
+        city = City.objects.create(city_code='BJS', city_name='北京', province='北京')
+        airport = Airport.objects.create(airport_code='ZBAA', airport_code_3='PEK', airport_name='首都', city=city)
+        plane = Plane.objects.create(plane_id='B1234', model='A320', first_class_seats=0, business_seats=0,
+                                     economy_seats=1)
+        departure_time = datetime.now() + timedelta(days=7)
+        self.flight = Flight.objects.create(
+            flight_id=1, departure_time=departure_time, arrival_time=departure_time + timedelta(hours=2),
+            departure_airport=airport, arrival_airport=airport, remaining_first_class_seats=0,
+            remaining_business_seats=0, remaining_economy_seats=1, distance=1000, plane=plane,
+        )
+        self.ticket = Ticket.objects.create(price=500, baggage_allowance=20, ticket_type='adult',
+                                            seat_type='economy', flight=self.flight)
+
+    def purchase(self):
+        return self.client.post('/user/flight/order/purchase/',
+                                {'passenger_id': self.passenger.id, 'ticket_id': self.ticket.ticket_id},
+                                format='json')
+
+    def remaining_economy_seats(self):
+        self.flight.refresh_from_db()
+        return self.flight.remaining_economy_seats
+
+    def test_hold_then_confirm(self):
+        response = self.purchase()
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(held_seats(self.flight.flight_id, 'economy'), 1)
+        self.assertEqual(self.remaining_economy_seats(), 1)
+
+        # 唯一的座位已被预留
+        self.assertEqual(self.purchase().status_code, 400)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(f"/user/flight/order/confirm/{response.data['order_id']}/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(held_seats(self.flight.flight_id, 'economy'), 0)
+        self.assertEqual(self.remaining_economy_seats(), 0)
+
+    def test_expired_holds_are_released(self):
+        order_id = self.purchase().data['order_id']
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(expire_pending_orders(now=datetime.now() + timedelta(seconds=601)), 1)
+        self.assertEqual(Order.objects.get(order_id=order_id).status, 'canceled')
+        self.assertEqual(held_seats(self.flight.flight_id, 'economy'), 0)
+        self.assertEqual(self.remaining_economy_seats(), 1)
+        self.assertEqual(self.purchase().status_code, 201)
+
+    def test_legacy_pending_order(self):
+        # 引入预留之前的待支付订单：下单时已扣减座位，没有预留
+        order = Order.objects.create(passenger=self.passenger, ticket=self.ticket, total_price=500, status='pending')
+        Flight.objects.filter(flight_id=self.flight.flight_id).update(remaining_economy_seats=0)
+
+        migration = import_module('user_app.flight.migrations.0006_legacy_pending_holds')
+        migration.return_legacy_pending_seats(apps, None)
+        self.assertEqual(self.remaining_economy_seats(), 1)
+        # 部署后按数据库重建预留计数器
+        reconcile_holds()
+        self.assertEqual(held_seats(self.flight.flight_id, 'economy'), 1)
+        self.assertEqual(self.purchase().status_code, 400)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(f"/user/flight/order/confirm/{order.order_id}/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(held_seats(self.flight.flight_id, 'economy'), 0)
+        self.assertEqual(self.remaining_economy_seats(), 0)
+
+    def test_legacy_pending_order_on_departed_flight(self):
+        # 已起飞航班上的旧订单不退回座位
+        Order.objects.create(passenger=self.passenger, ticket=self.ticket, total_price=500, status='pending')
+        Flight.objects.filter(flight_id=self.flight.flight_id).update(
+            remaining_economy_seats=0, departure_time=datetime.now() - timedelta(days=1))
+
+        migration = import_module('user_app.flight.migrations.0006_legacy_pending_holds')
+        migration.return_legacy_pending_seats(apps, None)
+        self.assertEqual(self.remaining_economy_seats(), 0)
+
+    def test_release_does_not_go_negative(self):
+        release_holds(self.flight.flight_id, 'economy')
+        self.assertEqual(held_seats(self.flight.flight_id, 'economy'), 0)
+        self.assertEqual(self.purchase().status_code, 201)
+        release_holds(self.flight.flight_id, 'economy', 2)
+        self.assertEqual(held_seats(self.flight.flight_id, 'economy'), 0)
+
+
+@override_settings(CACHES=LOCMEM_CACHES, SEAT_HOLD_TIMEOUT=600)
+class BatchPurchaseTest(TestCase):
+    """批量购票全部成功或全部失败"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(AuthUser.objects.create_user('tester', 'tester@example.com', 'password'))
+        user = User.objects.create(name='tester', email='tester@example.com', password='password')
+        self.passengers = [
+            Passenger.objects.create(name=f'乘客{i}', gender=True, phone_number='13800000000') for i in range(3)
+        ]
+        for passenger in self.passengers:
+            UserPassengerRelation.objects.create(user=user, passenger=passenger)
+
+        city = City.objects.create(city_code='BJS', city_name='北京', province='北京')
+        airport = Airport.objects.create(airport_code='ZBAA', airport_code_3='PEK', airport_name='首都', city=city)
+        plane = Plane.objects.create(plane_id='B1234', model='A320', first_class_seats=0, business_seats=0,
+                                     economy_seats=2)
+        departure_time = datetime.now() + timedelta(days=7)
+        self.tickets = []
+        for flight_id, seats in ((1, 2), (2, 1)):
+            flight = Flight.objects.create(
+                flight_id=flight_id, departure_time=departure_time, arrival_time=departure_time + timedelta(hours=2),
+                departure_airport=airport, arrival_airport=airport, remaining_first_class_seats=0,
+                remaining_business_seats=0, remaining_economy_seats=seats, distance=1000, plane=plane,
+            )
+            self.tickets.append(Ticket.objects.create(price=500, baggage_allowance=20, ticket_type='adult',
+                                                      seat_type='economy', flight=flight))
+
+    def purchase(self, items):
+        return self.client.post('/user/flight/order/purchase/batch/', {'items': items}, format='json')
+
+    def item(self, passenger, ticket):
+        return {'passenger_id': passenger.id, 'ticket_id': ticket.ticket_id}
+
+    def test_purchase(self):
+        response = self.purchase([self.item(passenger, self.tickets[0]) for passenger in self.passengers[:2]])
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.data['orders']), 2)
+        self.assertEqual(Order.objects.filter(status='pending').count(), 2)
+        self.assertEqual(held_seats(1, 'economy'), 2)
+
+    def test_duplicate_pair(self):
+        item = self.item(self.passengers[0], self.tickets[0])
+        self.assertEqual(self.purchase([item, item]).status_code, 400)
+        self.assertFalse(Order.objects.exists())
+
+    def test_not_enough_seats_rolls_back(self):
+        # 第一个航班的座位足够，第二个航班只剩一个座位，整批失败
+        response = self.purchase([
+            self.item(self.passengers[0], self.tickets[0]),
+            self.item(self.passengers[1], self.tickets[1]),
+            self.item(self.passengers[2], self.tickets[1]),
+        ])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['flight_id'], 2)
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(held_seats(1, 'economy'), 0)
+        self.assertEqual(held_seats(2, 'economy'), 0)
+
+    def test_malformed_ids(self):
+        ticket_id = self.tickets[0].ticket_id
+        for item in ({'passenger_id': 'abc', 'ticket_id': ticket_id},
+                     {'passenger_id': [self.passengers[0].id], 'ticket_id': ticket_id}):
+            self.assertEqual(self.purchase([item]).status_code, 400)
+        self.assertFalse(Order.objects.exists())
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class OrderListQueryCountTest(TestCase):
+    """订单列表与订单详情的查询次数不随订单数量增长"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(AuthUser.objects.create_user('tester', 'tester@example.com', 'password'))
+        user = User.objects.create(name='tester', email='tester@example.com', password='password')
+        passenger = Passenger.objects.create(name='乘客', gender=True, phone_number='13800000000')
+        UserPassengerRelation.objects.create(user=user, passenger=passenger)
+
+        city = City.objects.create(city_code='BJS', city_name='北京', province='北京')
+        airport = Airport.objects.create(airport_code='ZBAA', airport_code_3='PEK', airport_name='首都', city=city)
+        plane = Plane.objects.create(plane_id='B1234', model='A320', first_class_seats=0, business_seats=0,
+                                     economy_seats=10)
+        departure_time = datetime(2030, 1, 1, 6, 0)
+        flight = Flight.objects.create(
+            flight_id=1, departure_time=departure_time, arrival_time=departure_time + timedelta(hours=2),
+            departure_airport=airport, arrival_airport=airport, remaining_first_class_seats=0,
+            remaining_business_seats=0, remaining_economy_seats=10, distance=1000, plane=plane,
+        )
+        ticket = Ticket.objects.create(price=500, baggage_allowance=20, ticket_type='adult',
+                                       seat_type='economy', flight=flight)
+        Order.objects.bulk_create([Order(passenger=passenger, ticket=ticket, total_price=500) for _ in range(6)])
+
+    def test_query_count_is_constant(self):
+        # 查询业务用户（随后被缓存）+ 一次联表查询订单
+        with self.assertNumQueries(2):
+            response = self.client.get('/user/flight/order/list/')
+        self.assertEqual(len(response.data), 6)
+        self.assertEqual(response.data[0]['passenger_name'], '乘客')
+        self.assertEqual(response.data[0]['flight_info']['departure_airport'], '首都')
+
+        # 业务用户命中缓存：订单 + 权限检查
+        with self.assertNumQueries(2):
+            response = self.client.get(f"/user/flight/order/detail/{response.data[0]['order_id']}/")
+        self.assertEqual(response.data['ticket']['flight']['arrival_airport'], '首都')
+
+    def test_list_datetime_format(self):
+        # 与原 SimpleOrderSerializer 一致：下单时间保留微秒，航班时间由 JSON 编码器输出
+        Order.objects.update(purchase_time=datetime(2029, 12, 1, 8, 30, 15, 123456))
+        row = self.client.get('/user/flight/order/list/').json()[0]
+        self.assertEqual(row['purchase_time'], '2029-12-01T08:30:15.123456')
+        self.assertEqual(row['flight_info']['departure_time'], '2030-01-01T06:00:00')
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class KeysetPaginationTest(TestCase):
+    """带 cursor 或 page_size 参数时按游标分页，不带时返回完整列表"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(AuthUser.objects.create_user('tester', 'tester@example.com', 'password'))
+        user = User.objects.create(name='tester', email='tester@example.com', password='password')
+        passenger = Passenger.objects.create(name='乘客', gender=True, phone_number='13800000000')
+        UserPassengerRelation.objects.create(user=user, passenger=passenger)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            for city_code, city_name in (('BJS', '北京'), ('SHA', '上海'), ('CAN', '广州'), ('SZX', '深圳')):
+                City.objects.create(city_code=city_code, city_name=city_name, province=city_name)
+        airport = Airport.objects.create(airport_code='ZBAA', airport_code_3='PEK', airport_name='首都',
+                                         city_id='BJS')
+        plane = Plane.objects.create(plane_id='B1234', model='A320', first_class_seats=0, business_seats=0,
+                                     economy_seats=10)
+        departure_time = datetime(2030, 1, 1, 6, 0)
+        flight = Flight.objects.create(
+            flight_id=1, departure_time=departure_time, arrival_time=departure_time + timedelta(hours=2),
+            departure_airport=airport, arrival_airport=airport, remaining_first_class_seats=0,
+            remaining_business_seats=0, remaining_economy_seats=10, distance=1000, plane=plane,
+        )
+        ticket = Ticket.objects.create(price=500, baggage_allowance=20, ticket_type='adult',
+                                       seat_type='economy', flight=flight)
+        Order.objects.bulk_create([Order(passenger=passenger, ticket=ticket, total_price=500) for _ in range(5)])
+
+    def test_unpaginated_response(self):
+        response = self.client.get('/user/flight/order/list/')
+        self.assertIsInstance(response.data, list)
+        self.assertEqual(len(response.data), 5)
+
+    def test_follow_cursor_to_end(self):
+        expected = [order['order_id'] for order in self.client.get('/user/flight/order/list/').data]
+        seen = []
+        params = {'page_size': 2}
+        while True:
+            response = self.client.get('/user/flight/order/list/', params)
+            self.assertEqual(response.status_code, 200)
+            self.assertLessEqual(len(response.data['results']), 2)
+            seen += [order['order_id'] for order in response.data['results']]
+            if response.data['next_cursor'] is None:
+                break
+            params = {'page_size': 2, 'cursor': response.data['next_cursor']}
+        self.assertEqual(seen, expected)
+
+        # 内存列表分页
+        response = self.client.get('/user/flight/city/', {'page_size': 3})
+        next_page = self.client.get('/user/flight/city/', {'page_size': 3, 'cursor': response.data['next_cursor']})
+        self.assertEqual(len(response.data['results']) + len(next_page.data['results']), 4)
+        self.assertIsNone(next_page.data['next_cursor'])
+
+    def test_tampered_cursor(self):
+        for cursor in ('not-a-cursor', encode_cursor([1]), encode_cursor(['abc', 'def']),
+                       encode_cursor([[1], {'x': 1}])):
+            response = self.client.get('/user/flight/order/list/', {'cursor': cursor})
+            self.assertEqual(response.status_code, 400)
+        response = self.client.get('/user/flight/city/', {'cursor': encode_cursor([123, 'BJS'])})
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ConnectionSearchTest(TestCase):
+    """中转搜索在内存时刻图上完成，航班变更后只重新加载受影响的日期"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(AuthUser.objects.create_user('tester', 'tester@example.com', 'password'))
+        self.airports = {}
+        for code, name in (('BJS', '北京'), ('SHA', '上海'), ('CTU', '成都'), ('CAN', '广州')):
+            city = City.objects.create(city_code=code, city_name=name, province=name)
+            self.airports[code] = Airport.objects.create(
+                airport_code=f'Z{code}', airport_code_3=code, airport_name=f'{name}机场', city=city)
+        self.plane = Plane.objects.create(plane_id='B1234', model='A320', first_class_seats=0, business_seats=0,
+                                          economy_seats=100)
+        # (航班号, 出发, 到达, 起飞时刻, 飞行小时数, 最低票价)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.create_flights()
+
+    def create_flights(self):
+        for flight_id, departure, arrival, departure_time, hours, price in (
+            (1, 'BJS', 'SHA', (8, 0), 2, 800),
+            (2, 'SHA', 'CAN', (10, 30), 2, 100),  # 中转时间不足
+            (3, 'SHA', 'CAN', (11, 30), 2, 700),
+            (4, 'BJS', 'CTU', (7, 0), 3, 300),
+            (5, 'CTU', 'CAN', (12, 0), 2, 300),
+            (6, 'CTU', 'CAN', (20, 0), 2, 100),  # 中转等待过长
+        ):
+            self.create_flight(flight_id, departure, arrival, datetime(2030, 1, 1, *departure_time), hours, price)
+
+    def create_flight(self, flight_id, departure, arrival, departure_time, hours, price):
+        flight = Flight.objects.create(
+            flight_id=flight_id, departure_time=departure_time, arrival_time=departure_time + timedelta(hours=hours),
+            departure_airport=self.airports[departure], arrival_airport=self.airports[arrival],
+            remaining_first_class_seats=0, remaining_business_seats=0, remaining_economy_seats=100,
+            distance=1000, plane=self.plane,
+        )
+        Ticket.objects.create(price=price, baggage_allowance=20, ticket_type='adult', seat_type='economy',
+                              flight=flight)
+
+    def search(self, **params):
+        return self.client.get('/user/flight/search/connections/', {
+            'departure_city_code': 'BJS', 'arrival_city_code': 'CAN', 'departure_date': '2030-01-01', **params,
+        })
+
+    @staticmethod
+    def flight_ids(response):
+        return [[leg['flight_id'] for leg in itinerary['legs']] for itinerary in response.data['itineraries']]
+
+    def test_ranking_and_connection_limits(self):
+        response = self.search()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.flight_ids(response), [[1, 3], [4, 5]])
+        self.assertEqual(response.data['itineraries'][0]['duration_minutes'], 330)
+        self.assertEqual(response.data['itineraries'][0]['min_price'], 1500)
+
+        self.assertEqual(self.flight_ids(self.search(sort='price')), [[4, 5], [1, 3]])
+        self.assertEqual(self.flight_ids(self.search(min_connection_minutes=30)), [[1, 2], [1, 3], [4, 5]])
+        self.assertEqual(self.flight_ids(self.search(max_layover_minutes=12 * 60, sort='price')),
+                         [[4, 6], [4, 5], [1, 3]])
+        self.assertEqual(self.search(max_stops=0).status_code, 404)
+        self.assertEqual(self.search(sort='unknown').status_code, 400)
+
+    def test_graph_reloads_changed_day_only(self):
+        self.search()
+        # 时刻图已加载，再次搜索不访问数据库
+        with self.assertNumQueries(0):
+            self.search()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.create_flight(7, 'BJS', 'CAN', datetime(2030, 1, 1, 9, 0), 3, 2000)
+        # 只重新加载 1 月 1 日
+        with self.assertNumQueries(1):
+            response = self.search()
+        self.assertEqual(self.flight_ids(response)[0], [7])
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class FareCalendarTest(TestCase):
+    """票价日历跨月查询只执行一次分组查询，结果按航线和月份缓存"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(AuthUser.objects.create_user('tester', 'tester@example.com', 'password'))
+        beijing = City.objects.create(city_code='BJS', city_name='北京', province='北京')
+        shanghai = City.objects.create(city_code='SHA', city_name='上海', province='上海')
+        departure_airport = Airport.objects.create(airport_code='ZBAA', airport_code_3='PEK', airport_name='首都',
+                                                   city=beijing)
+        arrival_airport = Airport.objects.create(airport_code='ZSPD', airport_code_3='PVG', airport_name='浦东',
+                                                 city=shanghai)
+        plane = Plane.objects.create(plane_id='B1234', model='A320', first_class_seats=8, business_seats=0,
+                                     economy_seats=100)
+        # (航班号, 起飞时间, 剩余经济舱座位, 经济舱票价, 头等舱票价)
+        for flight_id, departure_time, economy_seats, economy_price, first_class_price in (
+            (1, datetime(2030, 1, 30, 8, 0), 100, 600, 2000),
+            (2, datetime(2030, 1, 30, 18, 0), 100, 500, 2000),
+            (3, datetime(2030, 1, 31, 8, 0), 0, 300, 1800),  # 经济舱售罄
+            (4, datetime(2030, 2, 1, 8, 0), 100, 700, 2000),
+        ):
+            flight = Flight.objects.create(
+                flight_id=flight_id, departure_time=departure_time,
+                arrival_time=departure_time + timedelta(hours=2), departure_airport=departure_airport,
+                arrival_airport=arrival_airport, remaining_first_class_seats=8, remaining_business_seats=0,
+                remaining_economy_seats=economy_seats, distance=1100, plane=plane,
+            )
+            Ticket.objects.create(price=economy_price, baggage_allowance=20, ticket_type='adult',
+                                  seat_type='economy', flight=flight)
+            Ticket.objects.create(price=first_class_price, baggage_allowance=20, ticket_type='adult',
+                                  seat_type='first_class', flight=flight)
+
+    def calendar(self):
+        return self.client.get('/user/flight/search/calendar/', {
+            'departure_city_code': 'BJS', 'arrival_city_code': 'SHA',
+            'start_date': '2030-01-30', 'end_date': '2030-02-02',
+        })
+
+    def test_calendar(self):
+        with self.assertNumQueries(1):
+            response = self.calendar()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [(str(day['date']), day['flight_count'], day['available_flight_count'], day['min_price'])
+             for day in response.data['calendar']],
+            [('2030-01-30', 2, 2, 500), ('2030-01-31', 1, 1, 1800), ('2030-02-01', 1, 1, 700),
+             ('2030-02-02', 0, 0, None)],
+        )
+
+        with self.assertNumQueries(0):
+            self.calendar()
+
+        # 票价变化后航线缓存失效
+        ticket = Ticket.objects.get(flight_id=4, seat_type='economy')
+        ticket.price = 400
+        with self.captureOnCommitCallbacks(execute=True):
+            ticket.save()
+        self.assertEqual(self.calendar().data['calendar'][2]['min_price'], 400)
+
+        self.assertEqual(self.client.get('/user/flight/search/calendar/', {
+            'departure_city_code': 'BJS', 'arrival_city_code': 'SHA',
+            'start_date': '2030-01-01', 'end_date': '2030-03-31',
+        }).status_code, 400)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ScheduleImportTest(TestCase):
+    """批量导入时刻表：校验引用、按飞机生成剩余座位、按主键更新且不覆盖已售座位"""
+
+    def import_rows(self, kind, text, fmt='csv'):
+        with self.captureOnCommitCallbacks(execute=True):
+            return import_schedule(kind, io.StringIO(text), fmt, batch_size=2)
+
+    def setUp(self):
+        cache.clear()
+        self.import_rows('city', "city_code,city_name,province\nBJS,北京,北京\nSHA,上海,上海\n")
+        self.import_rows('plane', '{"plane_id": "B1234", "model": "A320", "first_class_seats": 8, '
+                                  '"business_seats": 20, "economy_seats": 120}\n', 'jsonl')
+        self.import_rows('airport', "airport_code,airport_code_3,airport_name,city_code\n"
+                                    "ZBAA,PEK,首都,BJS\nZSPD,PVG,浦东,SHA\n")
+
+    def test_import(self):
+        self.assertEqual(City.objects.get(city_code='BJS').pinyin, 'bj')
+        report = self.import_rows('flight', (
+            "flight_id,departure_time,arrival_time,departure_airport,arrival_airport,distance,plane_id\n"
+            "1,2030-01-01 08:00,2030-01-01 10:00,PEK,ZSPD,1100,B1234\n"
+            "2,2030-01-01 12:00,2030-01-01 14:00,ZBAA,PVG,1100,B1234\n"
+            "3,2030-01-01 12:00,2030-01-01 14:00,ZBAA,XXX,1100,B1234\n"
+            "4,2030-01-01 12:00,2030-01-01 11:00,ZBAA,PVG,1100,B1234\n"
+        ))
+        self.assertEqual((report.written, [line for line, _ in report.errors]), (2, [4, 5]))
+        flight = Flight.objects.get(flight_id=1)
+        self.assertEqual((flight.departure_airport_id, flight.remaining_economy_seats), ('ZBAA', 120))
+
+        report = self.import_rows('ticket', (
+            '{"flight_id": 1, "seat_type": "economy", "ticket_type": "adult", "price": 500, "baggage_allowance": 20}\n'
+            '{"flight_id": 1, "seat_type": "business", "ticket_type": "adult", "price": 900, "baggage_allowance": 30}\n'
+            '{"flight_id": 9, "seat_type": "economy", "ticket_type": "adult", "price": 500, "baggage_allowance": 20}\n'
+            'not json\n'
+        ), 'jsonl')
+        self.assertEqual((report.written, [line for line, _ in report.errors]), (2, [4, 3]))
+        self.assertEqual(FareSummary.objects.get(flight_id=1).min_price, 500)
+
+        # 再次导入：更新时刻和票价，保留已售出后的剩余座位
+        Flight.objects.filter(flight_id=1).update(remaining_economy_seats=100)
+        self.import_rows('flight', (
+            "flight_id,departure_time,arrival_time,departure_airport,arrival_airport,distance,plane_id\n"
+            "1,2030-01-02 08:00,2030-01-02 10:00,ZBAA,ZSPD,1100,B1234\n"
+        ))
+        self.import_rows('ticket', "flight_id,seat_type,ticket_type,price,baggage_allowance\n1,economy,adult,450,20\n")
+        flight = Flight.objects.get(flight_id=1)
+        self.assertEqual((flight.departure_time, flight.remaining_economy_seats), (datetime(2030, 1, 2, 8, 0), 100))
+        self.assertEqual(Ticket.objects.filter(flight_id=1).count(), 2)
+        self.assertEqual(FareSummary.objects.get(flight_id=1).min_price, 450)
+
+    def test_plane_change(self):
+        self.import_rows('plane', "plane_id,model,first_class_seats,business_seats,economy_seats\n"
+                                  "B5678,A330,12,30,200\n")
+        header = "flight_id,departure_time,arrival_time,departure_airport,arrival_airport,distance,plane_id\n"
+        self.import_rows('flight', header + "1,2030-01-01 08:00,2030-01-01 10:00,PEK,PVG,1100,B1234\n"
+                                            "2,2030-01-01 12:00,2030-01-01 14:00,PEK,PVG,1100,B1234\n")
+        self.import_rows('ticket', "flight_id,seat_type,ticket_type,price,baggage_allowance\n1,economy,adult,500,20\n")
+        passenger = Passenger.objects.create(name='乘客', gender=True, phone_number='13800000000')
+        Order.objects.create(passenger=passenger, ticket=Ticket.objects.get(flight_id=1), total_price=500,
+                             status='confirmed')
+        Flight.objects.filter(flight_id=1).update(remaining_economy_seats=119)
+
+        # 已售出座位的航班不能更换飞机；未售出的航班按新飞机重置剩余座位
+        report = self.import_rows('flight', header + "1,2030-01-01 08:00,2030-01-01 10:00,PEK,PVG,1100,B5678\n"
+                                                     "2,2030-01-01 12:00,2030-01-01 14:00,PEK,PVG,1100,B5678\n")
+        self.assertEqual((report.written, [line for line, _ in report.errors]), (1, [2]))
+        self.assertEqual(Flight.objects.filter(flight_id=1).values_list('plane_id', 'remaining_economy_seats').get(),
+                         ('B1234', 119))
+        self.assertEqual(Flight.objects.filter(flight_id=2).values_list(
+            'plane_id', 'remaining_first_class_seats', 'remaining_economy_seats').get(), ('B5678', 12, 200))
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class CityPinyinTest(TestCase):
+    """城市拼音按整个名称转换，保存、fixture 加载和批量导入都会生成拼音"""
+
+    def setUp(self):
+        cache.clear()
+
+    def test_save_and_search(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            City.objects.create(city_code='CKG', city_name='重庆', province='重庆')
+            City.objects.create(city_code='XMN', city_name='厦门', province='福建')
+        self.assertEqual(
+            list(City.objects.order_by('city_code').values_list('pinyin', 'full_pinyin')),
+            [('cq', 'chongqing'), ('xm', 'xiamen')],
+        )
+        # 自动补全按预先计算的完整拼音检索
+        self.assertEqual([city['city_code'] for city in city_index.search('chong')], ['CKG'])
+
+    def test_fixture_and_recompute(self):
+        serialized = '[{"model": "flight.city", "pk": "CSX", "fields": {"city_name": "长沙", "province": "湖南"}}]'
+        for obj in serializers.deserialize('json', serialized):
+            obj.save()
+        self.assertEqual(City.objects.get(pk='CSX').full_pinyin, 'changsha')
+
+        City.objects.filter(pk='CSX').update(pinyin=None, full_pinyin=None)
+        self.assertEqual(recompute_city_pinyin(), (1, 1))
+        self.assertEqual(City.objects.get(pk='CSX').pinyin, 'cs')
+
+    def test_recompute_refreshes_index(self):
+        City.objects.create(city_code='CSX', city_name='长沙', province='湖南')
+        # 按逐字转换得到的错误拼音建立索引
+        City.objects.filter(pk='CSX').update(pinyin='zs', full_pinyin='zhangsha')
+        invalidate_city_index()
+        self.assertEqual([city['city_code'] for city in city_index.search('zhangsha')], ['CSX'])
+
+        recompute_city_pinyin()
+        self.assertEqual([city['city_code'] for city in city_index.search('changsha')], ['CSX'])
+        self.assertEqual(city_index.search('zhangsha'), [])
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class PricingTest(TestCase):
+    """按航程、舱位、票种和上座率生成机票矩阵，批量写回并更新票价汇总"""
+
+    def setUp(self):
+        cache.clear()
+        city = City.objects.create(city_code='BJS', city_name='北京', province='北京')
+        airport = Airport.objects.create(airport_code='ZBAA', airport_code_3='PEK', airport_name='首都', city=city)
+        plane = Plane.objects.create(plane_id='B1234', model='A320', first_class_seats=0, business_seats=10,
+                                     economy_seats=100)
+        departure_time = datetime(2030, 1, 1, 8, 0)
+        for flight_id, remaining_economy_seats in ((1, 100), (2, 50)):
+            Flight.objects.create(
+                flight_id=flight_id, departure_time=departure_time, arrival_time=departure_time + timedelta(hours=2),
+                departure_airport=airport, arrival_airport=airport, remaining_first_class_seats=0,
+                remaining_business_seats=10, remaining_economy_seats=remaining_economy_seats, distance=1000,
+                plane=plane,
+            )
+        # 手工录入的机票会被重新定价，不会重复生成
+        Ticket.objects.create(price=1, baggage_allowance=25, ticket_type='adult', seat_type='economy', flight_id=1)
+
+    def prices(self, flight_id):
+        return dict(((ticket.seat_type, ticket.ticket_type), ticket.price)
+                    for ticket in Ticket.objects.filter(flight_id=flight_id))
+
+    def test_reprice(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(reprice_flights(), (2, 15, 1))
+
+        prices = self.prices(1)
+        # 没有头等舱的飞机不生成头等舱机票
+        self.assertEqual(len(prices), 8)
+        self.assertEqual(prices[('economy', 'adult')], 800)
+        self.assertEqual(prices[('business', 'senior')], 1400)
+        self.assertEqual(Ticket.objects.get(flight_id=1, seat_type='economy', ticket_type='adult').baggage_allowance,
+                         25)
+        # 经济舱上座率 50%，票价为 800 × (1 + 0.8 × 0.25)
+        self.assertEqual(self.prices(2)[('economy', 'adult')], 960)
+        self.assertEqual(FareSummary.objects.get(flight_id=2).min_price, 960)
+
+        # 座位售出后重新定价，只更新变化的票价
+        Flight.objects.filter(flight_id=1).update(remaining_economy_seats=50)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(reprice_flights([1]), (1, 0, 4))
+        self.assertEqual(self.prices(1)[('economy', 'adult')], 960)
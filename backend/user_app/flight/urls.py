@@ -1,6 +1,7 @@
 from django.urls import path
 from .views import CityView, SearchFlightView, FlightTicketInfoView, PurchaseTicketView, ConfirmOrderView, \
-    UserOrdersView, OrderDetailView, CancelOrderView, MinimumTicketPriceView
+    UserOrdersView, OrderDetailView, CancelOrderView, MinimumTicketPriceView, BatchPurchaseTicketView, \
+    MinimumTicketPriceBatchView, ConnectionSearchView, FareCalendarView
 
 urlpatterns = [
     # 搜索城市
@@ -9,15 +10,27 @@ urlpatterns = [
     # 按城市搜索航班
     path('search/', SearchFlightView.as_view(), name='flight_search'),
 
+    # 按城市搜索中转航班
+    path('search/connections/', ConnectionSearchView.as_view(), name='flight_connection_search'),
+
+    # 按城市查询一段日期内每天的最低票价（票价日历）
+    path('search/calendar/', FareCalendarView.as_view(), name='flight_fare_calendar'),
+
     # 获取航班最低成人票票价
     path('ticket/min_price/<int:flight_id>/', MinimumTicketPriceView.as_view(), name='min_ticket_price'),
 
+    # 批量获取多个航班的最低成人票票价
+    path('ticket/min_price/', MinimumTicketPriceBatchView.as_view(), name='min_ticket_price_batch'),
+
     # 获取某一航班的所有机票信息
     path('ticket/<int:flight_id>/', FlightTicketInfoView.as_view(), name='flight_detail'),
 
     # 创建订单
     path('order/purchase/', PurchaseTicketView.as_view(), name='flight_buy'),
 
+    # 批量创建订单（多位乘机人一次购票）
+    path('order/purchase/batch/', BatchPurchaseTicketView.as_view(), name='flight_buy_batch'),
+
     # 确认订单
     path('order/confirm/<int:order_id>/', ConfirmOrderView.as_view(), name='flight_confirm'),
 
@@ -1,3 +1,4 @@
+from collections import Counter
 from datetime import datetime, timedelta
 from django.db import transaction
 from django.utils.timezone import make_aware
@@ -5,42 +6,67 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from .models import Airport, Flight, City, Ticket, Order  # 假设City模型已经包含city_name和pinyin字段
+from .models import Airport, Flight, City, Ticket, Order, FareSummary  # 假设City模型已经包含city_name和pinyin字段
 from django.db.models import Q  # 用于复杂查询
 
-from .serializers import SimpleOrderSerializer, OrderSerializer
-from ..account.models import Passenger, UserPassengerRelation, User
+from analytics.rollups import record_order
+from common.pagination import KeysetPagination
+from .cache import get_cached_search, set_cached_search, invalidate_flight_search
+from .city_index import city_index
+from .connections import (connection_graph, itinerary_duration, itinerary_price, DEFAULT_MAX_LAYOVER,
+                          DEFAULT_MIN_CONNECTION, MAX_STOPS, SORT_KEYS)
+from .fares import build_fare_summaries, fare_calendar, MAX_CALENDAR_DAYS
+from .holds import hold_seats, release_holds, held_seats_many, hold_expires_at, is_hold_expired
+from .inventory import take_seats
+from .serializers import OrderSerializer, SIMPLE_ORDER_FIELDS, serialize_simple_orders
+from ..account.models import Passenger, UserPassengerRelation
+from ..level.services import update_user_progress
+
+
+# 航班搜索返回的字段：(返回字段名, 查询字段)
+SEARCH_RESULT_FIELDS = (
+    ("flight_id", "flight_id"),
+    ("departure_time", "departure_time"),
+    ("arrival_time", "arrival_time"),
+    ("departure_airport", "departure_airport__airport_name"),
+    ("arrival_airport", "arrival_airport__airport_name"),
+    ("remaining_first_class_seats", "remaining_first_class_seats"),
+    ("remaining_business_seats", "remaining_business_seats"),
+    ("remaining_economy_seats", "remaining_economy_seats"),
+    ("plane_model", "plane__model"),
+    ("min_price", "fare_summary__min_price"),
+    ("min_price_seat_type", "fare_summary__min_price_seat_type"),
+)
+
+
+# 各舱位售罄时的提示信息
+SOLD_OUT_MESSAGES = {
+    "economy": "No available economy seats for this flight.",
+    "business": "No available business class seats for this flight.",
+    "first_class": "No available first class seats for this flight.",
+}
+
+# 批量最低票价接口一次最多查询的航班数
+MAX_PRICE_BATCH_SIZE = 200
 
 
-# 考虑分页优化
 # Create your views here.
 class CityView(APIView):
     """
     城市查询接口。支持按拼音首字母排序的所有城市查询和模糊查询。
+    查询走进程内的自动补全索引，不访问数据库；match=prefix 时只做前缀匹配。
     """
 
     @staticmethod
     def get(request):
         query = request.query_params.get('query', '')  # 获取查询参数，默认为空字符串
+        prefix = request.query_params.get('match') == 'prefix'
+        pagination = KeysetPagination(request, ('pinyin', 'city_code'))
 
-        if query:  # 如果有查询条件，则进行模糊查询
-            cities = City.objects.filter(
-                Q(city_name__icontains=query) |  # 模糊查询城市名
-                Q(pinyin__icontains=query)  # 模糊查询拼音首字母
-            ).order_by('pinyin')  # 按拼音首字母排序
-        else:  # 如果没有查询条件，则返回所有城市，按拼音首字母排序
-            cities = City.objects.all().order_by('pinyin')
-
-        # 将城市数据序列化并返回
-        city_list = [
-            {
-                "city_name": city.city_name,  # 城市名称
-                "city_code": city.city_code,  # 城市编号
-                "pinyin": city.pinyin,  # 城市拼音
-            }
-            for city in cities
-        ]
-        return Response(city_list, status=status.HTTP_200_OK)
+        # 按城市名、拼音首字母或完整拼音查询，结果已按拼音首字母排序
+        city_list = city_index.search(query, prefix=prefix)
+        city_list = pagination.paginate_list(city_list, key=lambda city, field: city[field] or '')
+        return pagination.get_response(city_list)
 
 
 class SearchFlightView(APIView):
@@ -56,6 +82,7 @@ class SearchFlightView(APIView):
         departure_city_code = request.query_params.get('departure_city_code')
         arrival_city_code = request.query_params.get('arrival_city_code')
         departure_date = request.query_params.get('departure_date')  # 新增参数：起飞日期
+        pagination = KeysetPagination(request, ('departure_time', 'flight_id'))
 
         # 校验参数
         if not departure_city_code or not arrival_city_code:
@@ -65,23 +92,13 @@ class SearchFlightView(APIView):
             )
 
         try:
-            # 查找起始城市和终点城市的所有机场
-            departure_airports = Airport.objects.filter(city__city_code=departure_city_code)
-            arrival_airports = Airport.objects.filter(city__city_code=arrival_city_code)
-
-            if not departure_airports.exists() or not arrival_airports.exists():
-                return Response(
-                    {"error": "No airports found for one or both provided city codes."},
-                    status=status.HTTP_404_NOT_FOUND
-                )
+            # 优先读取缓存，缓存按航线版本号失效，座位变化后不会返回旧数据
+            cache_key, flight_data = get_cached_search(departure_city_code, arrival_city_code, departure_date)
+            if flight_data is not None:
+                return SearchFlightView._build_response(flight_data, pagination)
 
-            # 查询这些机场之间的航班
-            flight_query = Flight.objects.filter(
-                departure_airport__in=departure_airports,
-                arrival_airport__in=arrival_airports,
-            )
-
-            # 如果提供了起飞日期，则进一步筛选
+            # 如果提供了起飞日期，则按时间范围筛选
+            date_filter = {}
             if departure_date:
                 try:
                     # 转换日期字符串为 naive datetime（不带时区）
@@ -89,42 +106,177 @@ class SearchFlightView(APIView):
                     end_time = start_time + timedelta(days=1)
 
                     # 直接过滤时间范围，避免 __date 失效
-                    flight_query = flight_query.filter(
-                        departure_time__gte=start_time,
-                        departure_time__lt=end_time
-                    )
+                    date_filter = {
+                        "departure_time__gte": start_time,
+                        "departure_time__lt": end_time,
+                    }
                 except ValueError:
                     return Response(
                         {"error": "Invalid date format. Please use YYYY-MM-DD."},
                         status=status.HTTP_400_BAD_REQUEST,
                     )
 
-            print(flight_query)
-
-            # 如果没有找到航班
-            if not flight_query.exists():
-                return Response(
-                    {"message": "No flights found for the provided city codes and date."},
-                    status=status.HTTP_404_NOT_FOUND
+            # 一次连表查询取出所需的全部字段，避免逐行加载机场和飞机
+            flight_query = Flight.objects.filter(
+                departure_airport__city_id=departure_city_code,
+                arrival_airport__city_id=arrival_city_code,
+                **date_filter,
+            ).order_by('departure_time', 'flight_id')
+
+            result_names = [name for name, _ in SEARCH_RESULT_FIELDS]
+            flight_data = [
+                dict(zip(result_names, row))
+                for row in flight_query.values_list(*[field for _, field in SEARCH_RESULT_FIELDS]).iterator()
+            ]
+
+            # 没有航班时再区分是否是城市没有机场
+            if not flight_data:
+                cities_with_airports = set(
+                    Airport.objects.filter(city_id__in=[departure_city_code, arrival_city_code])
+                    .values_list('city_id', flat=True)
                 )
+                if {departure_city_code, arrival_city_code} - cities_with_airports:
+                    return Response(
+                        {"error": "No airports found for one or both provided city codes."},
+                        status=status.HTTP_404_NOT_FOUND
+                    )
 
-            # 序列化航班信息
-            flight_data = []
-            for flight in flight_query:
-                flight_data.append({
-                    "flight_id": flight.flight_id,
-                    "departure_time": flight.departure_time,
-                    "arrival_time": flight.arrival_time,
-                    "departure_airport": flight.departure_airport.airport_name,
-                    "arrival_airport": flight.arrival_airport.airport_name,
-                    "remaining_first_class_seats": flight.remaining_first_class_seats,
-                    "remaining_business_seats": flight.remaining_business_seats,
-                    "remaining_economy_seats": flight.remaining_economy_seats,
-                    "plane_model": flight.plane.model,
-                })
+            # 空结果同样缓存，避免热门但无航班的查询反复访问数据库
+            set_cached_search(cache_key, flight_data)
+            return SearchFlightView._build_response(flight_data, pagination)
+
+        except Exception as e:
+            return Response(
+                {"error": f"An error occurred: {str(e)}"},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+    @staticmethod
+    def _build_response(flight_data, pagination):
+        # 如果没有找到航班
+        if not flight_data:
+            return Response(
+                {"message": "No flights found for the provided city codes and date."},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        return pagination.get_response(pagination.paginate_list(flight_data))
 
-            return Response(flight_data, status=status.HTTP_200_OK)
 
+class ConnectionSearchView(APIView):
+    """
+    中转航班搜索：没有直飞航班的航线也能查到经一到两次中转的行程。
+    输入：起始城市外码（departure_city_code）、终点城市外码（arrival_city_code）、起飞日期（departure_date），
+         可选最多中转次数（max_stops，0~2）、最短中转时间（min_connection_minutes）、最长中转等待时间（max_layover_minutes）、
+         排序方式（sort：duration 按总耗时，price 按最低票价之和）、返回数量（limit）
+    输出：按排序方式排列的行程及其各航段信息
+    """
+
+    @staticmethod
+    def get(request):
+        departure_city_code = request.query_params.get('departure_city_code')
+        arrival_city_code = request.query_params.get('arrival_city_code')
+        departure_date = request.query_params.get('departure_date')
+
+        if not departure_city_code or not arrival_city_code or not departure_date:
+            return Response(
+                {"error": "Please provide departure and arrival city codes and a departure date."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            day = datetime.strptime(departure_date, "%Y-%m-%d").date()
+        except ValueError:
+            return Response(
+                {"error": "Invalid date format. Please use YYYY-MM-DD."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        try:
+            max_stops = int(request.query_params.get('max_stops', MAX_STOPS))
+            min_connection = timedelta(minutes=int(request.query_params.get(
+                'min_connection_minutes', DEFAULT_MIN_CONNECTION.total_seconds() // 60)))
+            max_layover = timedelta(minutes=int(request.query_params.get(
+                'max_layover_minutes', DEFAULT_MAX_LAYOVER.total_seconds() // 60)))
+            limit = int(request.query_params.get('limit', 20))
+        except ValueError:
+            return Response({"error": "Numeric parameters must be integers."}, status=status.HTTP_400_BAD_REQUEST)
+        sort = request.query_params.get('sort', 'duration')
+
+        if not 0 <= max_stops <= MAX_STOPS or not timedelta(0) <= min_connection <= max_layover \
+                or max_layover > timedelta(days=1) or not 1 <= limit <= 50 or sort not in SORT_KEYS:
+            return Response({"error": "Invalid search parameters."}, status=status.HTTP_400_BAD_REQUEST)
+
+        itineraries = connection_graph.search(
+            departure_city_code, arrival_city_code, day, max_stops=max_stops,
+            min_connection=min_connection, max_layover=max_layover, sort=sort, limit=limit,
+        )
+        if not itineraries:
+            return Response(
+                {"message": "No itineraries found for the provided city codes and date."},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        return Response({"itineraries": [
+            {
+                "stops": len(legs) - 1,
+                "departure_time": legs[0].departure_time,
+                "arrival_time": legs[-1].arrival_time,
+                "duration_minutes": int(itinerary_duration(legs).total_seconds() // 60),
+                "min_price": itinerary_price(legs),
+                "legs": [
+                    {
+                        "flight_id": leg.flight_id,
+                        "departure_airport": leg.departure_airport,
+                        "arrival_airport": leg.arrival_airport,
+                        "departure_time": leg.departure_time,
+                        "arrival_time": leg.arrival_time,
+                        "min_price": leg.min_price,
+                    }
+                    for leg in legs
+                ],
+            }
+            for legs in itineraries
+        ]}, status=status.HTTP_200_OK)
+
+
+class FareCalendarView(APIView):
+    """
+    票价日历：一次返回某航线在一段日期内每天的最低成人票价和余票情况，用于查找最便宜的出发日期。
+    输入：起始城市外码（departure_city_code）、终点城市外码（arrival_city_code）、
+         开始日期（start_date）、结束日期（end_date，含当天，最多 62 天）
+    输出：每天的航班数、有余票的航班数和有余票舱位的最低成人票价
+    """
+
+    @staticmethod
+    def get(request):
+        departure_city_code = request.query_params.get('departure_city_code')
+        arrival_city_code = request.query_params.get('arrival_city_code')
+        start_date = request.query_params.get('start_date')
+        end_date = request.query_params.get('end_date')
+
+        if not departure_city_code or not arrival_city_code or not start_date or not end_date:
+            return Response(
+                {"error": "Please provide departure and arrival city codes, a start date and an end date."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            start = datetime.strptime(start_date, "%Y-%m-%d").date()
+            end = datetime.strptime(end_date, "%Y-%m-%d").date()
+        except ValueError:
+            return Response(
+                {"error": "Invalid date format. Please use YYYY-MM-DD."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if not timedelta(0) <= end - start < timedelta(days=MAX_CALENDAR_DAYS):
+            return Response(
+                {"error": f"The date range must cover between 1 and {MAX_CALENDAR_DAYS} days."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        try:
+            calendar = fare_calendar(departure_city_code, arrival_city_code, start, end)
+            return Response({"calendar": calendar}, status=status.HTTP_200_OK)
         except Exception as e:
             return Response(
                 {"error": f"An error occurred: {str(e)}"},
@@ -142,24 +294,24 @@ class MinimumTicketPriceView(APIView):
     @staticmethod
     def get(request, flight_id):
         try:
-            # 获取航班的所有成人票
-            tickets = Ticket.objects.filter(flight_id=flight_id, ticket_type='adult')
+            # 读取预先计算的票价汇总
+            summary = FareSummary.objects.filter(flight_id=flight_id).first()
+            if summary is None:
+                # 汇总缺失时临时计算，不在读请求中写库；缺失的汇总由 refresh_fare_summaries 补齐
+                summary = build_fare_summaries([flight_id])[0]
 
             # 如果没有找到成人票，返回404
-            if not tickets.exists():
+            if summary is None or summary.min_price is None:
                 return Response(
                     {"message": "No adult tickets found for the provided flight ID."},
                     status=status.HTTP_404_NOT_FOUND,
                 )
 
-            # 获取最低价格的机票
-            min_ticket = tickets.order_by('price').first()
-
             return Response(
                 {
                     "flight_id": flight_id,
-                    "min_price": min_ticket.price,
-                    "seat_type": min_ticket.seat_type,  # 返回座位类型
+                    "min_price": summary.min_price,
+                    "seat_type": summary.min_price_seat_type,  # 返回座位类型
                 },
                 status=status.HTTP_200_OK,
             )
@@ -170,6 +322,44 @@ class MinimumTicketPriceView(APIView):
             )
 
 
+class MinimumTicketPriceBatchView(APIView):
+    """
+    批量获取多个航班的最低成人票票价
+    输入：flight_ids，逗号分隔的航班ID
+    输出：每个航班的最低票价、对应座位类型及各舱位最低票价，没有成人票的航班不返回
+    """
+
+    @staticmethod
+    def get(request):
+        try:
+            flight_ids = [int(flight_id) for flight_id in request.query_params.get('flight_ids', '').split(',')
+                          if flight_id.strip()]
+        except ValueError:
+            return Response({"error": "Invalid flight_ids."}, status=status.HTTP_400_BAD_REQUEST)
+
+        if not flight_ids:
+            return Response({"error": "Please provide flight_ids."}, status=status.HTTP_400_BAD_REQUEST)
+        if len(flight_ids) > MAX_PRICE_BATCH_SIZE:
+            return Response({"error": f"At most {MAX_PRICE_BATCH_SIZE} flight_ids per request."},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        summaries = FareSummary.objects.filter(flight_id__in=flight_ids, min_price__isnull=False)
+        return Response(
+            [
+                {
+                    "flight_id": summary.flight_id,
+                    "min_price": summary.min_price,
+                    "seat_type": summary.min_price_seat_type,
+                    "min_economy_price": summary.min_economy_price,
+                    "min_business_price": summary.min_business_price,
+                    "min_first_class_price": summary.min_first_class_price,
+                }
+                for summary in summaries
+            ],
+            status=status.HTTP_200_OK,
+        )
+
+
 class FlightTicketInfoView(APIView):
     """
     展示某一航班的所有机票信息。
@@ -189,6 +379,9 @@ class FlightTicketInfoView(APIView):
             if not tickets:
                 return Response({"message": "No tickets available for this flight."}, status=status.HTTP_404_NOT_FOUND)
 
+            # 扣除待支付订单预留的座位
+            held = held_seats_many(flight.flight_id)
+
             # 构建机票数据
             ticket_data = []
             for ticket in tickets:
@@ -198,7 +391,7 @@ class FlightTicketInfoView(APIView):
                     "seat_type": ticket.seat_type,  # 返回座位类型
                     "price": ticket.price,
                     "baggage_allowance": ticket.baggage_allowance,
-                    "remaining_seats": self.get_remaining_seats(ticket, flight),
+                    "remaining_seats": max(self.get_remaining_seats(ticket, flight) - held[ticket.seat_type], 0),
                 })
 
             # 返回航班的所有机票信息
@@ -243,7 +436,9 @@ class PurchaseTicketView(APIView):
             with transaction.atomic():
                 # 获取乘机人和机票信息
                 passenger = Passenger.objects.select_for_update().get(id=passenger_id)
-                ticket = Ticket.objects.select_related("flight").get(ticket_id=ticket_id)
+                ticket = Ticket.objects.select_related(
+                    "flight__departure_airport", "flight__arrival_airport"
+                ).get(ticket_id=ticket_id)
 
                 order = Order.objects.filter(ticket=ticket, passenger=passenger, status="confirmed").first()
 
@@ -264,45 +459,24 @@ class PurchaseTicketView(APIView):
                         status=status.HTTP_400_BAD_REQUEST,
                     )
 
-                flight = ticket.flight
-
-                # 锁定航班记录
-                flight = Flight.objects.select_for_update().get(flight_id=flight.flight_id)
-
-                # 确保有足够座位
-                if ticket.seat_type == "economy" and flight.remaining_economy_seats <= 0:
-                    return Response(
-                        {"error": "No available economy seats for this flight."},
-                        status=status.HTTP_400_BAD_REQUEST,
-                    )
-                elif ticket.seat_type == "business" and flight.remaining_business_seats <= 0:
+                # 预留座位，支付成功后才真正扣减，超时未支付自动释放
+                if not hold_seats(ticket.flight_id, ticket.seat_type):
                     return Response(
-                        {"error": "No available business class seats for this flight."},
-                        status=status.HTTP_400_BAD_REQUEST,
-                    )
-                elif ticket.seat_type == "first_class" and flight.remaining_first_class_seats <= 0:
-                    return Response(
-                        {"error": "No available first class seats for this flight."},
+                        {"error": SOLD_OUT_MESSAGES[ticket.seat_type]},
                         status=status.HTTP_400_BAD_REQUEST,
                     )
 
                 # 创建订单
-                order = Order.objects.create(
-                    passenger=passenger,
-                    ticket=ticket,
-                    total_price=ticket.price,
-                    status="pending",
-                )
-
-                # 更新航班座位
-                if ticket.seat_type == "economy":
-                    flight.remaining_economy_seats -= 1
-                elif ticket.seat_type == "business":
-                    flight.remaining_business_seats -= 1
-                elif ticket.seat_type == "first_class":
-                    flight.remaining_first_class_seats -= 1
-
-                flight.save()
+                try:
+                    order = Order.objects.create(
+                        passenger=passenger,
+                        ticket=ticket,
+                        total_price=ticket.price,
+                        status="pending",
+                    )
+                except Exception:
+                    release_holds(ticket.flight_id, ticket.seat_type)
+                    raise
 
             return Response(
                 {
@@ -313,6 +487,7 @@ class PurchaseTicketView(APIView):
                     "seat_type": ticket.seat_type,
                     "total_price": order.total_price,
                     "purchase_time": order.purchase_time,
+                    "expires_at": hold_expires_at(order),
                 },
                 status=status.HTTP_201_CREATED,
             )
@@ -330,6 +505,154 @@ class PurchaseTicketView(APIView):
             return Response({"error": f"System error: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+class BatchPurchaseTicketView(APIView):
+    """
+    批量购票接口，一次为多位乘机人购买机票，全部成功或全部失败。
+    输入：items，形如 [{"passenger_id": 1, "ticket_id": 2}, ...]
+    输出：创建的所有订单
+    """
+
+    @staticmethod
+    def post(request):
+        items = request.data.get("items")
+        if not isinstance(items, list) or not items:
+            return Response({"error": "Please provide a non-empty list of items."}, status=status.HTTP_400_BAD_REQUEST)
+
+        pairs = []
+        for item in items:
+            passenger_id = item.get("passenger_id") if isinstance(item, dict) else None
+            ticket_id = item.get("ticket_id") if isinstance(item, dict) else None
+            if not passenger_id or not ticket_id:
+                return Response(
+                    {"error": "Missing passenger_id or ticket_id."},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            try:
+                pairs.append((int(passenger_id), int(ticket_id)))
+            except (TypeError, ValueError):
+                return Response(
+                    {"error": "passenger_id and ticket_id must be integers."},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+
+        if len(set(pairs)) != len(pairs):
+            return Response({"error": "Duplicate passenger and ticket pairs."}, status=status.HTTP_400_BAD_REQUEST)
+
+        passenger_ids = {passenger_id for passenger_id, _ in pairs}
+        ticket_ids = {ticket_id for _, ticket_id in pairs}
+
+        try:
+            with transaction.atomic():
+                # 一次性锁定并获取所有乘机人和机票
+                passengers = Passenger.objects.select_for_update().in_bulk(passenger_ids)
+                tickets = Ticket.objects.in_bulk(ticket_ids)
+                if len(passengers) != len(passenger_ids):
+                    return Response({"error": "Passenger not found."}, status=status.HTTP_404_NOT_FOUND)
+                if len(tickets) != len(ticket_ids):
+                    return Response({"error": "Ticket not found."}, status=status.HTTP_404_NOT_FOUND)
+
+                purchased = set(
+                    Order.objects.filter(
+                        passenger_id__in=passenger_ids, ticket_id__in=ticket_ids, status="confirmed"
+                    ).values_list("passenger_id", "ticket_id")
+                ) & set(pairs)
+                if purchased:
+                    return Response(
+                        {"error": "You have already purchased this ticket.", "items": [
+                            {"passenger_id": passenger_id, "ticket_id": ticket_id}
+                            for passenger_id, ticket_id in sorted(purchased)
+                        ]},
+                        status=status.HTTP_400_BAD_REQUEST,
+                    )
+
+                # 验证乘机人类型与机票类型匹配
+                for passenger_id, ticket_id in pairs:
+                    passenger, ticket = passengers[passenger_id], tickets[ticket_id]
+                    if ticket.ticket_type != 'adult' and passenger.person_type != ticket.ticket_type:
+                        return Response(
+                            {
+                                "error": f"Passenger type '{passenger.person_type}' does not match ticket type '{ticket.ticket_type}'."
+                            },
+                            status=status.HTTP_400_BAD_REQUEST,
+                        )
+
+                # 按航班和舱位汇总后一次性预留座位
+                seat_counts = Counter((tickets[ticket_id].flight_id, tickets[ticket_id].seat_type)
+                                      for _, ticket_id in pairs)
+                held = []
+                for (flight_id, seat_type), count in seat_counts.items():
+                    if not hold_seats(flight_id, seat_type, count):
+                        for held_flight_id, held_seat_type, held_count in held:
+                            release_holds(held_flight_id, held_seat_type, held_count)
+                        return Response(
+                            {"error": SOLD_OUT_MESSAGES[seat_type], "flight_id": flight_id},
+                            status=status.HTTP_400_BAD_REQUEST,
+                        )
+                    held.append((flight_id, seat_type, count))
+
+                try:
+                    orders = BatchPurchaseTicketView._create_orders(pairs, tickets)
+                except Exception:
+                    for held_flight_id, held_seat_type, held_count in held:
+                        release_holds(held_flight_id, held_seat_type, held_count)
+                    raise
+
+            return Response(
+                {
+                    "message": "Tickets purchased successfully.",
+                    "orders": [
+                        {
+                            "order_id": order.order_id,
+                            "passenger_id": order.passenger_id,
+                            "ticket_id": order.ticket_id,
+                            "ticket_type": tickets[order.ticket_id].ticket_type,
+                            "status": order.status,
+                            "seat_type": tickets[order.ticket_id].seat_type,
+                            "total_price": order.total_price,
+                            "purchase_time": order.purchase_time,
+                            "expires_at": hold_expires_at(order),
+                        }
+                        for order in orders
+                    ],
+                },
+                status=status.HTTP_201_CREATED,
+            )
+
+        except Exception as e:
+            return Response({"error": f"System error: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    @staticmethod
+    def _create_orders(pairs, tickets):
+        """
+        用 bulk_create 一次写入所有订单。
+        MySQL 不会返回批量插入的主键，此时按乘机人和机票回查本事务刚插入的订单：
+        乘机人已被本事务锁定，这些乘机人最新的订单必然是本次插入的。
+        """
+        orders = Order.objects.bulk_create([
+            Order(
+                passenger_id=passenger_id,
+                ticket_id=ticket_id,
+                total_price=tickets[ticket_id].price,
+                status="pending",
+            )
+            for passenger_id, ticket_id in pairs
+        ])
+
+        if any(order.order_id is None for order in orders):
+            created = {
+                (passenger_id, ticket_id): order_id
+                for order_id, passenger_id, ticket_id in Order.objects.filter(
+                    passenger_id__in={passenger_id for passenger_id, _ in pairs},
+                    ticket_id__in={ticket_id for _, ticket_id in pairs},
+                    status="pending",
+                ).order_by('-order_id').values_list('order_id', 'passenger_id', 'ticket_id')[:len(pairs)]
+            }
+            for order in orders:
+                order.order_id = created[(order.passenger_id, order.ticket_id)]
+
+        return orders
+
+
 class ConfirmOrderView(APIView):
     """
     支付订单视图，确认订单并扣减座位。
@@ -339,38 +662,57 @@ class ConfirmOrderView(APIView):
     @staticmethod
     def post(request, order_id):
         try:
-            # 获取订单
-            order = Order.objects.select_related("ticket__flight", "passenger").get(order_id=order_id)
+            with transaction.atomic():
+                # 锁定订单记录，防止与超时清理任务并发修改
+                order = Order.objects.select_for_update().get(order_id=order_id)
 
-            auth_user = request.user
-            user = User.objects.get(name=auth_user.username)
-            # 检查当前用户是否与该订单的乘机人有关联
-            if not UserPassengerRelation.objects.filter(user_id=user.id, passenger=order.passenger).exists():
-                return Response(
-                    {"error": "You do not have permission to confirm this order."},
-                    status=status.HTTP_403_FORBIDDEN,
-                )
+                user = request.domain_user
+                if not user:
+                    return Response({"error": "User not found."}, status=status.HTTP_404_NOT_FOUND)
+                # 检查当前用户是否与该订单的乘机人有关联
+                if not UserPassengerRelation.objects.filter(user_id=user.id, passenger_id=order.passenger_id).exists():
+                    return Response(
+                        {"error": "You do not have permission to confirm this order."},
+                        status=status.HTTP_403_FORBIDDEN,
+                    )
 
-            # 检查订单状态
-            if order.status != "pending":
-                return Response({"error": "Only pending orders can be confirmed."}, status=status.HTTP_400_BAD_REQUEST)
+                # 检查订单状态
+                if order.status != "pending":
+                    return Response({"error": "Only pending orders can be confirmed."}, status=status.HTTP_400_BAD_REQUEST)
 
-            flight = order.ticket.flight
+                ticket = Ticket.objects.select_related(
+                    "flight__departure_airport", "flight__arrival_airport"
+                ).get(ticket_id=order.ticket_id)
+                order.ticket = ticket
+                flight = ticket.flight
 
-            # 锁定航班记录
-            with transaction.atomic():
-                flight = Flight.objects.select_for_update().get(flight_id=flight.flight_id)
+                # 座位预留已过期，取消订单并释放预留
+                if is_hold_expired(order):
+                    order.status = "canceled"
+                    order.save()
+                    transaction.on_commit(lambda: release_holds(flight.flight_id, ticket.seat_type))
+                    return Response(
+                        {"error": "Order has expired and its seat hold was released."},
+                        status=status.HTTP_400_BAD_REQUEST,
+                    )
+
+                # 将座位预留转为正式扣减
+                if not take_seats(flight.flight_id, ticket.seat_type):
+                    return Response(
+                        {"error": SOLD_OUT_MESSAGES[ticket.seat_type]},
+                        status=status.HTTP_400_BAD_REQUEST,
+                    )
+                transaction.on_commit(lambda: release_holds(flight.flight_id, ticket.seat_type))
 
-                # 更新订单状态和航班座位
                 order.status = "confirmed"  # 更新订单状态为已支付
                 order.save()
 
-                flight.save()
+                # 当付款成功时，计算用户累计里程数与购票数，并同步更新会员等级
+                update_user_progress(user.pk, flight.distance, 1)
+                # 计入统计汇总
+                record_order(order, flight)
 
-            # 当付款成功时，计算用户累计里程数与购票数
-            user.accumulated_miles += flight.distance
-            user.ticked_count += 1
-            user.save()
+                invalidate_flight_search(flight)
 
             return Response(
                 {"message": "Order confirmed successfully.", "order_id": order.order_id, "status": order.status},
@@ -393,8 +735,9 @@ class UserOrdersView(APIView):
     def get(self, request):
         status_filter = request.query_params.get('status')  # 获取订单状态筛选条件
 
-        auth_user = request.user
-        user = User.objects.get(name=auth_user.username)
+        user = request.domain_user
+        if not user:
+            return Response({"error": "User not found."}, status=status.HTTP_404_NOT_FOUND)
 
         passenger_ids = UserPassengerRelation.objects.filter(user_id=user.id).values_list('passenger_id',
                                                                                           flat=True)
@@ -404,9 +747,10 @@ class UserOrdersView(APIView):
         if status_filter:
             orders = orders.filter(status=status_filter)
 
-        orders = orders.order_by('-purchase_time')  # 按时间降序排列
-        serializer = SimpleOrderSerializer(orders, many=True)
-        return Response(serializer.data, status=200)
+        # 按时间降序排列，传入 cursor 或 page_size 时按游标分页；只取列表需要的列，一次联表查询完成
+        pagination = KeysetPagination(request, ('-purchase_time', '-order_id'))
+        orders = pagination.paginate_queryset(orders.values(*SIMPLE_ORDER_FIELDS))
+        return pagination.get_response(serialize_simple_orders(orders))
 
 
 class OrderDetailView(APIView):
@@ -418,12 +762,14 @@ class OrderDetailView(APIView):
     def get(self, request, order_id):
         try:
             # 获取订单
-            order = Order.objects.select_related("ticket__flight", "passenger").get(order_id=order_id)
+            order = (Order.objects.select_related(*OrderSerializer.RELATED).only(*OrderSerializer.ONLY)
+                     .get(order_id=order_id))
 
-            auth_user = request.user
-            user = User.objects.get(name=auth_user.username)
+            user = request.domain_user
+            if not user:
+                return Response({"error": "User not found."}, status=status.HTTP_404_NOT_FOUND)
             # 检查当前用户是否与该订单的乘机人有关联
-            if not UserPassengerRelation.objects.filter(user_id=user.id, passenger=order.passenger).exists():
+            if not UserPassengerRelation.objects.filter(user_id=user.id, passenger_id=order.passenger_id).exists():
                 return Response(
                     {"error": "You do not have permission to confirm this order."},
                     status=status.HTTP_403_FORBIDDEN,
@@ -450,8 +796,9 @@ class CancelOrderView(APIView):
                     order_id=order_id
                 )
 
-                auth_user = request.user
-                user = User.objects.get(name=auth_user.username)
+                user = request.domain_user
+                if not user:
+                    return Response({"error": "User not found."}, status=status.HTTP_404_NOT_FOUND)
 
                 # 检查当前用户是否与该订单的乘机人有关联
                 if not UserPassengerRelation.objects.filter(user_id=user.id,
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class LevelConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'user_app.level'
+
+    def ready(self):
+        from . import signals  # noqa: F401
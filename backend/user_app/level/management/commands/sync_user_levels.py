@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand
+
+from common.middleware import invalidate_domain_user
+from user_app.account.models import User
+from user_app.level.services import resolve_level_number
+
+
+class Command(BaseCommand):
+    help = "按累计里程与购票数分批重新计算所有用户的会员等级，修改等级阈值后需运行"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help="每批处理的用户数")
+        parser.add_argument('--verify', action='store_true', help="只检查并报告等级不一致的用户，不写入")
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        checked = mismatched = 0
+        last_id = 0
+
+        while True:
+            # 按主键分批读取，避免一次加载全部用户
+            users = list(
+                User.objects.filter(id__gt=last_id).order_by('id')
+                .only('id', 'name', 'accumulated_miles', 'ticked_count', 'level')[:batch_size]
+            )
+            if not users:
+                break
+            last_id = users[-1].id
+            checked += len(users)
+
+            changed = []
+            for user in users:
+                level = resolve_level_number(user.accumulated_miles, user.ticked_count)
+                if user.level != level:
+                    if options['verify']:
+                        self.stdout.write(f"用户 {user.name} 的等级为 {user.level}，应为 {level}")
+                    user.level = level
+                    changed.append(user)
+            mismatched += len(changed)
+
+            if changed and not options['verify']:
+                # bulk_update 不触发 post_save，需要手动清除缓存的业务用户
+                User.objects.bulk_update(changed, ['level'])
+                for user in changed:
+                    invalidate_domain_user(user.name)
+
+        action = "发现" if options['verify'] else "已更新"
+        self.stdout.write(f"共检查 {checked} 个用户，{action} {mismatched} 个等级不一致的用户")
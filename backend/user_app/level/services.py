@@ -0,0 +1,201 @@
+import threading
+from bisect import bisect_left, bisect_right
+from datetime import date
+
+from django.db import transaction
+
+from user_app.account.models import User
+from common.versioning import get_version, bump_version
+
+LEVEL_TABLE_VERSION_KEY = "level_table:version"
+PROMOTION_INDEX_VERSION_KEY = "promotion_index:version"
+
+
+class LevelTable:
+    """
+    进程内的会员等级阈值表。
+
+    等级按 level 排序，所需里程与所需购票次数分别保存为有序数组，
+    解析用户等级时用二分查找代替逐条扫描全部等级。
+    等级变更时通过缓存中的版本号通知所有进程重新加载。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._levels = []
+        self._numbers = []
+        self._miles = []
+        self._tickets = []
+        self._sorted = True
+
+    def _build(self, version):
+        from .models import Level
+
+        levels = list(Level.objects.order_by('level'))
+        miles = [level.require_miles for level in levels]
+        tickets = [level.require_tickets for level in levels]
+        self._levels, self._miles, self._tickets = levels, miles, tickets
+        self._numbers = [level.level for level in levels]
+        # 阈值随等级递增时才能二分查找，否则退化为逐级检查
+        self._sorted = miles == sorted(miles) and tickets == sorted(tickets)
+        self._version = version
+
+    def _ensure_current(self):
+        version = get_version(LEVEL_TABLE_VERSION_KEY)
+        if version != self._version:
+            with self._lock:
+                if version != self._version:
+                    self._build(version)
+
+    def _reached(self, miles, tickets):
+        """
+        用户已达到的等级数：从最低等级逐级检查，里程或购票次数满足其一即达到，遇到第一个未达到的等级为止。
+        """
+        if self._sorted:
+            return max(bisect_right(self._miles, miles), bisect_right(self._tickets, tickets))
+        for position, level in enumerate(self._levels):
+            if miles < level.require_miles and tickets < level.require_tickets:
+                return position
+        return len(self._levels)
+
+    def resolve(self, miles, tickets):
+        """
+        根据累计里程与购票次数返回 (当前等级, 下一等级)，不存在时为 None。
+        """
+        self._ensure_current()
+        levels = self._levels
+        reached = self._reached(miles, tickets)
+        current_level = levels[reached - 1] if reached else None
+        next_level = levels[reached] if reached < len(levels) else None
+        return current_level, next_level
+
+
+    def by_number(self, level_number):
+        """
+        根据等级编号（Level.level，None 表示未达到任何等级）返回 (当前等级, 下一等级)；
+        编号不在等级表中（等级已被删除）时返回 None。
+        """
+        self._ensure_current()
+        levels = self._levels
+        reached = 0
+        if level_number is not None:
+            position = bisect_left(self._numbers, level_number)
+            if position == len(levels) or self._numbers[position] != level_number:
+                return None
+            reached = position + 1
+        current_level = levels[reached - 1] if reached else None
+        next_level = levels[reached] if reached < len(levels) else None
+        return current_level, next_level
+
+
+level_table = LevelTable()
+
+
+def invalidate_level_table():
+    """
+    等级数据变化后调用，所有进程在下次查询时重新加载等级表。
+    """
+    bump_version(LEVEL_TABLE_VERSION_KEY)
+
+
+class PromotionIndex:
+    """
+    进程内的优惠活动索引。
+
+    活动按适用等级分桶，桶内按开始日期排序；每天第一次查询时用二分查找截出当天已开始的活动，
+    再按结束日期过滤，得到各等级当天有效活动的序列化结果，之后的查询直接返回，不访问数据库。
+    活动变更时通过缓存中的版本号通知所有进程重建。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._day = None
+        self._buckets = {}
+        self._active = {}
+
+    def _build(self, version):
+        from .models import Promotion
+
+        buckets = {}
+        for promotion in Promotion.objects.order_by('start_date', 'end_date', 'id'):
+            buckets.setdefault(promotion.level_id, []).append(promotion)
+        self._buckets = {
+            level_id: ([promotion.start_date for promotion in promotions], promotions)
+            for level_id, promotions in buckets.items()
+        }
+        self._version = version
+        self._day = None
+
+    def _select_active(self, day):
+        from .serializers import PromotionSerializer
+
+        active = {}
+        for level_id, (start_dates, promotions) in self._buckets.items():
+            started = promotions[:bisect_right(start_dates, day)]
+            active[level_id] = PromotionSerializer(
+                [promotion for promotion in started if promotion.end_date >= day], many=True
+            ).data
+        self._active = active
+        self._day = day
+
+    def _ensure_current(self, day):
+        version = get_version(PROMOTION_INDEX_VERSION_KEY)
+        if version != self._version or day != self._day:
+            with self._lock:
+                if version != self._version:
+                    self._build(version)
+                if day != self._day:
+                    self._select_active(day)
+
+    def active(self, level, day=None):
+        """
+        返回某等级在指定日期（默认今天）有效的活动，格式同 PromotionSerializer。
+        """
+        day = day or date.today()
+        self._ensure_current(day)
+        return list(self._active.get(level.id, ()))
+
+
+promotion_index = PromotionIndex()
+
+
+def invalidate_promotion_index():
+    """
+    活动数据变化后调用，所有进程在下次查询时重建活动索引。
+    """
+    bump_version(PROMOTION_INDEX_VERSION_KEY)
+
+
+def resolve_level_number(miles, tickets):
+    """
+    根据累计里程与购票次数返回等级编号（Level.level），未达到任何等级时为 None。
+    """
+    current_level, _ = level_table.resolve(miles, tickets)
+    return current_level.level if current_level else None
+
+
+def user_levels(user):
+    """
+    用户的 (当前等级, 下一等级)。优先使用随订单同步保存的 User.level，不再按里程和购票次数重新解析；
+    为空（未达到任何等级或尚未回填）时才解析。等级阈值修改后，已保存的等级在 sync_user_levels 后更新。
+    """
+    level_number = user.level
+    if level_number is None:
+        level_number = resolve_level_number(user.accumulated_miles, user.ticked_count)
+    return level_table.by_number(level_number) or level_table.resolve(user.accumulated_miles, user.ticked_count)
+
+
+def update_user_progress(user_id, miles, tickets):
+    """
+    累加用户的里程与购票次数并同步更新会员等级，与调用方的订单修改处于同一事务。
+    锁定用户记录，避免并发支付、退款时相互覆盖。
+    """
+    with transaction.atomic():
+        user = User.objects.select_for_update().get(pk=user_id)
+        user.accumulated_miles += miles
+        user.ticked_count += tickets
+        user.level = resolve_level_number(user.accumulated_miles, user.ticked_count)
+        user.save(update_fields=['accumulated_miles', 'ticked_count', 'level'])
+    return user
@@ -0,0 +1,18 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import Level, Promotion
+from .services import invalidate_level_table, invalidate_promotion_index
+
+
+@receiver([post_save, post_delete], sender=Level)
+def level_changed(sender, **kwargs):
+    # 等级新增、修改或删除后重新加载等级表
+    transaction.on_commit(invalidate_level_table)
+
+
+@receiver([post_save, post_delete], sender=Promotion)
+def promotion_changed(sender, **kwargs):
+    # 活动新增、修改或删除后重建活动索引
+    transaction.on_commit(invalidate_promotion_index)
@@ -1,3 +1,125 @@
-from django.test import TestCase
+from datetime import date, timedelta
+from io import StringIO
+
+from django.contrib.auth.models import User as AuthUser
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from user_app.account.models import User
+from .models import Level, Promotion
+from .services import level_table, promotion_index, update_user_progress
+
+LOCMEM_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
 
 # Create your tests here.
+@override_settings(CACHES=LOCMEM_CACHES)
+class LevelTableTest(TestCase):
+    """等级表的二分查找结果与逐级检查一致，等级变更后重新加载"""
+
+    def setUp(self):
+        cache.clear()
+        for level, miles, tickets in ((1, 0, 0), (2, 1000, 5), (3, 5000, 20), (4, 20000, 50)):
+            Level.objects.create(level=level, require_miles=miles, require_tickets=tickets)
+
+    @staticmethod
+    def linear_resolve(miles, tickets):
+        current_level = next_level = None
+        for level in Level.objects.order_by('level'):
+            if miles >= level.require_miles or tickets >= level.require_tickets:
+                current_level = level
+            else:
+                next_level = level
+                break
+        return current_level, next_level
+
+    def test_matches_linear_scan(self):
+        for miles in (0, 999, 1000, 4999, 5000, 30000):
+            for tickets in (0, 4, 5, 20, 60):
+                self.assertEqual(level_table.resolve(miles, tickets), self.linear_resolve(miles, tickets))
+                current_level, _ = level_table.resolve(miles, tickets)
+                self.assertEqual(level_table.by_number(current_level.level if current_level else None),
+                                 self.linear_resolve(miles, tickets))
+        self.assertIsNone(level_table.by_number(9))
+
+    def test_reloads_after_change(self):
+        self.assertEqual(level_table.resolve(1000, 0)[0].level, 2)
+        with self.captureOnCommitCallbacks(execute=True):
+            level = Level.objects.get(level=2)
+            level.require_miles = 2000
+            level.save()
+        self.assertEqual(level_table.resolve(1000, 0)[0].level, 1)
+
+    def test_summary(self):
+        auth_user = AuthUser.objects.create_user('tester', 'tester@example.com', 'password')
+        User.objects.create(name='tester', email='tester@example.com', password='password',
+                            accumulated_miles=1200, ticked_count=1)
+        today = date.today()
+        with self.captureOnCommitCallbacks(execute=True):
+            Promotion.objects.create(name='双倍里程', description='', start_date=today, end_date=today,
+                                     level=Level.objects.get(level=2))
+        client = APIClient()
+        client.force_authenticate(auth_user)
+
+        response = client.get('/user/level/summary/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['level']['level'], 2)
+        self.assertEqual(response.data['next_level'],
+                         {'level_name': 'Lv 3', 'require_miles': 3800, 'require_tickets': 19})
+        self.assertEqual([promotion['name'] for promotion in response.data['promotions']], ['双倍里程'])
+
+    def test_summary_uses_stored_level(self):
+        # 已保存的等级直接使用，不按里程和购票次数重新解析
+        auth_user = AuthUser.objects.create_user('tester', 'tester@example.com', 'password')
+        User.objects.create(name='tester', email='tester@example.com', password='password',
+                            accumulated_miles=1200, ticked_count=1, level=3)
+        client = APIClient()
+        client.force_authenticate(auth_user)
+
+        response = client.get('/user/level/summary/')
+        self.assertEqual(response.data['level']['level'], 3)
+        self.assertEqual(response.data['next_level']['level_name'], 'Lv 4')
+
+    def test_progress_updates_level(self):
+        user = User.objects.create(name='tester', email='tester@example.com', password='password', level=1)
+        self.assertEqual(update_user_progress(user.id, 1000, 1).level, 2)
+        self.assertEqual(update_user_progress(user.id, -1000, -1).level, 1)
+
+    def test_sync_user_levels(self):
+        User.objects.create(name='tester', email='tester@example.com', password='password',
+                            accumulated_miles=6000, ticked_count=3, level=1)
+        call_command('sync_user_levels', '--verify', stdout=StringIO())
+        self.assertEqual(User.objects.get(name='tester').level, 1)
+        call_command('sync_user_levels', '--batch-size', '1', stdout=StringIO())
+        self.assertEqual(User.objects.get(name='tester').level, 3)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class PromotionIndexTest(TestCase):
+    """活动索引只返回当天有效的活动，日期变化或活动变更后更新"""
+
+    def setUp(self):
+        cache.clear()
+        self.level = Level.objects.create(level=1, require_miles=0, require_tickets=0)
+        self.today = date(2030, 6, 15)
+        for name, start, end in (('已结束', -10, -1), ('进行中', -5, 5), ('今天开始', 0, 3), ('未开始', 1, 10)):
+            Promotion.objects.create(name=name, description='', level=self.level,
+                                     start_date=self.today + timedelta(days=start),
+                                     end_date=self.today + timedelta(days=end))
+
+    def names(self, day):
+        return [promotion['name'] for promotion in promotion_index.active(self.level, day)]
+
+    def test_active_window(self):
+        self.assertEqual(self.names(self.today), ['进行中', '今天开始'])
+        with self.assertNumQueries(0):
+            self.assertEqual(self.names(self.today), ['进行中', '今天开始'])
+        self.assertEqual(self.names(self.today + timedelta(days=1)), ['进行中', '今天开始', '未开始'])
+
+    def test_rebuilds_after_change(self):
+        self.names(self.today)
+        with self.captureOnCommitCallbacks(execute=True):
+            Promotion.objects.filter(name='进行中').delete()
+        self.assertEqual(self.names(self.today), ['今天开始'])
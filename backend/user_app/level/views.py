@@ -1,132 +1,103 @@
-from django.core.exceptions import ObjectDoesNotExist
 from rest_framework import status
 from rest_framework.response import Response
 from rest_framework.decorators import api_view
-from .models import Level, User, Promotion
-from .serializers import LevelSerializer, PromotionSerializer
+from .models import Level
+from .serializers import LevelSerializer
+from .services import promotion_index, user_levels
+
+
+def _next_level_data(next_level, user_miles, user_tickets):
+    return {
+        "level_name": dict(Level.LEVEL_CHOICES).get(next_level.level),
+        "require_miles": next_level.require_miles - user_miles,
+        "require_tickets": next_level.require_tickets - user_tickets,
+    }
 
 
 @api_view(['GET'])
 def get_user_level(request):
-    user = request.user
-
     # 获取用户信息
-    try:
-        user = User.objects.get(name=user.username)
-    except ObjectDoesNotExist:
+    user = request.domain_user
+    if not user:
         return Response({"detail": "用户未找到"}, status=status.HTTP_404_NOT_FOUND)
 
     user_miles = user.accumulated_miles
     user_tickets = user.ticked_count
 
-    try:
-        # 查询所有等级，找到当前用户满足的最高等级
-        levels = Level.objects.all().order_by('level')
-        user_level = None
-
-        for level in levels:
-            if user_miles >= level.require_miles or user_tickets >= level.require_tickets:
-                user_level = level
-            else:
-                break
-
-        if user_level is None:
-            return Response({"detail": "用户等级未找到"}, status=status.HTTP_404_NOT_FOUND)
-
-        # 序列化等级数据
-        level_data = LevelSerializer(user_level).data
+    # 用户的当前等级
+    user_level, _ = user_levels(user)
+    if user_level is None:
+        return Response({"detail": "用户等级未找到"}, status=status.HTTP_404_NOT_FOUND)
 
-        return Response({
-            "level": level_data,
-            "level_name": dict(Level.LEVEL_CHOICES).get(user_level.level),
-            "user_miles": user_miles,
-            "user_tickets": user_tickets
-        }, status=status.HTTP_200_OK)
-
-    except Level.DoesNotExist:
-        return Response({"detail": "等级信息未找到"}, status=status.HTTP_404_NOT_FOUND)
+    # 序列化等级数据
+    level_data = LevelSerializer(user_level).data
 
+    return Response({
+        "level": level_data,
+        "level_name": dict(Level.LEVEL_CHOICES).get(user_level.level),
+        "user_miles": user_miles,
+        "user_tickets": user_tickets
+    }, status=status.HTTP_200_OK)
 
 
 @api_view(['GET'])
 def get_user_promotions(request):
     """
-    获取与用户等级相关联的活动信息
+    获取与用户等级相关联的、当前有效的活动信息
     """
     # 获取当前用户对象
-    user = request.user
-
-    # 显式获取 user 实例，避免 SimpleLazyObject 问题
-    try:
-        user = User.objects.get(name=user.username)
-    except ObjectDoesNotExist:
+    user = request.domain_user
+    if not user:
         return Response({"detail": "用户未找到"}, status=status.HTTP_404_NOT_FOUND)
 
-    # 获取用户的里程和购票次数
-    user_miles = user.accumulated_miles
-    user_tickets = user.ticked_count
-
-    # 查询符合条件的等级
-    try:
-        levels = Level.objects.all().order_by('level')
-
-        # 找到符合条件的最高等级
-        user_level = None
-        for level in levels:
-            if user_miles >= level.require_miles or user_tickets >= level.require_tickets:
-                user_level = level
-            else:
-                break
+    # 用户的当前等级
+    user_level, _ = user_levels(user)
+    if user_level is None:
+        return Response({"detail": "用户等级未找到"}, status=status.HTTP_404_NOT_FOUND)
 
-        if user_level is None:
-            return Response({"detail": "用户等级未找到"}, status=status.HTTP_404_NOT_FOUND)
+    # 从活动索引中取该等级当前有效的活动
+    promotion_data = promotion_index.active(user_level)
 
-        # 查询与该等级关联的活动信息
-        promotions = Promotion.objects.filter(level=user_level)
-
-        # 序列化活动信息
-        promotion_data = PromotionSerializer(promotions, many=True).data
-
-        return Response({"promotions": promotion_data}, status=status.HTTP_200_OK)
-
-    except Level.DoesNotExist:
-        return Response({"detail": "等级信息未找到"}, status=status.HTTP_404_NOT_FOUND)
-    except Promotion.DoesNotExist:
-        return Response({"detail": "没有找到相关活动信息"}, status=status.HTTP_404_NOT_FOUND)
+    return Response({"promotions": promotion_data}, status=status.HTTP_200_OK)
 
 
 @api_view(['GET'])
 def get_next_level(request):
-    user = request.user
-
-    try:
-        user = User.objects.get(name=user.username)
-    except ObjectDoesNotExist:
+    user = request.domain_user
+    if not user:
         return Response({"detail": "用户未找到"}, status=status.HTTP_404_NOT_FOUND)
 
     user_miles = user.accumulated_miles
     user_tickets = user.ticked_count
 
-    try:
-        # 查询所有等级，找出下一个未达到的等级
-        levels = Level.objects.all().order_by('level')
-
-        next_level = None
-        for level in levels:
-            if user_miles < level.require_miles and user_tickets < level.require_tickets:
-                next_level = level
-                break
+    # 找出下一个未达到的等级
+    _, next_level = user_levels(user)
+    if next_level is None:
+        return Response({"detail": "您已达到最高等级"}, status=status.HTTP_200_OK)
 
-        if next_level is None:
-            return Response({"detail": "您已达到最高等级"}, status=status.HTTP_200_OK)
+    return Response({"next_level": _next_level_data(next_level, user_miles, user_tickets)},
+                    status=status.HTTP_200_OK)
 
-        next_level_data = {
-            "level_name": dict(Level.LEVEL_CHOICES).get(next_level.level),
-            "require_miles": next_level.require_miles - user_miles,
-            "require_tickets": next_level.require_tickets - user_tickets,
-        }
 
-        return Response({"next_level": next_level_data}, status=status.HTTP_200_OK)
+@api_view(['GET'])
+def get_level_summary(request):
+    """
+    一次返回用户的当前等级、下一等级与可参加的活动，供个人主页使用。
+    未达到任何等级时 level 为 null，已达到最高等级时 next_level 为 null。
+    """
+    user = request.domain_user
+    if not user:
+        return Response({"detail": "用户未找到"}, status=status.HTTP_404_NOT_FOUND)
 
-    except Level.DoesNotExist:
-        return Response({"detail": "等级信息未找到"}, status=status.HTTP_404_NOT_FOUND)
+    user_miles = user.accumulated_miles
+    user_tickets = user.ticked_count
+    user_level, next_level = user_levels(user)
+
+    return Response({
+        "level": LevelSerializer(user_level).data if user_level else None,
+        "level_name": dict(Level.LEVEL_CHOICES).get(user_level.level) if user_level else None,
+        "user_miles": user_miles,
+        "user_tickets": user_tickets,
+        "next_level": _next_level_data(next_level, user_miles, user_tickets) if next_level else None,
+        "promotions": promotion_index.active(user_level) if user_level else [],
+    }, status=status.HTTP_200_OK)